@@ -0,0 +1,45 @@
+import subprocess
+import numpy as np
+from moviepy.config import get_setting
+
+
+def _ffmpeg_command(path, sample_rate, start=None, duration=None):
+    cmd = [get_setting("FFMPEG_BINARY"), "-nostdin", "-loglevel", "error"]
+    if start is not None:
+        cmd += ["-ss", f"{start:.3f}"]
+    cmd += ["-i", path]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-acodec", "pcm_s16le", "-"]
+    return cmd
+
+
+def decode_audio(path, sample_rate=16000, start=None, duration=None):
+    """
+    Decodes (part of) a media file's soundtrack to mono float32 in [-1, 1].
+    """
+    result = subprocess.run(_ffmpeg_command(path, sample_rate, start, duration),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg could not decode audio: {result.stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def iter_audio_blocks(path, sample_rate=16000, block_seconds=60):
+    """
+    Yields the soundtrack as consecutive mono float32 blocks so long
+    episodes never have to be held in memory at once.
+    """
+    block_bytes = int(sample_rate * block_seconds) * 2
+    process = subprocess.Popen(_ffmpeg_command(path, sample_rate),
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
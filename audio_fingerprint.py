@@ -0,0 +1,314 @@
+import os
+import json
+import uuid
+import sqlite3
+import hashlib
+import numpy as np
+from datetime import datetime
+from scipy.ndimage import maximum_filter
+
+from audio_decoder import iter_audio_blocks
+from config import (FINGERPRINT_DB_PATH, SOURCE_ARTIFACTS_DIR,
+                    FINGERPRINT_MIN_MATCHES, FINGERPRINT_MIN_RATIO, FACE_WINDOW_TOLERANCE)
+
+SAMPLE_RATE = 8000
+N_FFT = 512
+HOP = 256                     # 32 ms per frame at 8 kHz
+PEAK_NEIGHBORHOOD = (15, 11)  # (frequency bins, frames)
+FAN_OUT = 6                   # pairs formed from each anchor peak
+MAX_DT = 63                   # max frames between paired peaks (6 bits)
+BLOCK_SECONDS = 60
+
+
+def frames_to_seconds(frames):
+    return frames * HOP / SAMPLE_RATE
+
+
+def spectral_peaks(samples):
+    """
+    Log-magnitude STFT of one block (strided view, one rfft call) and its
+    local maxima. Returns (frame, bin) arrays sorted by frame.
+    """
+    if len(samples) < N_FFT:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    n_frames = 1 + (len(samples) - N_FFT) // HOP
+    frames = np.lib.stride_tricks.as_strided(
+        samples, shape=(n_frames, N_FFT),
+        strides=(samples.strides[0] * HOP, samples.strides[0])
+    )
+    spectrum = np.log1p(np.abs(np.fft.rfft(frames * np.hanning(N_FFT).astype(np.float32), axis=1)))
+    spectrum = spectrum.T  # (bins, frames)
+
+    local_max = maximum_filter(spectrum, size=PEAK_NEIGHBORHOOD, mode="constant") == spectrum
+    loud = spectrum > spectrum.mean() + spectrum.std()
+    bins, times = np.nonzero(local_max & loud)
+    order = np.lexsort((bins, times))
+    return times[order].astype(np.int64), bins[order].astype(np.int64)
+
+
+def peak_pair_hashes(times, bins):
+    """
+    Pairs every peak with the next FAN_OUT peaks and packs
+    (f1, f2, dt) into one integer. Returns (hashes, anchor times).
+    """
+    hashes, anchors = [], []
+    for k in range(1, FAN_OUT + 1):
+        if len(times) <= k:
+            break
+        dt = times[k:] - times[:-k]
+        valid = (dt > 0) & (dt <= MAX_DT)
+        f1, f2 = bins[:-k][valid], bins[k:][valid]
+        hashes.append((f1 << 15) | (f2 << 6) | dt[valid])
+        anchors.append(times[:-k][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes), np.concatenate(anchors)
+
+
+def fingerprint_file(path):
+    """
+    Fingerprints a media file's soundtrack block by block.
+    Returns (hashes, anchor frame times, duration in seconds).
+    """
+    all_hashes, all_times = [], []
+    offset = 0
+    for block in iter_audio_blocks(path, SAMPLE_RATE, BLOCK_SECONDS):
+        times, bins = spectral_peaks(block)
+        hashes, anchors = peak_pair_hashes(times, bins)
+        all_hashes.append(hashes)
+        all_times.append(anchors + offset)
+        offset += len(block) // HOP
+
+    if not all_hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0.0
+    return np.concatenate(all_hashes), np.concatenate(all_times), frames_to_seconds(offset)
+
+
+def fingerprint_digest(hashes, times):
+    """Identity of an exact fingerprint: the same soundtrack always decodes to the same peaks."""
+    return hashlib.sha1(hashes.astype(np.int64).tobytes() + times.astype(np.int64).tobytes()).hexdigest()
+
+
+class FingerprintIndex:
+    def __init__(self, db_path=FINGERPRINT_DB_PATH, artifacts_dir=SOURCE_ARTIFACTS_DIR):
+        self.db_path = db_path
+        self.artifacts_dir = artifacts_dir
+        os.makedirs(artifacts_dir, exist_ok=True)
+        with sqlite3.connect(db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sources (
+                    source_id TEXT PRIMARY KEY,
+                    duration REAL,
+                    created_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    hash INTEGER NOT NULL,
+                    source_id TEXT NOT NULL,
+                    t INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_fingerprints_hash ON fingerprints (hash);
+
+                -- Which source a video file on disk belongs to (face lookups only know the path)
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    source_id TEXT NOT NULL
+                );
+            """)
+            # Indexes created before the digest was stored
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(sources)")]
+            if "digest" not in columns:
+                conn.execute("ALTER TABLE sources ADD COLUMN digest TEXT")
+        conn.close()
+
+    def add_source(self, source_id, hashes, times, duration):
+        """Stores a processed source's fingerprint (replacing an older one)."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM fingerprints WHERE source_id = ?", (source_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO sources (source_id, duration, created_at, digest) VALUES (?, ?, ?, ?)",
+                (source_id, duration, datetime.now().isoformat(), fingerprint_digest(hashes, times))
+            )
+            conn.executemany(
+                "INSERT INTO fingerprints (hash, source_id, t) VALUES (?, ?, ?)",
+                zip(hashes.tolist(), [source_id] * len(hashes), times.tolist())
+            )
+        conn.close()
+
+    def unchanged(self, source_id, hashes, times):
+        """True if source_id was stored with exactly this fingerprint (same soundtrack, processed before)."""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT digest FROM sources WHERE source_id = ?", (source_id,)).fetchone()
+        conn.close()
+        return row is not None and row[0] == fingerprint_digest(hashes, times)
+
+    def bind_file(self, source_id, path):
+        """Records that the video at path (as it is now: size, mtime) is source_id."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT OR REPLACE INTO files (path, size, mtime, source_id) VALUES (?, ?, ?, ?)",
+                         (path, stat.st_size, stat.st_mtime, source_id))
+        conn.close()
+
+    def source_for_file(self, path):
+        """source_id bound to this video file, or None if unknown or the file changed since."""
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT size, mtime, source_id FROM files WHERE path = ?", (path,)).fetchone()
+        conn.close()
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime:
+            return None
+        return row[2]
+
+    def match(self, hashes, times, exclude=None):
+        """
+        Finds the stored source sharing the most time-aligned hashes.
+        Returns {"source_id", "offset", "matches", "ratio"} or None, where
+        offset is in seconds: old_time = new_time + offset.
+        """
+        if len(hashes) == 0:
+            return None
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TEMP TABLE query (hash INTEGER, t INTEGER)")
+            conn.executemany("INSERT INTO query VALUES (?, ?)", zip(hashes.tolist(), times.tolist()))
+            rows = conn.execute("""
+                SELECT f.source_id, f.t - q.t
+                FROM query q JOIN fingerprints f ON f.hash = q.hash
+            """).fetchall()
+        conn.close()
+
+        if exclude is not None:
+            rows = [r for r in rows if r[0] != exclude]
+        if not rows:
+            return None
+
+        # Histogram of (source, offset): a true match piles up on one offset
+        source_names, source_idx = np.unique([r[0] for r in rows], return_inverse=True)
+        offsets = np.array([r[1] for r in rows], dtype=np.int64)
+        keys = source_idx.astype(np.int64) * (1 << 32) + (offsets - offsets.min())
+        unique_keys, counts = np.unique(keys, return_counts=True)
+        best = int(np.argmax(counts))
+        matches = int(counts[best])
+        ratio = matches / len(hashes)
+
+        if matches < FINGERPRINT_MIN_MATCHES or ratio < FINGERPRINT_MIN_RATIO:
+            return None
+        best_key = int(unique_keys[best])
+        return {
+            "source_id": str(source_names[best_key >> 32]),
+            "offset": frames_to_seconds((best_key & 0xFFFFFFFF) + int(offsets.min())),
+            "matches": matches,
+            "ratio": ratio,
+        }
+
+    def _artifact_path(self, source_id, name):
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in source_id)
+        return os.path.join(self.artifacts_dir, safe_id, f"{name}.json")
+
+    def save_artifact(self, source_id, name, data):
+        """Saves a reusable result (transcript, face index, scores...) for a source."""
+        path = self._artifact_path(source_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename: stage workers may read an artifact while another one rewrites it
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_artifact(self, source_id, name):
+        path = self._artifact_path(source_id, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def drop_artifacts(self, source_id, *names):
+        for name in names:
+            path = self._artifact_path(source_id, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def face_window(self, source_id, start_time, end_time):
+        """Stored face results ({"start", "end", "face_count", "tracks", "frame_size"}) of a clip window, or None."""
+        for window in (self.load_artifact(source_id, "faces") or {"windows": []})["windows"]:
+            if same_window(window, start_time, end_time):
+                return window
+        return None
+
+    def save_face_window(self, source_id, start_time, end_time, **values):
+        """
+        Adds face results (face_count, tracks...) to a clip window's entry.
+        Two workers updating the same source at once can lose one entry; it is just scanned again later.
+        """
+        faces = self.load_artifact(source_id, "faces") or {"windows": []}
+        for window in faces["windows"]:
+            if same_window(window, start_time, end_time):
+                window.update(values)
+                break
+        else:
+            faces["windows"].append(dict(values, start=start_time, end=end_time))
+        self.save_artifact(source_id, "faces", faces)
+
+    def reuse_artifacts(self, from_id, to_id, offset, duration=None):
+        """
+        Copies a matched source's transcript, segment scores and face windows
+        onto a new source's timeline (new_time = old_time - offset).
+        Returns the shifted transcript segments, or None if from_id has no transcript.
+        """
+        transcript = self.load_artifact(from_id, "transcript")
+        if not transcript:
+            return None
+        scores = self.load_artifact(from_id, "scores")
+        faces = self.load_artifact(from_id, "faces")
+
+        segments = shift_segments(transcript["segments"], offset, duration)
+        self.save_artifact(to_id, "transcript", {"segments": segments})
+        self.drop_artifacts(to_id, "scores", "faces")
+        if scores:
+            self.save_artifact(to_id, "scores", {"segments": shift_segments(scores["segments"], offset, duration)})
+        if faces:
+            self.save_artifact(to_id, "faces", {"windows": shift_windows(faces["windows"], offset, duration)})
+        return segments
+
+
+def same_window(window, start_time, end_time, tolerance=FACE_WINDOW_TOLERANCE):
+    return abs(window["start"] - start_time) <= tolerance and abs(window["end"] - end_time) <= tolerance
+
+
+def shift_segments(segments, offset, duration=None):
+    """
+    Maps segments of a matched source onto the new one's timeline
+    (new_time = old_time - offset), dropping those outside it.
+    """
+    shifted = []
+    for segment in segments:
+        start, end = segment["start"] - offset, segment["end"] - offset
+        if end <= 0 or (duration is not None and start >= duration):
+            continue
+        moved = dict(segment)
+        moved["start"] = max(0.0, start)
+        moved["end"] = end if duration is None else min(end, duration)
+        shifted.append(moved)
+    return shifted
+
+
+def shift_windows(windows, offset, duration=None):
+    """
+    Like shift_segments for clip windows, but a window that doesn't fit the
+    new timeline is dropped instead of clipped (its face count covers the whole
+    window). Track times are relative to the window start, so they stay as they are.
+    """
+    shifted = []
+    for window in windows:
+        start, end = window["start"] - offset, window["end"] - offset
+        if start < -FACE_WINDOW_TOLERANCE or (duration is not None and end > duration + FACE_WINDOW_TOLERANCE):
+            continue
+        shifted.append(dict(window, start=max(0.0, start), end=end))
+    return shifted
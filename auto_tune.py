@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import platform
+import threading
+
+import numpy as np
+
+from memory_governor import available_memory
+from config import (PROFILES, DEFAULT_PROFILE, AUTO_TUNE, HARDWARE_PROBE_PATH, BENCHMARK_ROUNDS,
+                    WHISPER_MODEL_BYTES, MEMORY_BUDGET_FRACTION, TRANSCRIBE_WORKERS, MAX_CONCURRENT_DECODERS,
+                    MAX_CONCURRENT_ENCODERS, SUMMARIZER_THREADS)
+
+
+def cpu_cores():
+    """Cores this process may actually use: the affinity mask, capped by a cgroup CPU quota (containers)."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cores = min(cores, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+def total_memory():
+    """Bytes of physical RAM, or None if unknown."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def micro_benchmark(threads, rounds=BENCHMARK_ROUNDS):
+    """
+    Work items per second when `threads` threads each sort a 256k-float
+    array `rounds` times. numpy sorts without the GIL, so the rate grows
+    with the cores that really run in parallel (not just the ones reported).
+    """
+    data = np.random.default_rng(0).random(1 << 18)
+
+    def work():
+        for _ in range(rounds):
+            np.sort(data)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * rounds / (time.perf_counter() - started)
+
+
+def probe_hardware(path=HARDWARE_PROBE_PATH):
+    """
+    {"cores", "memory_bytes", "single_rate", "parallel_rate", "effective_cores"}.
+    The benchmark is stored in path and only re-run when the core count,
+    RAM or CPU model differ from what was measured.
+    """
+    machine = {"cores": cpu_cores(), "memory_bytes": total_memory(),
+               "cpu": platform.processor() or platform.machine()}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if all(stored.get(key) == value for key, value in machine.items()):
+                return stored
+        except (OSError, ValueError):
+            pass
+
+    single = micro_benchmark(1)
+    parallel = micro_benchmark(machine["cores"]) if machine["cores"] > 1 else single
+    probe = dict(machine, single_rate=single, parallel_rate=parallel,
+                 effective_cores=max(1, min(machine["cores"], int(round(parallel / single)))))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(probe, f)
+    return probe
+
+
+def auto_tune(profile, hardware, memory=None):
+    """
+    Worker counts and thread splits for this machine:
+    - transcription: one Whisper model per worker process, so workers are
+      limited by RAM as well as cores (at least 2 threads each, PyTorch on
+      CPU loses more to synchronisation below that);
+    - rendering: x264 uses several threads per encode, so parallel encodes
+      only pay off with about 4 cores each; one more decoder than encoders
+      lets a face scan run next to a render;
+    - summarizer/classifier: up to 4 threads, more barely helps those models.
+    memory: bytes free for models (default: what the system has available now).
+    """
+    cores = hardware["effective_cores"]
+    memory = memory or available_memory() or hardware["memory_bytes"] or 4 * 1024 ** 3
+    model_bytes = WHISPER_MODEL_BYTES.get(profile["whisper_model"], 2 << 30)
+
+    transcribe_workers = max(1, min(8, cores // 2, int(memory * MEMORY_BUDGET_FRACTION // model_bytes)))
+    max_encoders = max(1, min(4, cores // 4))
+    return {
+        "transcribe_workers": transcribe_workers,
+        "transcribe_threads": max(1, cores // transcribe_workers),
+        "max_encoders": max_encoders,
+        "max_decoders": max_encoders + 1,
+        "encoder_threads": max(1, cores // max_encoders),
+        "model_threads": min(4, cores),
+    }
+
+
+def default_tuning():
+    """The counts set in config.py, for AUTO_TUNE = False."""
+    return {
+        "transcribe_workers": TRANSCRIBE_WORKERS,
+        "transcribe_threads": max(1, (os.cpu_count() or 1) // max(1, TRANSCRIBE_WORKERS)),
+        "max_encoders": MAX_CONCURRENT_ENCODERS,
+        "max_decoders": MAX_CONCURRENT_DECODERS,
+        "encoder_threads": None,  # ffmpeg's own default
+        "model_threads": SUMMARIZER_THREADS,
+    }
+
+
+def resolve_profile(name=None, tune=AUTO_TUNE):
+    """
+    A profile's knobs plus this machine's worker counts, as one dict
+    (name, whisper_model, format_ladder, presets, ..., transcribe_workers,
+    encoder_threads, ...). Unknown names raise.
+    """
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise Exception(f"Unknown profile '{name}' (choose from: {', '.join(PROFILES)})")
+    profile = dict(PROFILES[name], name=name)
+    if tune:
+        hardware = probe_hardware()
+        profile.update(auto_tune(profile, hardware), cores=hardware["cores"],
+                       effective_cores=hardware["effective_cores"])
+    else:
+        profile.update(default_tuning())
+    return profile
@@ -0,0 +1,120 @@
+import os
+import glob
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+
+from config import STAGE_BUDGETS
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class StageTimeout(JobCancelled):
+    pass
+
+
+class CancelToken:
+    """
+    Cooperative cancellation for one generation job. Long loops call check()
+    (cheap: one flag read and one clock read), which raises JobCancelled once
+    cancel() was called or StageTimeout once the current stage's wall-clock
+    budget is spent. Things that can't poll (worker pools, subprocesses)
+    register a callback that cancel() runs right away.
+    """
+
+    def __init__(self, job_id=None, stage_budgets=None):
+        self.job_id = job_id
+        self.stage_budgets = stage_budgets if stage_budgets is not None else STAGE_BUDGETS
+        self.reason = None
+        self.stage = None
+        self.deadline = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._partial_outputs = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="Cancelled by user"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Cancel callback failed: {e}")
+
+    def on_cancel(self, callback):
+        """Runs callback on cancel() (immediately if already cancelled). Returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._callbacks.remove(callback) if callback in self._callbacks else None
+        callback()
+        return lambda: None
+
+    def check(self):
+        if self._event.is_set():
+            raise JobCancelled(self.reason)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise StageTimeout(f"Stage '{self.stage}' exceeded its {self.stage_budgets[self.stage]}s budget")
+
+    def sleep(self, seconds):
+        """time.sleep that wakes up (and raises) as soon as the job is cancelled."""
+        self._event.wait(seconds)
+        self.check()
+
+    @contextmanager
+    def stage_scope(self, name):
+        """Starts stage name's wall-clock budget for the duration of the block."""
+        self.check()
+        previous = (self.stage, self.deadline)
+        budget = self.stage_budgets.get(name)
+        self.stage = name
+        self.deadline = time.monotonic() + budget if budget else None
+        try:
+            yield self
+        finally:
+            self.stage, self.deadline = previous
+
+    def track_output(self, path):
+        """
+        Remembers a file/dir (or glob pattern) this job creates, removed by
+        cleanup() if the job doesn't finish. An HLS playlist takes its
+        segment directory with it.
+        """
+        self._partial_outputs.append(path)
+        return path
+
+    def keep_outputs(self, paths):
+        """Marks finished outputs as kept, so cleanup() leaves them alone."""
+        self._partial_outputs = [p for p in self._partial_outputs if p not in paths]
+
+    def cleanup(self):
+        for pattern in reversed(self._partial_outputs):
+            if pattern.endswith(".m3u8"):
+                pattern = os.path.dirname(pattern)
+            for path in glob.glob(pattern if "*" in pattern else glob.escape(pattern)):
+                try:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    elif os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    print(f"⚠️ Could not remove partial output {path}: {e}")
+        self._partial_outputs = []
+
+
+def check(token):
+    """token.check() for code paths where the token is optional."""
+    if token is not None:
+        token.check()
@@ -0,0 +1,174 @@
+import io
+import re
+import html
+import xml.etree.ElementTree as ET
+
+from config import (CAPTION_LANGUAGES, CAPTION_FORMATS, CAPTION_SEGMENT_SECONDS,
+                    CAPTION_MIN_COVERAGE, CAPTION_MIN_WORDS_PER_MINUTE)
+
+TIMING_RE = re.compile(r"((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})")
+TAG_RE = re.compile(r"<[^>]*>")
+# [Music], [Applause], (laughs) ... - on-screen sound labels, not speech
+SOUND_LABEL_RE = re.compile(r"\[[^\]]*\]|\([^)]*\)")
+SPEAKER_CHANGE = ">>"
+SENTENCE_END = (".", "?", "!")
+
+
+def _timestamp(value):
+    parts = value.replace(",", ".").split(":")
+    seconds = float(parts[-1])
+    for i, part in enumerate(reversed(parts[:-1])):
+        seconds += int(part) * 60 ** (i + 1)
+    return seconds
+
+
+def _clean(line):
+    return " ".join(html.unescape(TAG_RE.sub("", line)).split())
+
+
+def iter_vtt_cues(lines):
+    """(start, end, [text lines]) per WebVTT cue, read line by line from any iterable of str."""
+    timing = None
+    text = []
+    for line in lines:
+        # Only a truly empty line ends a cue; YouTube puts " " lines inside them
+        line = line.rstrip("\r\n")
+        match = TIMING_RE.search(line)
+        if match:
+            timing = (_timestamp(match.group(1)), _timestamp(match.group(2)))
+            text = []
+        elif not line:
+            if timing is not None:
+                yield timing[0], timing[1], text
+            timing = None
+        elif timing is not None:
+            cleaned = _clean(line)
+            if cleaned:
+                text.append(cleaned)
+    if timing is not None:
+        yield timing[0], timing[1], text
+
+
+def iter_srv3_cues(stream):
+    """(start, end, [text lines]) per <p> of a YouTube srv3 (timedtext format 3) stream."""
+    for _, element in ET.iterparse(stream, events=("end",)):
+        if element.tag != "p":
+            continue
+        start = int(element.get("t", 0)) / 1000.0
+        end = start + int(element.get("d", 0)) / 1000.0
+        lines = [_clean(line) for line in "".join(element.itertext()).split("\n")]
+        element.clear()
+        yield start, end, [line for line in lines if line]
+
+
+def merge_rolling_cues(cues):
+    """
+    Collapses caption cues into one entry per new line of speech. YouTube's
+    auto captions roll: each cue repeats the previous cue's last line(s)
+    above the new one, plus ~10 ms "transition" cues that only repeat text.
+    Lines already shown at the end of the previous cue are dropped, so
+    every spoken line is kept once, timed by the cue that introduced it.
+    """
+    previous = []
+    for start, end, lines in cues:
+        overlap = 0
+        for n in range(min(len(previous), len(lines)), 0, -1):
+            if previous[-n:] == lines[:n]:
+                overlap = n
+                break
+        new_lines = lines[overlap:]
+        if lines:
+            previous = lines
+        if new_lines:
+            yield start, end, new_lines
+
+
+def cues_to_segments(cues, max_seconds=CAPTION_SEGMENT_SECONDS):
+    """
+    Groups deduplicated caption lines into transcript segments like
+    Whisper's: a segment ends at sentence punctuation, a speaker change
+    (">>"), a pause, or after max_seconds.
+    """
+    segments = []
+    current = None
+    for start, end, lines in merge_rolling_cues(cues):
+        for line in lines:
+            speaker_change = line.startswith(SPEAKER_CHANGE)
+            text = " ".join(SOUND_LABEL_RE.sub("", line.replace(SPEAKER_CHANGE, " ")).split())
+            if not text:
+                continue
+            if current is not None and (
+                speaker_change
+                or current["text"].endswith(SENTENCE_END)
+                or start - current["end"] > 1.0
+                or start - current["start"] >= max_seconds
+            ):
+                segments.append(current)
+                current = None
+            if current is None:
+                current = {"start": start, "end": end, "text": text}
+            else:
+                current["text"] += " " + text
+                current["end"] = max(current["end"], end)
+    if current is not None:
+        segments.append(current)
+
+    # Rolling cues stay on screen while the next line is spoken; end each segment when the next starts
+    for segment, following in zip(segments, segments[1:]):
+        segment["end"] = max(segment["start"], min(segment["end"], following["start"]))
+    return segments
+
+
+def parse_captions(stream, caption_format):
+    """Transcript segments from a binary caption stream ("vtt" or "srv3"), parsed as it is read."""
+    if caption_format == "srv3":
+        return cues_to_segments(iter_srv3_cues(stream))
+    if caption_format == "vtt":
+        return cues_to_segments(iter_vtt_cues(io.TextIOWrapper(stream, encoding="utf-8", errors="replace")))
+    raise ValueError(f"Unsupported caption format: {caption_format}")
+
+
+def select_caption_track(info, languages=CAPTION_LANGUAGES, formats=CAPTION_FORMATS):
+    """
+    Best caption track in a yt-dlp info dict: creator-uploaded subtitles in
+    one of languages first, then YouTube's automatic captions in the
+    spoken language ("-orig"), then automatic captions in languages.
+    Returns {"url", "format", "language", "automatic"} or None.
+    """
+    def pick(tracks, language):
+        by_format = {t.get("ext"): t for t in tracks.get(language) or [] if t.get("url")}
+        for caption_format in formats:
+            if caption_format in by_format:
+                return by_format[caption_format]["url"], caption_format
+        return None
+
+    subtitles = info.get("subtitles") or {}
+    automatic = info.get("automatic_captions") or {}
+    candidates = [(subtitles, lang, False) for lang in languages]
+    candidates += [(automatic, lang, True) for lang in automatic if lang.endswith("-orig")]
+    candidates += [(automatic, lang, True) for lang in languages]
+
+    for tracks, language, is_automatic in candidates:
+        picked = pick(tracks, language)
+        if picked:
+            url, caption_format = picked
+            return {"url": url, "format": caption_format, "language": language, "automatic": is_automatic}
+    return None
+
+
+def caption_quality(segments, duration):
+    """
+    (ok, reason): a caption transcript is only used instead of Whisper if it
+    covers most of the episode at a plausible speaking rate.
+    """
+    if not segments:
+        return False, "no caption text"
+    if duration:
+        covered = sum(s["end"] - s["start"] for s in segments)
+        coverage = covered / duration
+        if coverage < CAPTION_MIN_COVERAGE:
+            return False, f"captions cover only {coverage:.0%} of the audio"
+        words_per_minute = sum(len(s["text"].split()) for s in segments) / (duration / 60)
+        if words_per_minute < CAPTION_MIN_WORDS_PER_MINUTE:
+            return False, f"only {words_per_minute:.0f} words per minute"
+    return True, "ok"
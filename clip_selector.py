@@ -0,0 +1,153 @@
+import re
+from collections import deque
+import numpy as np
+
+from config import MIN_CLIP_DURATION, MAX_CLIP_DURATION
+
+# Text that ends a sentence: terminal punctuation, optionally followed by quotes/brackets
+SENTENCE_END = re.compile(r'[.!?।…]["\'”’)\]]*$')
+# A pause this long (seconds) between segments also counts as a sentence break
+PAUSE_BREAK = 1.0
+
+
+def sentence_boundaries(segments, pause=PAUSE_BREAK):
+    """
+    Returns two boolean arrays: which segments may start a clip and
+    which may end one, based on punctuation and pauses.
+    """
+    n = len(segments)
+    ends_sentence = np.array([bool(SENTENCE_END.search(s["text"].strip())) for s in segments])
+    starts = np.array([s["start"] for s in segments], dtype=np.float64)
+    ends = np.array([s["end"] for s in segments], dtype=np.float64)
+
+    gap_after = np.full(n, np.inf)
+    gap_after[:-1] = starts[1:] - ends[:-1]
+    can_end = ends_sentence | (gap_after >= pause)
+
+    can_start = np.ones(n, dtype=bool)
+    can_start[1:] = can_end[:-1]
+
+    # Transcripts without punctuation (e.g. fallback segments): any boundary will do
+    if n > 1 and not can_end[:-1].any():
+        can_start[:] = True
+        can_end[:] = True
+    return can_start, can_end
+
+
+def temporal_iou(a, b):
+    """Intersection over union of two (start, end) windows."""
+    inter = min(a[1], b[1]) - max(a[0], b[0])
+    if inter <= 0:
+        return 0.0
+    return inter / (max(a[1], b[1]) - min(a[0], b[0]))
+
+
+def _best_window_per_start(starts, ends, prefix, can_start, can_end, blocked,
+                           min_duration, max_duration):
+    """
+    One O(n) sweep. For every valid start segment i, finds the end segment j
+    maximizing prefix[j + 1] - prefix[i] subject to the duration bounds and
+    to not crossing a blocked segment. Both ends of the admissible j range
+    only move forward as i grows, so the maximum is kept in a monotonic deque.
+    """
+    n = len(starts)
+    candidates = []
+    window = deque()  # end indices with decreasing prefix[j + 1]
+    lo = 0            # first j with ends[j] - starts[i] >= min_duration
+    hi = 0            # next j to push (ends[j] - starts[i] <= max_duration)
+    next_blocked = 0  # first blocked index >= i
+
+    for i in range(n):
+        if next_blocked < i:
+            next_blocked = i
+        while next_blocked < n and not blocked[next_blocked]:
+            next_blocked += 1
+
+        while hi < n and hi < next_blocked and ends[hi] - starts[i] <= max_duration:
+            if can_end[hi]:
+                while window and prefix[window[-1] + 1] <= prefix[hi + 1]:
+                    window.pop()
+                window.append(hi)
+            hi += 1
+
+        lo = max(lo, i)
+        while lo < n and ends[lo] - starts[i] < min_duration:
+            lo += 1
+        while window and window[0] < lo:
+            window.popleft()
+
+        if hi < i + 1:
+            hi = i + 1
+        if blocked[i] or not can_start[i] or not window:
+            continue
+
+        j = window[0]
+        candidates.append((prefix[j + 1] - prefix[i], i, j))
+    return candidates
+
+
+def select_clip_windows(segments, scores, min_duration=MIN_CLIP_DURATION,
+                        max_duration=MAX_CLIP_DURATION, top_k=5, max_overlap=0.0):
+    """
+    Finds the top-K clip windows that start and end on sentence boundaries
+    and last between min_duration and max_duration seconds.
+
+    Segment scores are centred on their mean so that a window only grows
+    while it keeps adding above-average material. Each pass is one
+    prefix-sum/two-pointer sweep; candidates go through non-maximum
+    suppression (temporal IoU > max_overlap is rejected) and accepted
+    windows are blocked out before the next pass looks for windows in the gaps.
+    """
+    n = len(segments)
+    if n == 0:
+        return []
+
+    scores = np.asarray(scores, dtype=np.float64)
+    starts = np.array([s["start"] for s in segments], dtype=np.float64)
+    ends = np.array([s["end"] for s in segments], dtype=np.float64)
+    can_start, can_end = sentence_boundaries(segments)
+
+    prefix = np.zeros(n + 1)
+    np.cumsum(scores - scores.mean(), out=prefix[1:])
+    # Python floats are much faster than numpy scalars inside the sweep
+    starts_l, ends_l, prefix_l = starts.tolist(), ends.tolist(), prefix.tolist()
+    can_start_l, can_end_l = can_start.tolist(), can_end.tolist()
+
+    blocked = np.zeros(n, dtype=bool)
+    selected = []
+    while len(selected) < top_k:
+        candidates = _best_window_per_start(
+            starts_l, ends_l, prefix_l, can_start_l, can_end_l, blocked.tolist(),
+            min_duration, max_duration
+        )
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        accepted = 0
+        for value, i, j in candidates:
+            span = (starts_l[i], ends_l[j])
+            if any(temporal_iou(span, (w["start"], w["end"])) > max_overlap for w in selected):
+                continue
+            selected.append({"first": i, "last": j, "start": span[0], "end": span[1], "value": value})
+            blocked[i:j + 1] = True
+            accepted += 1
+            if len(selected) >= top_k:
+                break
+        if accepted == 0:
+            break
+
+    windows = []
+    for w in selected:
+        i, j = w["first"], w["last"]
+        # The hook line is the best segment inside the window
+        best = i + int(np.argmax(scores[i:j + 1]))
+        windows.append({
+            "start": w["start"],
+            "end": w["end"],
+            "first_segment": i,
+            "last_segment": j,
+            "hook_segment": best,
+            "score": float(scores[i:j + 1].mean()),
+            "text": segments[best]["text"],
+            "transcript": " ".join(s["text"] for s in segments[i:j + 1]),
+        })
+    return windows
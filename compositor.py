@@ -0,0 +1,180 @@
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+    print("⚠️ OpenCV not available. Install with: pip install opencv-python")
+
+CAPTION_FONTS = ["Arial Bold.ttf", "arialbd.ttf", "DejaVuSans-Bold.ttf"]
+CAPTION_LINE_CHARS = 30
+
+
+class CenterCropLayout:
+    """
+    Single-speaker layout: the largest centred crop with the output's aspect
+    ratio, resized once into a preallocated buffer (taken from pool if given).
+    """
+
+    def __init__(self, src_size, out_size=(1080, 1920), pool=None):
+        src_w, src_h = src_size
+        out_w, out_h = out_size
+        self.out_size = out_size
+        self.pool = pool
+        self.buffer = pool.acquire((out_h, out_w, 3)) if pool else np.zeros((out_h, out_w, 3), dtype=np.uint8)
+
+        crop_w = min(src_w, src_h * out_w / out_h)
+        crop_h = min(src_h, crop_w * out_h / out_w)
+        x1 = int((src_w - crop_w) / 2)
+        y1 = int((src_h - crop_h) / 2)
+        self.box = (x1, y1, x1 + int(crop_w), y1 + int(crop_h))
+
+    def describe(self):
+        """What this layout does to the source, as plain data (part of the render cache key)."""
+        return {"type": "center", "box": self.box, "out_size": self.out_size}
+
+    def source_scale(self):
+        """How far the source can be downscaled at decode time before the crop would need upscaling."""
+        x1, y1, x2, y2 = self.box
+        return min(1.0, max(self.out_size[0] / (x2 - x1), self.out_size[1] / (y2 - y1)))
+
+    def release(self):
+        if self.pool:
+            self.pool.release(self.buffer)
+            self.buffer = None
+
+    def render(self, frame, t):
+        x1, y1, x2, y2 = self.box
+        cv2.resize(frame[y1:y2, x1:x2], self.out_size, dst=self.buffer, interpolation=cv2.INTER_AREA)
+        return self.buffer
+
+
+class Overlay:
+    """
+    A static RGBA image placed at (x, y). Colour is premultiplied once and the
+    blend only touches the overlay's own region, using reused float buffers.
+    """
+
+    def __init__(self, rgba, x, y):
+        rgba = np.asarray(rgba, dtype=np.float32)
+        self.x, self.y = x, y
+        self.h, self.w = rgba.shape[:2]
+        alpha = rgba[:, :, 3:4] / 255.0
+        self.premultiplied = rgba[:, :, :3] * alpha
+        self.inverse_alpha = np.repeat(1.0 - alpha, 3, axis=2)
+        self.work = np.zeros((self.h, self.w, 3), dtype=np.float32)
+
+    def blend_into(self, buffer):
+        region = buffer[self.y:self.y + self.h, self.x:self.x + self.w]
+        h, w = region.shape[:2]
+        work = self.work[:h, :w]
+        np.multiply(region, self.inverse_alpha[:h, :w], out=work)
+        np.add(work, self.premultiplied[:h, :w], out=work)
+        np.copyto(region, work, casting="unsafe")
+
+
+def _caption_font(size):
+    for name in CAPTION_FONTS:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def wrap_caption(text, max_chars=CAPTION_LINE_CHARS):
+    """Text को lines में break करना (max_chars per line)"""
+    lines = []
+    current_line = ""
+    for word in text.split():
+        if len(current_line + " " + word) <= max_chars:
+            current_line += " " + word if current_line else word
+        else:
+            if current_line:
+                lines.append(current_line)
+            current_line = word
+    if current_line:
+        lines.append(current_line)
+    return lines
+
+
+def render_caption(text, width=1080, center_y=None, safe_area=None, height=1920):
+    """
+    Caption as one Overlay: white lines on a 70% black band near the top
+    (or centred on center_y, e.g. the seam of a split screen), laid out like
+    the old TextClip captions and scaled with the output width.
+    safe_area: (left, top, right, bottom) fractions of a width x height frame
+    that a platform's UI covers; the band is kept inside the rest.
+    Rendered once per short with PIL, so ImageMagick isn't needed.
+    """
+    x = 0
+    band_width = width
+    max_chars = CAPTION_LINE_CHARS
+    if safe_area:
+        left, _, right, _ = safe_area
+        x = int(width * left)
+        band_width = width - x - int(width * right)
+        max_chars = max(10, int(CAPTION_LINE_CHARS * band_width / width))
+
+    lines = wrap_caption(text, max_chars)
+    if not lines:
+        return None
+
+    scale = width / 1080
+    line_height = int(60 * scale)
+    padding = int(20 * scale)
+    font = _caption_font(int(50 * scale))
+
+    band = Image.new("RGBA", (band_width, len(lines) * line_height + 2 * padding), (0, 0, 0, int(255 * 0.7)))
+    draw = ImageDraw.Draw(band)
+    for i, line in enumerate(lines):
+        left, _, right, _ = draw.textbbox((0, 0), line, font=font)
+        draw.text(((band_width - (right - left)) / 2, padding + i * line_height), line, font=font,
+                  fill=(255, 255, 255, 255))
+    y = int(80 * scale) if center_y is None else max(0, center_y - band.height // 2)
+    if safe_area:
+        _, top, _, bottom = safe_area
+        y = max(0, min(max(y, int(height * top)), int(height * (1 - bottom)) - band.height))
+    return Overlay(np.array(band), x, y)
+
+
+class FrameCompositor:
+    """
+    The whole per-frame chain fused into one function for clip.fl():
+    layout (crop first, resize once into its buffer) -> overlays blended in
+    their regions -> fade as an in-place scalar multiply. Apart from the
+    decoded source frame nothing full-size is allocated per frame.
+    """
+
+    def __init__(self, layout, duration, overlays=None, fade_in=0.5, fade_out=0.5, cancel_token=None):
+        self.layout = layout
+        self.duration = duration
+        self.overlays = [o for o in (overlays or []) if o is not None]
+        self.fade_in = fade_in
+        self.fade_out = fade_out
+        self.cancel_token = cancel_token
+
+    def fade_factor(self, t):
+        factor = 1.0
+        if self.fade_in > 0:
+            factor = min(factor, t / self.fade_in)
+        if self.fade_out > 0:
+            factor = min(factor, (self.duration - t) / self.fade_out)
+        return max(0.0, factor)
+
+    def render(self, frame, t):
+        buffer = self.layout.render(frame, t)
+        for overlay in self.overlays:
+            overlay.blend_into(buffer)
+        factor = self.fade_factor(t)
+        if factor < 1.0:
+            cv2.convertScaleAbs(buffer, dst=buffer, alpha=factor)
+        return buffer
+
+    def __call__(self, get_frame, t):
+        # The encoder pulls every frame through here, so this is the render loop's cancel point
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+        return self.render(get_frame(t), t)
@@ -19,3 +19,285 @@ if not os.path.exists(OUTPUT_DIR):
 # 5. Settings
 MIN_CLIP_DURATION = 15
 MAX_CLIP_DURATION = 60
+
+# 6. Moment scoring (BM25 hook queries + per-episode distinctiveness)
+# Each query set is a list of phrases; a segment's hook score is the weighted
+# sum of its BM25 scores against every set.
+HOOK_QUERIES = {
+    "surprise": [
+        "amazing", "incredible", "unbelievable", "shocking", "wow", "omg",
+        "you won't believe", "this will blow your mind", "wait for it",
+        "अद्भुत", "अविश्वसनीय", "चौंकाने वाला", "वाह", "क्या बात है",
+    ],
+    "story": [
+        "the first time", "i remember", "true story", "what happened next",
+        "turns out", "plot twist", "nobody knew",
+    ],
+    "controversy": [
+        "unpopular opinion", "controversial", "the truth is", "nobody talks about",
+        "everyone is wrong", "overrated", "lie",
+    ],
+    "insight": [
+        "the secret", "the biggest mistake", "the key is", "lesson", "advice",
+        "if you want to", "most people don't", "changed my life",
+    ],
+}
+HOOK_QUERY_WEIGHTS = {
+    "surprise": 1.0,
+    "story": 0.8,
+    "controversy": 0.9,
+    "insight": 0.9,
+}
+HOOK_SCORE_WEIGHT = 0.7
+DISTINCTIVENESS_WEIGHT = 0.3
+
+# 7. Render tiers
+# "preview" is a cheap low-res render for every candidate; only shorts an
+# editor approves are re-rendered with the "final" settings.
+RENDER_TIERS = {
+    "preview": {
+        "size": (540, 960),
+        "preset": "ultrafast",
+        "bitrate": "600k",
+        "audio_bitrate": "64k",
+        "captions": False,
+    },
+    "final": {
+        "size": (1080, 1920),
+        "preset": "medium",
+        "bitrate": None,
+        "audio_bitrate": None,
+        "captions": True,
+    },
+    # Source frame kept as is (no crop/scale/captions), cut by stream copy - for archiving clips.
+    # preset is only used if the stream copy fails and the clip is rendered at "final" size.
+    "archive": {
+        "size": None,
+        "preset": "medium",
+        "bitrate": None,
+        "audio_bitrate": None,
+        "captions": False,
+    },
+}
+BACKGROUND_MUSIC_VOLUME = 0.05  # generated music bed under the original audio
+
+# 8. Caches
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+
+if not os.path.exists(CACHE_DIR):
+    os.makedirs(CACHE_DIR)
+
+# 9. Summarizer (titles and descriptions for each short)
+SUMMARIZER_MODEL = "facebook/bart-large-cnn"
+SUMMARIZER_BATCH_SIZE = 8
+SUMMARIZER_THREADS = min(4, os.cpu_count() or 1)
+SUMMARIZER_QUANTIZE = True  # dynamic int8 Linear layers when running on CPU
+
+# 10. Segment sentiment/emotion classification
+CLASSIFIER_MODELS = {
+    "sentiment": "distilbert-base-uncased-finetuned-sst-2-english",
+    "emotion": "j-hartmann/emotion-english-distilroberta-base",
+}
+CLASSIFIER_BATCH_SIZE = 32
+CLASSIFIER_THREADS = min(4, os.cpu_count() or 1)
+CLASSIFIER_LENGTH_BUCKETS = [16, 32, 64, 128, 256]  # token-length bucket edges
+EMOTION_RANK_WEIGHT = 0.3  # how much emotional intensity boosts a segment's score
+
+# 11. Catalog of rendered shorts
+CATALOG_PATH = os.path.join(OUTPUT_DIR, "catalog.sqlite")
+HASH_CHUNK_SIZE = 1024 * 1024  # bytes read per step when hashing videos
+
+# 12. Source fingerprinting (re-upload detection)
+FINGERPRINT_DB_PATH = os.path.join(CACHE_DIR, "fingerprints.sqlite")
+SOURCE_ARTIFACTS_DIR = os.path.join(CACHE_DIR, "sources")
+FINGERPRINT_MIN_MATCHES = 40     # aligned hash hits needed to call two sources the same
+# ...and as a fraction of the new source's hashes. Measured on 60 s cuts: unrelated audio stays
+# below 0.003; a clean re-encode scores ~0.4, one under loud added noise still ~0.06.
+FINGERPRINT_MIN_RATIO = 0.01
+FACE_WINDOW_TOLERANCE = 0.05     # seconds two clip windows may differ by and share stored face results
+
+# 13. Downloads
+# Tried in order; each rung keeps its resolved format across retries so a
+# dropped connection resumes the same file instead of downgrading quality.
+DOWNLOAD_FORMAT_LADDER = [
+    'best[height<=720][ext=mp4]/best[height<=720]/best',
+    'best[height<=480][ext=mp4]/best[height<=480]',
+    'worst[ext=mp4]/worst',
+]
+DOWNLOAD_MAX_RETRIES = 5          # total attempts per format before moving down the ladder
+DOWNLOAD_BACKOFF_BASE = 1.0       # seconds, doubled after every failed attempt
+DOWNLOAD_BACKOFF_MAX = 30.0
+DOWNLOAD_CONCURRENT_FRAGMENTS = 4
+
+# 14. Transcription
+WHISPER_MODEL = "base"
+TRANSCRIBE_WORKERS = max(1, min(8, (os.cpu_count() or 1) // 2))  # processes, one model each
+TRANSCRIBE_PARALLEL_MIN_SECONDS = 600   # shorter audio is transcribed in one pass
+TRANSCRIBE_CHUNK_OVERLAP = 2.0          # seconds shared by neighbouring chunks
+TRANSCRIBE_SILENCE_SEARCH = 30.0        # look this far around an even split for a pause
+
+# 15. Two-speaker split screen
+FACE_TRACK_FPS = 2.0              # frames per second sampled for face tracking
+FACE_DETECT_HEIGHT = 360          # frames are downscaled to this height before detection
+SPLIT_PANE_FACE_HEIGHT = 0.3      # a speaker's face fills this share of their pane's height
+SPLIT_MIN_SEPARATION = 0.15       # speakers must sit this far apart (fraction of width)
+
+# 16. Speaker diarization
+DIARIZATION_MAX_SPEAKERS = 4
+DIARIZATION_WINDOW = 1.5          # seconds of audio per speaker embedding
+DIARIZATION_HOP = 0.75
+DIARIZATION_MAX_WINDOWS = 2000    # clustered directly; the rest join the nearest cluster
+DIARIZATION_MIN_SILHOUETTE = 0.1  # below this, more speakers don't explain the audio better than one
+DIARIZATION_MIN_SHARE = 0.1       # share of a clip's talk time to count as one of its speakers
+
+# 17. Local file uploads
+UPLOADS_DIR = os.path.join(BASE_DIR, "uploads")  # one work directory per upload
+UPLOAD_MAX_BYTES = 20 * 1024 ** 3                # 20 GB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024              # bytes read from the request per step
+
+# 18. Output packaging (all produced by the encode itself, no second pass)
+OUTPUT_FASTSTART = True      # moov atom first, so playback starts before the download ends
+OUTPUT_FRAGMENTED = False    # fragmented MP4 (moof/mdat per keyframe) instead of faststart
+OUTPUT_HLS = False           # also write <name>_hls/playlist.m3u8 + fMP4 segments for the CDN
+HLS_SEGMENT_SECONDS = 2
+
+# 19. Job cancellation
+# Wall-clock budget per pipeline stage in seconds; a stage over budget is cancelled
+STAGE_BUDGETS = {
+    "download": 30 * 60,
+    "transcribe": 2 * 60 * 60,
+    "analyze": 20 * 60,
+    "render": 60 * 60,
+}
+TRANSCRIBE_CANCEL_CHUNK_SECONDS = 30  # single-process Whisper runs in chunks this long so cancel is quick
+
+# 20. Caption tracks (used instead of Whisper when they pass the quality checks)
+CAPTIONS_ENABLED = True
+CAPTION_LANGUAGES = ["en", "en-US", "en-GB", "hi"]  # creator subtitles tried in this order
+CAPTION_FORMATS = ["srv3", "vtt"]                    # preferred caption formats, best first
+CAPTION_SEGMENT_SECONDS = 8.0        # caption lines are grouped into segments up to this long
+CAPTION_MIN_COVERAGE = 0.5           # share of the audio the captions must span
+CAPTION_MIN_WORDS_PER_MINUTE = 40    # fewer means mostly [Music] labels or a broken track
+
+# 21. Distributed stage workers (python stage_worker.py work --db <shared path>)
+JOB_QUEUE_PATH = os.path.join(CACHE_DIR, "jobs.sqlite")  # put on a shared filesystem for multi-node
+JOB_WORK_DIR = os.path.join(CACHE_DIR, "jobs")             # per-job source/transcript files, also shared
+TASK_LEASE_SECONDS = 60       # a claimed task goes back to the queue if not heartbeated for this long
+TASK_HEARTBEAT_SECONDS = 15
+TASK_MAX_ATTEMPTS = 3
+TASK_RETRY_DELAY = 10         # seconds, multiplied by the attempt number
+WORKER_POLL_SECONDS = 2       # idle workers check for new tasks this often
+
+# 22. Render cache (re-runs only encode shorts whose source or edit parameters changed)
+RENDER_CACHE_ENABLED = True
+RENDER_CACHE_DIR = os.path.join(CACHE_DIR, "renders")
+RENDER_CACHE_MAX_BYTES = 20 * 1024 ** 3  # least recently used renders are evicted past this
+RENDER_CACHE_VERSION = 2                 # bump when a code change alters how shorts are rendered
+
+# 23. Stream-copy passthrough (cuts that need no crop, scale or overlay)
+KEYFRAME_INDEX_DIR = os.path.join(CACHE_DIR, "keyframes")  # one demux-pass index per source file
+PASSTHROUGH_CUT_MODE = "smart"   # "smart": re-encode only the partial GOP at the start; "snap": start on nearest keyframe
+PASSTHROUGH_HEAD_CRF = 18        # quality of that re-encoded head
+
+# 24. Decode resolution and memory governor (4K / multi-hour sources)
+DECODE_DOWNSCALE = True          # decode at the smallest size the layout's crops need, not the source size
+MEMORY_BUDGET_FRACTION = 0.6     # share of available RAM renders in one process may reserve
+MAX_CONCURRENT_DECODERS = 2
+MAX_CONCURRENT_ENCODERS = 2
+DECODER_FRAME_FACTOR = 8         # RGB frames a decoder holds at peak (ffmpeg threads + reader)
+ENCODER_FRAME_FACTOR = 60        # yuv420 frames libx264 holds at peak (lookahead + references)
+BUFFER_POOL_MAX_PER_SHAPE = 4
+
+# 25. Platform variants (one decode, one encoder per platform)
+# safe_area: (left, top, right, bottom) fractions of the frame covered by the app's UI
+PLATFORM_PROFILES = {
+    "shorts": {
+        "size": (1080, 1920),
+        "max_duration": 60,
+        "bitrate": "8000k",
+        "audio_bitrate": "192k",
+        "safe_area": (0.04, 0.08, 0.12, 0.20),
+    },
+    "reels": {
+        "size": (1080, 1920),
+        "max_duration": 90,
+        "bitrate": "6000k",
+        "audio_bitrate": "128k",
+        "safe_area": (0.06, 0.14, 0.06, 0.35),
+    },
+    "tiktok": {
+        "size": (1080, 1920),
+        "max_duration": 180,
+        "bitrate": "6000k",
+        "audio_bitrate": "128k",
+        "safe_area": (0.06, 0.10, 0.16, 0.26),
+    },
+    "feed": {
+        "size": (1080, 1080),
+        "max_duration": 60,
+        "bitrate": "5000k",
+        "audio_bitrate": "128k",
+        "safe_area": (0.05, 0.05, 0.05, 0.05),
+    },
+}
+DEFAULT_PLATFORMS = ["shorts", "reels", "tiktok", "feed"]
+VARIANT_QUEUE_FRAMES = 8   # decoded frames buffered per encoder, so one slow encoder doesn't stall the rest
+
+# 26. Transcript search (every processed episode, one full-text index)
+TRANSCRIPT_INDEX_PATH = os.path.join(CACHE_DIR, "transcripts.sqlite")
+KEEP_SOURCE_VIDEOS = False    # True: downloads are kept in SOURCE_VIDEO_DIR instead of deleted, so hits render offline
+SOURCE_VIDEO_DIR = os.path.join(CACHE_DIR, "source_videos")  # also where missing sources are re-downloaded for hits
+SEARCH_RESULT_LIMIT = 20
+SEARCH_HIT_PADDING = 3.0      # seconds of context before/after a hit when it is rendered as a short
+
+# 27. Thumbnails (best frame per short, written next to it with the caption)
+THUMBNAILS_ENABLED = True
+THUMBNAIL_FORMAT = "jpg"      # "jpg" or "webp"
+THUMBNAIL_QUALITY = 90
+THUMBNAIL_SAMPLES = 12        # candidate frames per short: the window's keyframes, strided down to this many
+THUMBNAIL_SCORE_HEIGHT = 640  # candidates are scored at this height (eyes still detectable)
+THUMBNAIL_WEIGHTS = {"sharpness": 0.35, "exposure": 0.2, "face": 0.3, "eyes": 0.15}
+
+# 28. Performance profiles (every speed/quality knob in one place)
+# presets: libx264 preset per render tier; max_fps: output frame rate cap (None = source rate);
+# face_scan_fps / face_scan_height: face counting samples this often, on frames this tall
+# (None = every frame / full size)
+# balanced keeps the old Whisper model, download ladder and presets, but unlike before it caps
+# output at 30 fps and samples the face scan at 4 fps; quality is the closest to the old renders
+PROFILES = {
+    "fast": {
+        "whisper_model": "tiny",
+        "format_ladder": [
+            'best[height<=480][ext=mp4]/best[height<=480]/best',
+            'worst[ext=mp4]/worst',
+        ],
+        "presets": {"preview": "ultrafast", "final": "veryfast", "archive": "veryfast"},
+        "max_fps": 24,
+        "face_scan_fps": 1.0,
+        "face_scan_height": 240,
+    },
+    "balanced": {
+        "whisper_model": WHISPER_MODEL,
+        "format_ladder": DOWNLOAD_FORMAT_LADDER,
+        "presets": {tier: settings["preset"] for tier, settings in RENDER_TIERS.items()},
+        "max_fps": 30,
+        "face_scan_fps": 4.0,
+        "face_scan_height": FACE_DETECT_HEIGHT,
+    },
+    "quality": {
+        "whisper_model": "small",
+        "format_ladder": ['best[height<=1080][ext=mp4]/best[height<=1080]/best'] + DOWNLOAD_FORMAT_LADDER,
+        "presets": {"preview": "veryfast", "final": "slow", "archive": "slow"},
+        "max_fps": None,
+        "face_scan_fps": 8.0,
+        "face_scan_height": 720,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+
+# Auto-tune: on startup cores (affinity + cgroup quota), RAM and a short parallel benchmark pick
+# worker counts and thread splits. False: TRANSCRIBE_WORKERS, MAX_CONCURRENT_* etc. are used as set above.
+AUTO_TUNE = True
+HARDWARE_PROBE_PATH = os.path.join(CACHE_DIR, "hardware.json")  # benchmark result, re-measured if the machine changes
+BENCHMARK_ROUNDS = 20
+WHISPER_MODEL_BYTES = {"tiny": 1 << 30, "base": 1 << 30, "small": 2 << 30, "medium": 5 << 30, "large": 10 << 30}
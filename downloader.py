@@ -0,0 +1,213 @@
+import os
+import glob
+import time
+import random
+
+try:
+    from yt_dlp import YoutubeDL
+    from yt_dlp.utils import DownloadError
+    YTDLP_AVAILABLE = True
+except ImportError:
+    YTDLP_AVAILABLE = False
+    print("⚠️ yt-dlp not available. Install with: pip install yt-dlp")
+
+from cancellation import check
+from caption_track import select_caption_track, parse_captions
+from config import (DOWNLOAD_FORMAT_LADDER, DOWNLOAD_MAX_RETRIES, DOWNLOAD_BACKOFF_BASE,
+                    DOWNLOAD_BACKOFF_MAX, DOWNLOAD_CONCURRENT_FRAGMENTS, CAPTIONS_ENABLED)
+
+# Errors that no amount of retrying the same format will fix
+FORMAT_ERRORS = ("requested format is not available", "no video formats found")
+
+
+class ResilientDownloader:
+    def __init__(self, outtmpl='temp_video.%(ext)s', format_ladder=None,
+                 max_retries=DOWNLOAD_MAX_RETRIES, backoff_base=DOWNLOAD_BACKOFF_BASE,
+                 backoff_max=DOWNLOAD_BACKOFF_MAX, concurrent_fragments=DOWNLOAD_CONCURRENT_FRAGMENTS,
+                 extra_opts=None, progress_hooks=None, cancel_token=None, captions=CAPTIONS_ENABLED):
+        if not YTDLP_AVAILABLE:
+            raise Exception("yt-dlp is not available. Install with: pip install yt-dlp")
+        self.outtmpl = outtmpl
+        self.format_ladder = format_ladder if format_ladder is not None else DOWNLOAD_FORMAT_LADDER
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.concurrent_fragments = concurrent_fragments
+        self.extra_opts = extra_opts or {}
+        self.progress_hooks = progress_hooks or []
+        self.cancel_token = cancel_token
+        self.captions = captions
+        self.stats = {}
+        self._transfer = {}
+
+    def backoff(self, n):
+        """Exponential backoff with jitter: base * 2^n for the n-th retry, capped."""
+        check(self.cancel_token)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** n))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _progress_hook(self, d):
+        # Called for every received block, so a cancel stops the transfer almost at once
+        check(self.cancel_token)
+        # Track bytes actually transferred in this process (resumed bytes excluded)
+        name = d.get("filename")
+        transfer = self._transfer.setdefault(name, {"start_bytes": None, "bytes": 0, "started": time.time()})
+        downloaded = d.get("downloaded_bytes") or 0
+        if transfer["start_bytes"] is None:
+            transfer["start_bytes"] = downloaded
+        transfer["bytes"] = max(transfer["bytes"], downloaded - transfer["start_bytes"])
+        transfer["total"] = d.get("total_bytes") or d.get("total_bytes_estimate")
+
+    def _ydl_opts(self, fmt):
+        opts = {
+            'format': fmt,
+            'outtmpl': self.outtmpl,
+            'noplaylist': True,
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            # Resumable: keep .part files and continue them with Range requests
+            'continuedl': True,
+            'nopart': False,
+            'concurrent_fragment_downloads': self.concurrent_fragments,
+            # One try per call: download() owns the retry budget, so
+            # max_retries is the real number of attempts per format
+            'retries': 0,
+            'fragment_retries': 0,
+            'file_access_retries': 0,
+            'extractor_retries': 0,
+            'skip_unavailable_fragments': False,
+            'progress_hooks': [self._progress_hook] + self.progress_hooks,
+        }
+        opts.update(self.extra_opts)
+        return opts
+
+    def _wait(self, attempt, what, error):
+        """Backoff before the next attempt; after the last one there is nothing to wait for."""
+        if attempt == self.max_retries - 1:
+            return
+        delay = self.backoff(attempt)
+        print(f"⚠️ {what} attempt {attempt + 1}/{self.max_retries} failed ({error}), "
+              f"retrying in {delay:.1f}s...")
+        if self.cancel_token is not None:
+            self.cancel_token.sleep(delay)
+        else:
+            time.sleep(delay)
+
+    def _resolve_format(self, url, fmt):
+        """
+        Resolves a format selector to concrete format ids once, so retries
+        keep it. Returns (format_id, filename), or None if the format doesn't
+        exist; transient errors are retried with backoff like downloads.
+        """
+        last_error = None
+        for attempt in range(self.max_retries):
+            check(self.cancel_token)
+            try:
+                with YoutubeDL(self._ydl_opts(fmt)) as ydl:
+                    info = ydl.extract_info(url, download=False)
+                    return info.get('format_id') or fmt, ydl.prepare_filename(info)
+            except DownloadError as e:
+                last_error = e
+                if any(msg in str(e).lower() for msg in FORMAT_ERRORS):
+                    print(f"⚠️ Format '{fmt}' unavailable: {e}")
+                    return None
+                self._wait(attempt, "Format lookup", e)
+        raise last_error
+
+    def _discard_partial(self, filename):
+        """Drops a given-up format's .part/fragment files, so the next format never resumes into them."""
+        prefix = os.path.splitext(filename)[0]
+        for path in glob.glob(glob.escape(prefix) + ".*"):
+            if ".part" in os.path.basename(path) or path.endswith(".ytdl"):
+                os.remove(path)
+
+    def download(self, url):
+        """
+        Downloads url walking down the format ladder. Each rung is retried
+        with exponential backoff on the same resolved format, resuming the
+        partial file; a rung that is given up on leaves no partial file
+        behind. Returns (path, info) with info["download_stats"] and, if
+        the video has a usable caption track, info["captions"].
+        """
+        started = time.time()
+        self._transfer = {}
+        last_error = None
+
+        for rung, fmt in enumerate(self.format_ladder):
+            check(self.cancel_token)
+            try:
+                resolved = self._resolve_format(url, fmt)
+            except DownloadError as e:
+                last_error = e
+                print(f"🔄 Could not look up format '{fmt}', trying the next one...")
+                continue
+            if resolved is None:
+                continue
+            format_id, filename = resolved
+
+            for attempt in range(self.max_retries):
+                check(self.cancel_token)
+                try:
+                    with YoutubeDL(self._ydl_opts(format_id)) as ydl:
+                        info = ydl.extract_info(url, download=True)
+                        path = ydl.prepare_filename(info)
+                        if self.captions:
+                            info['captions'] = self.fetch_captions(ydl, info)
+                    self._finish_stats(started, format_id, rung, attempt)
+                    info['download_stats'] = self.stats
+                    return path, info
+                except DownloadError as e:
+                    last_error = e
+                    if any(msg in str(e).lower() for msg in FORMAT_ERRORS):
+                        break
+                    self._wait(attempt, "Download", e)
+
+            print(f"🔄 Giving up on format '{format_id}', trying the next one...")
+            self._discard_partial(filename)
+
+        raise Exception(f"Could not download video: {last_error}")
+
+    def fetch_captions(self, ydl, info):
+        """
+        Streams the best caption track (same session/cookies as the video)
+        straight into the parser. Returns {"segments", "language",
+        "automatic", "format"} or None; a missing or broken track never fails
+        the download.
+        """
+        track = select_caption_track(info)
+        if track is None:
+            print("ℹ️ No caption track, Whisper will transcribe")
+            return None
+        check(self.cancel_token)
+        try:
+            started = time.time()
+            with ydl.urlopen(track["url"]) as response:
+                segments = parse_captions(response, track["format"])
+            kind = "automatic" if track["automatic"] else "uploaded"
+            print(f"📝 {kind.capitalize()} {track['language']} captions: {len(segments)} segments "
+                  f"in {time.time() - started:.2f}s")
+            return {
+                "segments": segments,
+                "language": track["language"],
+                "automatic": track["automatic"],
+                "format": track["format"],
+            }
+        except Exception as e:
+            print(f"⚠️ Caption track unavailable: {e}")
+            return None
+
+    def _finish_stats(self, started, format_id, rung, attempt):
+        elapsed = time.time() - started
+        transferred = sum(t["bytes"] for t in self._transfer.values())
+        self.stats = {
+            "format_id": format_id,
+            "ladder_rung": rung,
+            "attempts": attempt + 1,
+            "bytes": transferred,
+            "seconds": elapsed,
+            "throughput_mbps": transferred * 8 / elapsed / 1e6 if elapsed > 0 else 0.0,
+        }
+        print(f"✅ Downloaded {transferred / 1e6:.1f} MB in {elapsed:.1f}s "
+              f"({self.stats['throughput_mbps']:.1f} Mbit/s, format {format_id}, "
+              f"attempt {attempt + 1})")
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+
+from config import JOB_QUEUE_PATH, TASK_LEASE_SECONDS, TASK_MAX_ATTEMPTS, TASK_RETRY_DELAY
+
+# Later stages are claimed first, so a started job finishes before new ones fan out
+STAGE_PRIORITY = {"download": 0, "transcribe": 1, "analyze": 2, "face_index": 3, "render": 4}
+
+
+def json_default(value):
+    # numpy scalars/arrays from the scorers end up in payloads and results
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, default=json_default)
+
+
+class JobQueue:
+    """
+    Pipeline tasks in one SQLite file that every worker (on any machine that
+    mounts it) claims from. A claim is a lease: the worker must heartbeat
+    before lease_expires or the task goes back to pending for someone else,
+    which is how a dead node's work gets requeued. Completing a task and
+    enqueueing the tasks it fans out to is one transaction, and only the
+    current lease owner can do it.
+
+    The default rollback journal is kept on purpose: WAL needs shared memory
+    and doesn't work when the file is on a network filesystem.
+    """
+
+    def __init__(self, db_path=JOB_QUEUE_PATH, lease_seconds=TASK_LEASE_SECONDS,
+                 max_attempts=TASK_MAX_ATTEMPTS, retry_delay=TASK_RETRY_DELAY):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks (status, priority, available_at);
+            CREATE INDEX IF NOT EXISTS idx_tasks_job ON tasks (job_id);
+        """)
+        conn.close()
+
+    def _connect(self):
+        # Autocommit mode so transactions are explicit (BEGIN IMMEDIATE takes the write lock up front)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _insert(self, conn, job_id, stage, payload, now):
+        conn.execute(
+            "INSERT INTO tasks (job_id, stage, priority, payload, status, max_attempts, available_at, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, 'pending', ?, ?, ?, ?)",
+            (job_id, stage, STAGE_PRIORITY.get(stage, 0), _dumps(payload), self.max_attempts, now, now, now)
+        )
+
+    def submit(self, stage, payload, job_id=None):
+        """Starts a job with its first task. Returns the job id."""
+        job_id = job_id or uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            self._insert(conn, job_id, stage, payload, time.time())
+        finally:
+            conn.close()
+        return job_id
+
+    def _requeue_expired(self, conn, now):
+        """Tasks whose worker stopped heartbeating: retried, or failed once out of attempts."""
+        conn.execute("""
+            UPDATE tasks
+            SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                error = 'Lease expired (worker ' || lease_owner || ' stopped heartbeating)',
+                lease_owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE status = 'leased' AND lease_expires < ?
+        """, (now, now))
+
+    def claim(self, worker_id, stages=None):
+        """
+        Leases the next runnable task (optionally only of the given stages).
+        Returns {"id", "job_id", "stage", "payload", "attempts"} or None.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            self._requeue_expired(conn, now)
+            query = "SELECT * FROM tasks WHERE status = 'pending' AND available_at <= ?"
+            params = [now]
+            if stages:
+                query += f" AND stage IN ({', '.join('?' * len(stages))})"
+                params += list(stages)
+            row = conn.execute(query + " ORDER BY priority DESC, id LIMIT 1", params).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            return {
+                "id": row["id"],
+                "job_id": row["job_id"],
+                "stage": row["stage"],
+                "payload": json.loads(row["payload"]),
+                "attempts": row["attempts"] + 1,
+            }
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, task_id, worker_id):
+        """Extends the lease. False means it was lost (expired and requeued, or job cancelled)."""
+        conn = self._connect()
+        try:
+            now = time.time()
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased' AND lease_expires >= ?",
+                (now + self.lease_seconds, now, task_id, worker_id, now)
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, task_id, worker_id, result=None, follow_ups=()):
+        """
+        Marks the task done and enqueues follow_ups [(stage, payload), ...]
+        atomically. Returns False (and changes nothing) if worker_id no longer
+        holds the lease.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT job_id FROM tasks WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (task_id, worker_id)
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (_dumps(result), now, task_id)
+            )
+            for stage, payload in follow_ups:
+                self._insert(conn, row["job_id"], stage, payload, now)
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def fail(self, task_id, worker_id, error):
+        """Gives the task back for a delayed retry, or marks it failed after max_attempts."""
+        conn = self._connect()
+        try:
+            now = time.time()
+            conn.execute("""
+                UPDATE tasks
+                SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                    available_at = ? + ? * attempts,
+                    error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'leased'
+            """, (now, self.retry_delay, str(error), now, task_id, worker_id))
+        finally:
+            conn.close()
+
+    def cancel_job(self, job_id):
+        """Cancels every unfinished task of a job; running ones notice at their next heartbeat."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'cancelled', lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE job_id = ? AND status IN ('pending', 'leased')",
+                (time.time(), job_id)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def job_status(self, job_id):
+        """Per-stage task counts, overall state and the finished tasks' results."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT stage, status, result, error FROM tasks WHERE job_id = ? ORDER BY id", (job_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        stages = {}
+        results = {}
+        errors = []
+        for row in rows:
+            counts = stages.setdefault(row["stage"], {})
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+            if row["status"] == "done":
+                results.setdefault(row["stage"], []).append(json.loads(row["result"]))
+            elif row["status"] == "failed":
+                errors.append(f"{row['stage']}: {row['error']}")
+
+        statuses = {row["status"] for row in rows}
+        if not rows:
+            state = "unknown"
+        elif statuses & {"pending", "leased"}:
+            state = "running"
+        elif "failed" in statuses:
+            state = "failed"
+        elif "cancelled" in statuses:
+            state = "cancelled"
+        else:
+            state = "done"
+        return {"job_id": job_id, "state": state, "stages": stages, "results": results, "errors": errors}
+
+    def is_idle(self):
+        """True when no task anywhere is pending or leased."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')").fetchone()
+            return row[0] == 0
+        finally:
+            conn.close()
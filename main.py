@@ -2,7 +2,8 @@ import os
 import argparse
 import re
 import json
-from moviepy.editor import VideoFileClip, ColorClip, TextClip, CompositeVideoClip, AudioClip
+from moviepy.editor import VideoFileClip, ColorClip, TextClip, AudioClip, AudioFileClip
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
 import numpy as np
 from datetime import datetime
 try:
@@ -14,7 +15,6 @@ except ImportError:
 
 try:
     import yt_dlp
-    from yt_dlp import YoutubeDL
     YTDLP_AVAILABLE = True
 except ImportError:
     YTDLP_AVAILABLE = False
@@ -27,21 +27,46 @@ except ImportError:
     WHISPER_AVAILABLE = False
     print(" Whisper not available, using fallback mode")
 
-from transformers import pipeline
-try:
-    from advanced_generator import AdvancedShortsGenerator
-    ADVANCED_AVAILABLE = True
-except ImportError:
-    ADVANCED_AVAILABLE = False
-    print(" Advanced features not available")
-
 from video_manager import VideoManager
+from segment_scorer import SegmentScorer
+from clip_selector import select_clip_windows
+from short_summarizer import ShortSummarizer
+from segment_classifier import SegmentClassifier, TRANSFORMERS_AVAILABLE
+from audio_fingerprint import FingerprintIndex, fingerprint_file
+from downloader import ResilientDownloader
+from parallel_transcriber import ParallelTranscriber, transcribe_in_chunks
+from caption_track import caption_quality
+from split_screen import choose_layout, track_faces, scale_tracks
+from compositor import FrameCompositor, render_caption
+from speaker_diarizer import SpeakerDiarizer, clip_speaker_stats, needs_face_scan
+from output_packaging import packaging_plan, temp_audio_path, hls_playlist_path
+from cancellation import CancelToken, JobCancelled
+from render_cache import RenderCache, render_key
+from stream_copy import load_keyframe_index, passthrough_eligible, passthrough_cut
+from memory_governor import FRAME_POOL, GOVERNOR, decode_size, source_frame_size, decoder_bytes, encoder_bytes
+from platform_variants import render_platform_variants, variants_decode_scale, variant_path
+from transcript_index import TranscriptIndex, hit_window
+from thumbnails import select_thumbnail, thumbnail_path
+from auto_tune import resolve_profile
+from config import (MIN_CLIP_DURATION, MAX_CLIP_DURATION, RENDER_TIERS, EMOTION_RANK_WEIGHT,
+                    TRANSCRIBE_PARALLEL_MIN_SECONDS, PROFILES, DEFAULT_PROFILE,
+                    OUTPUT_FASTSTART, OUTPUT_FRAGMENTED, OUTPUT_HLS, TRANSCRIBE_CANCEL_CHUNK_SECONDS,
+                    BACKGROUND_MUSIC_VOLUME, RENDER_CACHE_ENABLED, DECODE_DOWNSCALE, PLATFORM_PROFILES,
+                    DEFAULT_PLATFORMS, KEEP_SOURCE_VIDEOS, SOURCE_VIDEO_DIR, THUMBNAILS_ENABLED)
 
 class YouTubeShortsGenerator:
-    def __init__(self, use_advanced=True):
+    def __init__(self, use_advanced=True, profile=None):
+        # Profile (fast/balanced/quality) के knobs + इस machine के हिसाब से workers/threads
+        self.profile = resolve_profile(profile)
+        GOVERNOR.max_decoders = self.profile["max_decoders"]
+        GOVERNOR.max_encoders = self.profile["max_encoders"]
+        print(f"⚙️ Profile '{self.profile['name']}': Whisper {self.profile['whisper_model']}, "
+              f"{self.profile['transcribe_workers']} transcribe workers x {self.profile['transcribe_threads']} threads, "
+              f"{self.profile['max_encoders']} parallel encodes")
+        
         if WHISPER_AVAILABLE:
             try:
-                self.model = whisper.load_model("base")
+                self.model = whisper.load_model(self.profile["whisper_model"])
             except Exception as e:
                 print(f" Whisper model loading failed: {e}")
                 print("  Using fallback mode...")
@@ -50,12 +75,21 @@ class YouTubeShortsGenerator:
         else:
             self.model = None
         
-        self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
+        self.summarizer = ShortSummarizer(num_threads=self.profile["model_threads"])
+        self.segment_scorer = SegmentScorer()
+        self.video_manager = VideoManager()
+        self.fingerprints = FingerprintIndex()
+        self.diarizer = SpeakerDiarizer()
+        self.render_cache = RenderCache() if RENDER_CACHE_ENABLED else None
+        self.transcript_index = TranscriptIndex()
+        self._face_tracks = {}
+        self.segment_classifier = (SegmentClassifier(num_threads=self.profile["model_threads"])
+                                   if TRANSFORMERS_AVAILABLE else None)
+        # हर render create_short_video से होता है; advanced generator (mediapipe) अब load नहीं होता,
+        # use_advanced सिर्फ पुराने callers के लिए रखा है
         self.use_advanced = use_advanced
-        if use_advanced:
-            self.advanced_generator = AdvancedShortsGenerator()
         
-    def download_video(self, url):
+    def download_video(self, url, cancel_token=None, output_template='temp_video.%(ext)s'):
         """YouTube video download करता है - NO DEMO MODE"""
         print("📥 Downloading real YouTube video...")
         print("⚠️ Demo mode removed - processing actual content only")
@@ -63,88 +97,154 @@ class YouTubeShortsGenerator:
         if not YTDLP_AVAILABLE:
             raise Exception("yt-dlp is not available. Install with: pip install yt-dlp")
         
-        ydl_opts = {
-            'format': 'best[height<=720][ext=mp4]/best[height<=720]/best',
-            'outtmpl': 'temp_video.%(ext)s',
-            'extractaudio': False,
-            'noplaylist': True,
+        browser_opts = {
             'cookiesfrombrowser': ('chrome',),
             'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'referer': 'https://www.youtube.com/',
-            'sleep_interval': 1,
-            'max_sleep_interval': 5,
-            'ignoreerrors': True,
         }
         
+        # Concurrent fragments, resumable .part files, backoff retries on the
+        # same format and a bounded format ladder (profile का format_ladder)
         try:
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                video_path = f"temp_video.{info['ext']}"
-                
-                # Ensure we have a valid video format
-                if info['ext'] not in ['mp4', 'webm', 'mkv']:
-                    print(f"⚠️ Unsupported format: {info['ext']}, trying to convert...")
-                    # Try to download in mp4 format
-                    ydl_opts['format'] = 'best[ext=mp4]/best'
-                    with YoutubeDL(ydl_opts) as ydl2:
-                        info = ydl2.extract_info(url, download=True)
-                        video_path = f"temp_video.{info['ext']}"
-                
-                return video_path, info
+            return ResilientDownloader(outtmpl=output_template, format_ladder=self.profile["format_ladder"],
+                                       extra_opts=browser_opts, cancel_token=cancel_token).download(url)
+        except JobCancelled:
+            raise
         except Exception as e:
             print(f"❌ Download failed: {e}")
-            print("🔄 Trying alternative download method...")
-            
-            # Alternative method with different options
-            ydl_opts_alt = {
-                'format': 'worst[ext=mp4]/worst',
-                'outtmpl': 'temp_video.%(ext)s',
-                'extractaudio': False,
-                'noplaylist': True,
-            }
+            # Network/format errors ने retry budget पहले ही खर्च कर दिया, rerun सिर्फ cookie failure पर
+            if "cookie" not in str(e).lower():
+                raise
+            print("🔄 Retrying without browser cookies...")
             
+            # Same output template, so any partial file is resumed, not restarted
             try:
-                with YoutubeDL(ydl_opts_alt) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                    video_path = f"temp_video.{info['ext']}"
-                    return video_path, info
+                return ResilientDownloader(outtmpl=output_template, format_ladder=self.profile["format_ladder"],
+                                           cancel_token=cancel_token).download(url)
+            except JobCancelled:
+                raise
             except Exception as e2:
                 print(f"❌ Alternative download also failed: {e2}")
                 raise Exception(f"Could not download video: {e2}")
     
-    def extract_audio_and_transcribe(self, video_path):
-        """Audio extract करके transcription करता है with speaker diarization"""
+    def load_local_video(self, video_path, source_id=None):
+        """Local file (upload या disk) को download_video जैसा (path, info) बनाता है - कोई download नहीं"""
+        print(f"📂 Using local video: {video_path}")
+        if not os.path.exists(video_path):
+            raise Exception(f"Video file not found: {video_path}")
+        
+        # Duration header से - पूरा video reader खोलने की ज़रूरत नहीं
+        info = {
+            "id": source_id or os.path.splitext(os.path.basename(video_path))[0],
+            "title": os.path.basename(video_path),
+            "duration": ffmpeg_parse_infos(video_path)["duration"],
+            "local": True
+        }
+        return video_path, info
+    
+    def extract_audio_and_transcribe(self, video_path, source_id=None, parallel=None, cancel_token=None,
+                                     captions=None, audio_path="temp_audio.wav", source_info=None):
+        """
+        Audio extract करके transcription करता है with speaker diarization.
+        parallel=None: लंबे audio (TRANSCRIBE_PARALLEL_MIN_SECONDS+) को multi-core chunks में transcribe करता है
+        captions: download_video का info["captions"] - quality checks pass हों तो Whisper चलता ही नहीं
+        source_info: download/load का info (title, webpage_url) - transcript search index में जाता है
+        """
         print("🎵 Audio extracting, transcribing, and speaker analysis...")
         
-        # Audio extract करना
-        video = VideoFileClip(video_path)
+        # Audio extract करना - सिर्फ audio reader, 4K video decoder नहीं खुलता
+        infos = ffmpeg_parse_infos(video_path)
         
         # Check if video has audio
-        if video.audio is None:
+        if not infos.get("audio_found"):
             print("❌ ERROR: No audio track found in video!")
             print("🚫 Cannot process content without audio. Please provide a video with audio.")
-            video.close()
             raise ValueError("Video must contain audio track for transcription and analysis")
         
-        audio_path = "temp_audio.wav"
-        video.audio.write_audiofile(audio_path, verbose=False, logger=None)
-        video.close()
+        audio = AudioFileClip(video_path)
+        audio.write_audiofile(audio_path, verbose=False, logger=None)
+        audio_duration = infos["duration"]
+        audio.close()
+        
+        # Re-upload / re-run check: यही soundtrack पहले process हुआ है (इसी id से या किसी और से) तो
+        # transcript, segment scores और face index reuse करना - Whisper नहीं चलता
+        source_id = source_id or os.path.splitext(os.path.basename(video_path))[0]
+        fingerprint = None
+        try:
+            self.fingerprints.bind_file(source_id, video_path)
+            fingerprint = fingerprint_file(audio_path)
+            if self.fingerprints.unchanged(source_id, fingerprint[0], fingerprint[1]):
+                # Same id, same audio: अपने ही artifacts, कोई shift नहीं
+                cached = self.fingerprints.load_artifact(source_id, "transcript")
+                if cached:
+                    print(f"♻️ '{source_id}' was processed before with the same audio, reusing its transcript")
+                    segments = cached["segments"]
+                    self.index_transcript(source_id, segments, video_path, audio_duration, source_info)
+                    return segments, " ".join(s["text"] for s in segments)
+            else:
+                # दूसरा source (या इसी id का अलग encode) - offset align करके सब कुछ नई timeline पर
+                match = self.fingerprints.match(fingerprint[0], fingerprint[1])
+                segments = self.fingerprints.reuse_artifacts(
+                    match["source_id"], source_id, match["offset"], fingerprint[2]
+                ) if match else None
+                if segments is not None:
+                    print(f"♻️ Same audio as '{match['source_id']}' (offset {match['offset']:.1f}s, "
+                          f"{match['ratio']:.0%} of hashes), reusing its transcript, scores and faces")
+                    self.fingerprints.add_source(source_id, *fingerprint)
+                    self.index_transcript(source_id, segments, video_path, audio_duration, source_info)
+                    return segments, " ".join(s["text"] for s in segments)
+        except Exception as e:
+            print(f"⚠️ Audio fingerprinting failed: {e}")
+        
+        # Reuse नहीं हुआ: इस id के पुराने scores/face windows किसी और audio के हैं
+        self.fingerprints.drop_artifacts(source_id, "scores", "faces")
+        
+        # YouTube captions (creator या automatic) मौजूद हों तो वही transcript
+        if captions:
+            usable, reason = caption_quality(captions["segments"], audio_duration)
+            if usable:
+                print(f"⚡ Using {captions['language']} caption track instead of Whisper")
+                segments = captions["segments"]
+                self.label_and_save_transcript(audio_path, segments, source_id, fingerprint)
+                self.index_transcript(source_id, segments, video_path, audio_duration, source_info)
+                return segments, " ".join(s["text"] for s in segments)
+            print(f"⚠️ Caption track rejected ({reason}), falling back to Whisper")
+        
+        if parallel is None:
+            parallel = self.profile["transcribe_workers"] > 1 and audio_duration >= TRANSCRIBE_PARALLEL_MIN_SECONDS
         
         if self.model is not None:
             try:
-                # Transcription
-                result = self.model.transcribe(audio_path)
-                
-                # Timestamps के साथ segments
-                segments = []
-                for segment in result["segments"]:
-                    segments.append({
-                        "start": segment["start"],
-                        "end": segment["end"],
-                        "text": segment["text"].strip()
-                    })
+                if parallel:
+                    # Silence पर chunks, हर worker process का अपना model
+                    segments, full_text = ParallelTranscriber(
+                        model_name=self.profile["whisper_model"], workers=self.profile["transcribe_workers"],
+                        threads_per_worker=self.profile["transcribe_threads"]
+                    ).transcribe(audio_path, cancel_token)
+                elif cancel_token is not None:
+                    # छोटे chunks ताकि cancel/timeout एक chunk के अंदर लग जाए
+                    segments, full_text = transcribe_in_chunks(
+                        self.model, audio_path, TRANSCRIBE_CANCEL_CHUNK_SECONDS, cancel_token
+                    )
+                else:
+                    # Transcription
+                    result = self.model.transcribe(audio_path)
+                    full_text = result["text"]
+                    
+                    # Timestamps के साथ segments
+                    segments = []
+                    for segment in result["segments"]:
+                        segments.append({
+                            "start": segment["start"],
+                            "end": segment["end"],
+                            "text": segment["text"].strip()
+                        })
                 
-                return segments, result["text"]
+                self.label_and_save_transcript(audio_path, segments, source_id, fingerprint)
+                self.index_transcript(source_id, segments, video_path, audio_duration, source_info)
+                return segments, full_text
+            except JobCancelled:
+                raise
             except Exception as e:
                 print(f"⚠️ Whisper transcription failed: {e}")
                 print("🔄 Using fallback transcription...")
@@ -152,7 +252,7 @@ class YouTubeShortsGenerator:
             print("🔄 Whisper not available, using fallback transcription...")
         
         # Fallback: Create dummy segments
-        duration = video.duration
+        duration = audio_duration
         segments = []
         for i in range(0, int(duration), 10):  # Every 10 seconds
             segments.append({
@@ -163,34 +263,100 @@ class YouTubeShortsGenerator:
         
         return segments, "Video transcription placeholder"
     
-    def analyze_content(self, full_text):
-        """Content analysis करके viral moments identify करता है"""
+    def label_and_save_transcript(self, audio_path, segments, source_id, fingerprint):
+        """Segments पर speaker ids लगाकर transcript को fingerprint artifact के रूप में save करता है"""
+        # हर segment पर speaker id (transcript के साथ cache होता है)
+        try:
+            self.diarizer.label_segments(audio_path, segments)
+        except Exception as e:
+            print(f"⚠️ Speaker diarization failed: {e}")
+        
+        # अगली बार re-upload मिले तो यही transcript काम आएगा
+        if fingerprint is not None:
+            self.fingerprints.add_source(source_id, *fingerprint)
+            self.fingerprints.save_artifact(source_id, "transcript", {"segments": segments})
+    
+    def index_transcript(self, source_id, segments, video_path, duration, source_info=None):
+        """Transcript को full-text search index में डालना, ताकि बाद में बिना re-transcribe search हो सके"""
+        source_info = source_info or {}
+        try:
+            count = self.transcript_index.add_transcript(
+                source_id, segments, title=source_info.get("title"), url=source_info.get("webpage_url"),
+                video_path=video_path, duration=duration
+            )
+            print(f"🔎 Indexed {count} transcript segments for search")
+        except Exception as e:
+            print(f"⚠️ Transcript indexing failed: {e}")
+    
+    def source_video_for(self, source_id, cancel_token=None):
+        """Search hit का source video: disk पर unchanged हो तो वही, वरना URL से दोबारा download (transcribe नहीं)"""
+        video_path = self.transcript_index.cached_video(source_id)
+        if video_path:
+            return video_path
+        source = self.transcript_index.get_source(source_id)
+        if not source or not source["url"]:
+            raise Exception(f"Source video for '{source_id}' is gone and has no URL to download it from")
+        print(f"⬇️ Source '{source_id}' not cached, downloading it again (transcript is reused)")
+        os.makedirs(SOURCE_VIDEO_DIR, exist_ok=True)
+        template = os.path.join(SOURCE_VIDEO_DIR, f"{source_id}.%(ext)s")
+        video_path, _ = self.download_video(source["url"], cancel_token, output_template=template)
+        self.transcript_index.set_video_path(source_id, video_path)
+        return video_path
+    
+    def render_search_hits(self, hits, output_dir="generated_shorts", tier="final", cancel_token=None):
+        """
+        Transcript search के hits ({"source_id", "start", "end", "text"}) सीधे shorts में - cached source से,
+        बिना transcription. Returns generate_shorts जैसी list
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        rendered = []
+        for hit in hits:
+            source = self.transcript_index.get_source(hit["source_id"]) or {}
+            video_path = self.source_video_for(hit["source_id"], cancel_token)
+            start_time, end_time = hit_window(hit, source.get("duration"))
+            
+            face_count = self.detect_faces_and_people(video_path, start_time, end_time, cancel_token)
+            output_path = os.path.join(output_dir, f"search_{hit['source_id']}_{int(start_time)}.mp4")
+            self.create_short_video(video_path, start_time, end_time, output_path, hit["text"], face_count,
+                                    tier=tier, cancel_token=cancel_token)
+            thumbnail = self.create_thumbnail(video_path, start_time, end_time, output_path, hit["text"],
+                                              face_count, out_size=RENDER_TIERS[tier]["size"],
+                                              cancel_token=cancel_token)
+            
+            self.video_manager.register_short(
+                output_path,
+                source_id=hit["source_id"],
+                start_time=start_time,
+                end_time=end_time,
+                text=hit["text"],
+                title=source.get("title"),
+                face_count=face_count
+            )
+            rendered.append({
+                "path": output_path,
+                "thumbnail": thumbnail,
+                "text": hit["text"],
+                "title": source.get("title"),
+                "start_time": start_time,
+                "end_time": end_time,
+                "face_count": face_count,
+                "source_id": hit["source_id"]
+            })
+        return rendered
+    
+    def analyze_content(self, full_text, segments=None):
+        """Content analysis करके viral moments identify करता है (BM25 hooks + distinctiveness)"""
         print("🔍 Content analyzing...")
         
-        # Text को chunks में divide करना
-        sentences = re.split(r'[.!?]+', full_text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        # Key phrases और emotional content detect करना
-        viral_keywords = [
-            "amazing", "incredible", "unbelievable", "shocking", "wow", "omg",
-            "you won't believe", "this will blow your mind", "wait for it",
-            "अद्भुत", "अविश्वसनीय", "चौंकाने वाला", "वाह", "क्या बात है"
-        ]
-        
-        viral_moments = []
-        for i, sentence in enumerate(sentences):
-            if any(keyword.lower() in sentence.lower() for keyword in viral_keywords):
-                viral_moments.append({
-                    "sentence": sentence,
-                    "index": i,
-                    "score": len([k for k in viral_keywords if k.lower() in sentence.lower()])
-                })
+        # Whisper segments मिलें तो उन्हीं को score करना, नहीं तो sentences को
+        if segments is None:
+            sentences = re.split(r'[.!?]+', full_text)
+            segments = [{"text": s.strip()} for s in sentences if s.strip()]
         
-        # Score के basis पर sort करना
-        viral_moments.sort(key=lambda x: x["score"], reverse=True)
+        # सभी segments एक साथ sparse matrix में score होते हैं
+        viral_moments = self.segment_scorer.top_moments(segments, top_k=10)
         
-        return viral_moments[:10]  # Top 10 viral moments
+        return viral_moments  # Top 10 viral moments
     
     def find_timestamps_for_moments(self, viral_moments, segments):
         """Viral moments के लिए timestamps find करता है"""
@@ -201,6 +367,16 @@ class YouTubeShortsGenerator:
         for moment in viral_moments:
             sentence = moment["sentence"]
             
+            # Segment-level moments already carry their timestamps
+            if "start" in moment:
+                moments_with_timestamps.append({
+                    "text": sentence,
+                    "start": moment["start"],
+                    "end": moment["end"],
+                    "score": moment["score"]
+                })
+                continue
+            
             # Best matching segment find करना
             best_match = None
             best_score = 0
@@ -227,16 +403,102 @@ class YouTubeShortsGenerator:
         
         return moments_with_timestamps
     
-    def detect_faces_and_people(self, video_path, start_time, end_time):
-        """Video में faces detect करता है"""
+    def find_clip_windows(self, segments, top_k=5, source_id=None):
+        """
+        Segment scores से sentence boundaries पर best 15-60s clip windows find करता है.
+        source_id: scores (BM25 + sentiment/emotion) उस source के साथ save होते हैं, re-run/re-upload पर reuse
+        """
+        print("🪟 Selecting clip windows...")
+        
+        scores = self.stored_scores(source_id, segments) if source_id else None
+        if scores is None:
+            scores = self.segment_scorer.score(segments)["score"]
+            
+            # Sentiment/emotion: emotionally intense segments को boost करना
+            if self.segment_classifier is not None:
+                try:
+                    self.segment_classifier.annotate(segments)
+                    intensity = np.array([SegmentClassifier.intensity(s) for s in segments])
+                    scores = scores * (1.0 + EMOTION_RANK_WEIGHT * intensity)
+                except Exception as e:
+                    print(f"⚠️ Sentiment/emotion scoring failed: {e}")
+            
+            if source_id:
+                self.fingerprints.save_artifact(source_id, "scores", {"segments": [
+                    dict({key: s[key] for key in ("start", "end", "text", "sentiment", "emotion") if key in s},
+                         score=float(score))
+                    for s, score in zip(segments, scores)
+                ]})
+        
+        windows = select_clip_windows(
+            segments, scores,
+            min_duration=MIN_CLIP_DURATION,
+            max_duration=MAX_CLIP_DURATION,
+            top_k=top_k
+        )
+        
+        for window in windows:
+            window["viral_score"] = window["score"]
+            window.update(clip_speaker_stats(segments, window["first_segment"], window["last_segment"]))
+            hook = segments[window["hook_segment"]]
+            for task in ("sentiment", "emotion"):
+                if task in hook:
+                    window[task] = hook[task]
+        
+        return windows
+    
+    def stored_scores(self, source_id, segments):
+        """
+        इसी transcript के saved segment scores (sentiment/emotion segments पर वापस लगते हैं),
+        वरना None. Transcript बदल गया हो (दूसरे segments/text) तो reuse नहीं
+        """
+        stored = self.fingerprints.load_artifact(source_id, "scores")
+        if not stored or len(stored["segments"]) != len(segments):
+            return None
+        if any(abs(old["start"] - s["start"]) > 1e-3 or old["text"] != s["text"]
+               for old, s in zip(stored["segments"], segments)):
+            return None
+        
+        print(f"♻️ Reusing stored scores for {len(segments)} segments of '{source_id}'")
+        for old, segment in zip(stored["segments"], segments):
+            for task in ("sentiment", "emotion"):
+                if task in old:
+                    segment[task] = old[task]
+        return np.array([old["score"] for old in stored["segments"]])
+    
+    def detect_faces_and_people(self, video_path, start_time, end_time, cancel_token=None):
+        """Video में faces detect करता है (इसी source या उसके re-upload का same window पहले scan हुआ हो तो वही count)"""
         print("👥 Detecting faces...")
         
+        source_id = self.fingerprints.source_for_file(video_path)
+        window = self.fingerprints.face_window(source_id, start_time, end_time) if source_id else None
+        if window is not None and "face_count" in window:
+            print(f"♻️ Reusing stored face count: {window['face_count']}")
+            return window["face_count"]
+        
         if not CV2_AVAILABLE:
             print("⚠️ OpenCV not available, returning default face count")
             return 1  # Default to 1 face
         
+        # Face scan भी एक decoder है - RAM budget में गिना जाए
+        with GOVERNOR.decoding(source_frame_size(video_path), cancel_token):
+            face_count = self._scan_faces(video_path, start_time, end_time, cancel_token)
+        if source_id:
+            self.fingerprints.save_face_window(source_id, start_time, end_time, face_count=face_count)
+        return face_count
+    
+    def _scan_faces(self, video_path, start_time, end_time, cancel_token=None):
+        """
+        Clip के frames में faces गिनता है, सबसे ज़्यादा वाली count return.
+        Profile का face_scan_fps / face_scan_height: कितने frames और कितने बड़े (None = हर frame, full size)
+        """
         cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        scan_fps = self.profile["face_scan_fps"]
+        step = max(1, int(round(fps / scan_fps))) if scan_fps else 1
+        src_h = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        scan_height = self.profile["face_scan_height"]
+        scale = min(1.0, scan_height / src_h) if scan_height and src_h else 1.0
         
         # Start और end frame calculate करना
         start_frame = int(start_time * fps)
@@ -251,81 +513,258 @@ class YouTubeShortsGenerator:
         cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
         
         while cap.isOpened() and frame_count < (end_frame - start_frame):
-            ret, frame = cap.read()
+            if cancel_token is not None and cancel_token.cancelled:
+                cap.release()
+                cancel_token.check()
+            # जो frames scan नहीं होने, उनका BGR conversion भी skip (grab only)
+            if not cap.grab():
+                break
+            frame_count += 1
+            if (frame_count - 1) % step:
+                continue
+            ret, frame = cap.retrieve()
             if not ret:
                 break
             
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if scale < 1.0:
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
             faces = face_cascade.detectMultiScale(gray, 1.1, 4)
             
             if len(faces) > face_count:
                 face_count = len(faces)
-            
-            frame_count += 1
         
         cap.release()
         return face_count
     
-    def create_short_video(self, video_path, start_time, end_time, output_path, text_content, face_count):
-        """Individual short video create करता है"""
-        print(f"🎬 Creating short: {output_path}")
-        
-        # Video clip extract करना
-        video = VideoFileClip(video_path)
-        clip = video.subclip(start_time, end_time)
-        
-        # Aspect ratio को 9:16 (vertical) में convert करना
-        clip = clip.resize(height=1920)
-        
-        # Width को 1080 में set करना (9:16 ratio)
-        clip = clip.resize(width=1080)
-        
-        # Face count के basis पर layout decide करना
-        if face_count > 1:
-            # Multiple people - side by side layout
-            clip = self.create_side_by_side_layout(clip)
-        else:
-            # Single person - center crop
-            clip = self.create_center_crop(clip)
-        
-        # Background music add करना (5-6% volume)
-        clip = self.add_background_music(clip)
-        
-        # Text overlay add करना
-        clip = self.add_text_overlay(clip, text_content)
-        
-        # Final touches
-        clip = clip.fadein(0.5).fadeout(0.5)
-        
-        # Export करना
-        clip.write_videofile(output_path, codec='libx264', audio_codec='aac', verbose=False, logger=None)
-        
-        # Memory cleanup
-        clip.close()
-        video.close()
+    def face_tracks(self, video_path, start_time, end_time, face_count, src_size=None, cancel_token=None):
+        """
+        Split screen के लिए दोनों speakers के face tracks (face_count > 1 हो तभी). Same source + same window
+        दोबारा माँगा जाए (platform variants, thumbnail) तो scan दोबारा नहीं चलता
+        """
+        if face_count <= 1:
+            return []
+        stat = os.stat(video_path)
+        key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime, start_time, end_time)
+        if key not in self._face_tracks:
+            src_size = src_size or source_frame_size(video_path)
+            source_id = self.fingerprints.source_for_file(video_path)
+            window = self.fingerprints.face_window(source_id, start_time, end_time) if source_id else None
+            stored_size = window.get("frame_size") if window else None
+            if stored_size and abs(stored_size[0] / stored_size[1] - src_size[0] / src_size[1]) < 0.01:
+                # Tracks उस video के pixels में हैं जिसमें मिले थे - re-upload दूसरे resolution का हो सकता है
+                tracks = [{k: np.array(v) for k, v in track.items()} for track in window["tracks"]]
+                self._face_tracks[key] = scale_tracks(tracks, src_size[1] / stored_size[1])
+            else:
+                with GOVERNOR.decoding(src_size, cancel_token):
+                    self._face_tracks[key] = track_faces(video_path, start_time, end_time, cancel_token=cancel_token)
+                if source_id:
+                    self.fingerprints.save_face_window(
+                        source_id, start_time, end_time, frame_size=list(src_size),
+                        tracks=[{k: v.tolist() for k, v in track.items()} for track in self._face_tracks[key]]
+                    )
+        return self._face_tracks[key]
     
-    def create_side_by_side_layout(self, clip):
-        """Multiple people के लिए side by side layout"""
-        # Video को दो parts में divide करना
-        width = clip.w
-        height = clip.h
-        
-        # Left और right halves
-        left_clip = clip.crop(x1=0, x2=width//2, y1=0, y2=height)
-        right_clip = clip.crop(x1=width//2, x2=width, y1=0, y2=height)
-        
-        # Side by side compose करना
-        final_clip = CompositeVideoClip([left_clip.set_position(('left', 'center')), 
-                                       right_clip.set_position(('right', 'center'))], 
-                                      size=(1080, 1920))
-        
-        return final_clip
+    def create_thumbnail(self, video_path, start_time, end_time, short_path, text_content, face_count,
+                         out_size=None, cancel_token=None):
+        """
+        Short का सबसे अच्छा frame (sharp, ठीक exposure, बड़ा face, आँखें खुली) caption के साथ short के बगल में
+        .jpg/.webp. सिर्फ keyframes decode होते हैं - एक second से काफ़ी कम. Fail हो तो short पर असर नहीं, None
+        """
+        if not THUMBNAILS_ENABLED or not CV2_AVAILABLE:
+            return None
+        output_path = thumbnail_path(short_path)
+        try:
+            tracks = self.face_tracks(video_path, start_time, end_time, face_count, cancel_token=cancel_token)
+            if cancel_token is not None:
+                cancel_token.track_output(output_path)
+            with GOVERNOR.decoding(source_frame_size(video_path), cancel_token):
+                result = select_thumbnail(video_path, start_time, end_time, output_path, text_content,
+                                          tracks=tracks, face_count=face_count,
+                                          out_size=out_size or RENDER_TIERS["final"]["size"],
+                                          cancel_token=cancel_token)
+            if cancel_token is not None:
+                cancel_token.keep_outputs([output_path])
+            print(f"🖼️ Thumbnail from {result['time']:.1f}s (best of {result['candidates']}): {output_path}")
+            return output_path
+        except JobCancelled:
+            raise
+        except Exception as e:
+            print(f"⚠️ Thumbnail failed: {e}")
+            return None
     
-    def create_center_crop(self, clip):
-        """Single person के लिए center crop"""
-        # Center crop करना
-        clip = clip.crop(width=1080, height=1920, x_center=clip.w/2, y_center=clip.h/2)
-        return clip
+    def create_short_video(self, video_path, start_time, end_time, output_path, text_content, face_count, tier="final",
+                           faststart=OUTPUT_FASTSTART, fragmented=OUTPUT_FRAGMENTED, hls=OUTPUT_HLS,
+                           cancel_token=None, use_cache=True, passthrough=None):
+        """
+        Individual short video create करता है (tier: "preview", "final" या "archive").
+        faststart/fragmented/hls packaging इसी encode में होती है; returns {"mp4", "hls"?} paths
+        use_cache: same source + same edit params पहले render हुए हों तो encode की जगह cache से copy
+        passthrough: crop/scale/overlay की ज़रूरत नहीं तो re-encode की जगह stream copy
+        (None = auto, True = force, False = कभी नहीं)
+        """
+        print(f"🎬 Creating {tier} short: {output_path}")
+        settings = dict(RENDER_TIERS[tier], preset=self.profile["presets"][tier])
+        
+        # Crop/scale/captions कुछ नहीं चाहिए तो keyframes पर cut करके stream copy - encode ही नहीं
+        if passthrough is not False and not hls:
+            try:
+                index = load_keyframe_index(video_path)
+                if passthrough or (not settings["captions"]
+                                   and passthrough_eligible(index, settings["size"], face_count)):
+                    if cancel_token is not None:
+                        cancel_token.track_output(output_path)
+                    cut = passthrough_cut(video_path, start_time, end_time, output_path, index,
+                                          faststart=faststart, fragmented=fragmented, cancel_token=cancel_token)
+                    if cancel_token is not None:
+                        cancel_token.keep_outputs([output_path])
+                    print(f"⚡ Stream-copied cut {cut['start']:.2f}s-{cut['end']:.2f}s (no re-encode)")
+                    return {"mp4": output_path}
+            except JobCancelled:
+                raise
+            except Exception as e:
+                print(f"⚠️ Passthrough cut failed, re-encoding instead: {e}")
+        
+        out_w, out_h = settings["size"] or RENDER_TIERS["final"]["size"]
+        src_size = source_frame_size(video_path)
+        
+        # Face count के basis पर layout decide करना - face scan का decoder render decoder खुलने से पहले बंद
+        tracks = self.face_tracks(video_path, start_time, end_time, face_count, src_size, cancel_token)
+        
+        # Two people - top/bottom split screen (हर pane अपने speaker के face पर), वरना center crop.
+        # 4K source का हर pixel decode करने की ज़रूरत नहीं - crop जितना छोटा decode हो सके उतना
+        scale = choose_layout(tracks, src_size, (out_w, out_h)).source_scale() if DECODE_DOWNSCALE else 1.0
+        dec_size = decode_size(src_size, scale)
+        if dec_size != src_size:
+            tracks = scale_tracks(tracks, dec_size[0] / src_size[0])
+        layout = choose_layout(tracks, dec_size, (out_w, out_h), pool=FRAME_POOL)
+        
+        # Source, cut, layout/crop trajectory, caption, music और encoder settings - कुछ नहीं बदला तो encode skip
+        cache_key = None
+        if use_cache and self.render_cache is not None:
+            cache_key = render_key(
+                source=self.render_cache.source_hash(video_path),
+                start=start_time,
+                end=end_time,
+                layout=layout.describe(),
+                overlay_text=text_content if settings["captions"] else None,
+                fade=(0.5, 0.5),
+                music=BACKGROUND_MUSIC_VOLUME,
+                encoder=dict(settings, codec='libx264', audio_codec='aac', max_fps=self.profile["max_fps"],
+                             faststart=faststart, fragmented=fragmented, hls=hls),
+            )
+            cached = self.render_cache.restore(cache_key, output_path)
+            if cached:
+                print(f"♻️ Unchanged short, reused cached render: {output_path}")
+                layout.release()
+                return cached
+        
+        # Text overlay (preview में captions skip); split screen में दोनों panes के बीच
+        overlays = []
+        if settings["captions"]:
+            overlays.append(render_caption(text_content, out_w, center_y=out_h // 2 if len(tracks) >= 2 else None))
+        
+        # RAM में जगह हो तभी decoder + encoder शुरू हों (parallel renders OOM न करें)
+        with GOVERNOR.rendering(dec_size, (out_w, out_h), cancel_token):
+            # Video clip extract करना - ffmpeg ही decode के समय downscale कर देता है
+            video = VideoFileClip(video_path, resize_algorithm="area",
+                                  target_resolution=(dec_size[1], dec_size[0]) if dec_size != src_size else None)
+            try:
+                clip = video.subclip(start_time, end_time)
+                
+                # Crop → resize → captions → fade, सब एक frame function में
+                compositor = FrameCompositor(layout, clip.duration, overlays=overlays, fade_in=0.5, fade_out=0.5,
+                                             cancel_token=cancel_token)
+                clip = clip.fl(compositor)
+                
+                # Background music add करना (5-6% volume)
+                clip = self.add_background_music(clip)
+                
+                # Export करना - moov atom पहले (instant playback), optional HLS एक ही encode में
+                target, packaging_params, outputs = packaging_plan(
+                    output_path, faststart=faststart, fragmented=fragmented, hls=hls, has_audio=clip.audio is not None
+                )
+                
+                # Cancel हुआ तो आधी-अधूरी files cleanup में हट जाएँ
+                if cancel_token is not None:
+                    for path in list(outputs.values()) + [temp_audio_path(output_path)]:
+                        cancel_token.track_output(path)
+                
+                clip.write_videofile(
+                    target,
+                    codec='libx264',
+                    audio_codec='aac',
+                    fps=min(clip.fps, self.profile["max_fps"] or clip.fps),
+                    preset=settings["preset"],
+                    threads=self.profile["encoder_threads"],
+                    bitrate=settings["bitrate"],
+                    audio_bitrate=settings["audio_bitrate"],
+                    temp_audiofile=temp_audio_path(output_path),
+                    ffmpeg_params=packaging_params,
+                    verbose=False,
+                    logger=None
+                )
+            finally:
+                # Memory cleanup - reader processes और output buffer हर हाल में वापस
+                video.close()
+                layout.release()
+        
+        # पूरा लिखा गया short अब partial output नहीं है
+        if cancel_token is not None:
+            cancel_token.keep_outputs(list(outputs.values()))
+        if cache_key is not None:
+            self.render_cache.store(cache_key, outputs)
+        return outputs
+    
+    def create_platform_variants(self, video_path, start_time, end_time, output_base, text_content, face_count,
+                                 platforms=None, faststart=OUTPUT_FASTSTART, fragmented=OUTPUT_FRAGMENTED,
+                                 hls=OUTPUT_HLS, cancel_token=None):
+        """
+        एक ही decode से हर platform (Shorts, Reels, TikTok, 1:1 feed) का अपना variant - अपना crop,
+        caption safe-area, duration cap और bitrate. output_base + "_<platform>.mp4" files बनती हैं.
+        Returns {platform: {"mp4", "hls"?}}
+        """
+        platforms = platforms or DEFAULT_PLATFORMS
+        unknown = [p for p in platforms if p not in PLATFORM_PROFILES]
+        if unknown:
+            raise Exception(f"Unknown platform(s): {', '.join(unknown)}")
+        print(f"🎬 Creating {len(platforms)} platform variants: {', '.join(platforms)}")
+        src_size = source_frame_size(video_path)
+        
+        tracks = self.face_tracks(video_path, start_time, end_time, face_count, src_size, cancel_token)
+        
+        # Decode उतना बड़ा जितना सबसे बड़े crop को चाहिए - बाकी variants उसी frame से
+        scale = variants_decode_scale(platforms, src_size, tracks) if DECODE_DOWNSCALE else 1.0
+        dec_size = decode_size(src_size, scale)
+        if dec_size != src_size:
+            tracks = scale_tracks(tracks, dec_size[0] / src_size[0])
+        
+        if cancel_token is not None:
+            for platform in platforms:
+                path = variant_path(output_base, platform)
+                cancel_token.track_output(path)
+                cancel_token.track_output(temp_audio_path(path))
+                if hls:
+                    cancel_token.track_output(hls_playlist_path(path))
+        
+        # एक decoder, N encoders - सबकी RAM एक साथ reserve
+        nbytes = decoder_bytes(dec_size) + sum(encoder_bytes(PLATFORM_PROFILES[p]["size"]) for p in platforms)
+        with GOVERNOR.reserve(nbytes, decoders=1, encoders=len(platforms), cancel_token=cancel_token):
+            video = VideoFileClip(video_path, resize_algorithm="area",
+                                  target_resolution=(dec_size[1], dec_size[0]) if dec_size != src_size else None)
+            try:
+                clip = self.add_background_music(video.subclip(start_time, end_time))
+                outputs = render_platform_variants(
+                    clip, output_base, text_content, tracks, platforms, preset=self.profile["presets"]["final"],
+                    faststart=faststart, fragmented=fragmented, hls=hls, pool=FRAME_POOL, cancel_token=cancel_token,
+                    fps=min(clip.fps, self.profile["max_fps"] or clip.fps), threads=self.profile["encoder_threads"]
+                )
+            finally:
+                video.close()
+        
+        if cancel_token is not None:
+            cancel_token.keep_outputs([path for result in outputs.values() for path in result.values()])
+        return outputs
     
     def add_background_music(self, clip):
         """Background music add करना (5-6% volume)"""
@@ -340,7 +779,7 @@ class YouTubeShortsGenerator:
             audio_clip = AudioClip(lambda t: audio_array[int(t * 44100)], duration=duration)
             
             # Volume को 5-6% में set करना
-            audio_clip = audio_clip.volumex(0.05)
+            audio_clip = audio_clip.volumex(BACKGROUND_MUSIC_VOLUME)
             
             # Original audio के साथ mix करना
             if clip.audio:
@@ -354,117 +793,127 @@ class YouTubeShortsGenerator:
         
         return clip
     
-    def add_text_overlay(self, clip, text):
-        """Text overlay add करना"""
-        try:
-            # Try to use TextClip if ImageMagick is available
-            from moviepy.editor import TextClip, CompositeVideoClip, ColorClip
-            
-            # Text को lines में break करना
-            words = text.split()
-            lines = []
-            current_line = ""
-            
-            for word in words:
-                if len(current_line + " " + word) <= 30:  # Max 30 characters per line
-                    current_line += " " + word if current_line else word
-                else:
-                    lines.append(current_line)
-                    current_line = word
-            
-            if current_line:
-                lines.append(current_line)
-            
-            # Text clips create करना
-            text_clips = []
-            for i, line in enumerate(lines):
-                txt_clip = TextClip(line, fontsize=50, color='white', font='Arial-Bold')
-                txt_clip = txt_clip.set_position(('center', 100 + i * 60)).set_duration(clip.duration)
-                text_clips.append(txt_clip)
-            
-            # Background for text
-            if text_clips:
-                bg_clip = ColorClip(size=(1080, len(lines) * 60 + 40), color=(0, 0, 0), duration=clip.duration)
-                bg_clip = bg_clip.set_position(('center', 80)).set_opacity(0.7)
-                text_clips.insert(0, bg_clip)
-            
-            # Composite करना
-            final_clip = CompositeVideoClip([clip] + text_clips)
-            return final_clip
-            
-        except Exception as e:
-            print(f"⚠️ Text overlay failed (ImageMagick not available): {e}")
-            print("🔄 Using video without text overlay...")
-            # Return the original clip without text overlay
-            return clip
-    
-    def generate_shorts(self, url):
-        """Main function - सभी shorts generate करता है from REAL video content"""
+    def generate_shorts(self, url=None, video_path=None, cancel_token=None, platforms=None):
+        """
+        Main function - सभी shorts generate करता है from REAL video content (URL या local file)
+        platforms: ["shorts", "reels", ...] दिए हों तो हर moment के सभी platform variants एक decode से
+        """
         print("🚀 Starting AI-Powered YouTube Shorts Generation...")
         print("🎯 Processing real podcast content for viral moments")
         
-        # Step 1: Video download (NO DEMO MODE)
-        video_path, video_info = self.download_video(url)
-        
-        # Step 2: Audio extract और transcription
-        segments, full_text = self.extract_audio_and_transcribe(video_path)
+        # CLI में भी stage budgets लागू हों, इसलिए token हमेशा रहता है
+        if cancel_token is None:
+            cancel_token = CancelToken()
         
-        if self.use_advanced:
-            # Advanced analysis
-            print("🧠 Using advanced analysis...")
-            
-            # Audio features analysis
-            audio_path = "temp_audio.wav"
-            video = VideoFileClip(video_path)
-            video.audio.write_audiofile(audio_path, verbose=False, logger=None)
-            video.close()
-            
-            audio_features = self.advanced_generator.analyze_audio_features(audio_path)
-            
-            # Advanced content analysis
-            viral_moments = self.advanced_generator.advanced_content_analysis(segments, audio_features)
-            
-            # Step 3: Shorts generate करना
-            output_dir = "generated_shorts"
-            os.makedirs(output_dir, exist_ok=True)
+        try:
+            # Step 1: Video download (NO DEMO MODE) - local file हो तो download stage skip
+            if video_path:
+                video_path, video_info = self.load_local_video(video_path)
+            else:
+                cancel_token.track_output("temp_video.*")
+                with cancel_token.stage_scope("download"):
+                    video_path, video_info = self.download_video(url, cancel_token)
+            cancel_token.track_output("temp_audio.wav")
             
-            generated_shorts = []
+            # Step 2: Audio extract और transcription
+            with cancel_token.stage_scope("transcribe"):
+                segments, full_text = self.extract_audio_and_transcribe(
+                    video_path, video_info.get('id'), cancel_token=cancel_token,
+                    captions=video_info.get('captions'), source_info=video_info
+                )
             
-            for i, thread in enumerate(viral_moments[:5]):  # Top 5 shorts
-                start_time = max(0, thread["start"] - 2)  # 2 seconds before
-            viral_moments = self.analyze_content(full_text)
-            moments_with_timestamps = self.find_timestamps_for_moments(viral_moments, segments)
+            # Step 3: Clip windows और shorts generate करना
+            with cancel_token.stage_scope("analyze"):
+                clip_windows = self.find_clip_windows(segments, top_k=5, source_id=video_info.get('id'))
+                
+                # सभी moments के titles/descriptions एक batched pass में
+                self.summarizer.add_titles_and_descriptions(clip_windows)
             
             output_dir = "generated_shorts"
             os.makedirs(output_dir, exist_ok=True)
             
             generated_shorts = []
             
-            for i, moment in enumerate(moments_with_timestamps[:5]):
-                start_time = max(0, moment["start"] - 2)
-                end_time = min(video_info.get('duration', 3600), moment["end"] + 2)
+            for i, moment in enumerate(clip_windows):
+                start_time = max(0, moment["start"])
+                end_time = min(video_info.get('duration', 3600), moment["end"])
                 
-                face_count = self.detect_faces_and_people(video_path, start_time, end_time)
+                # Render budget हर short के लिए अलग
+                with cancel_token.stage_scope("render"):
+                    # एक ही आवाज़ है तो face scan और split screen की ज़रूरत नहीं
+                    if needs_face_scan(moment):
+                        face_count = self.detect_faces_and_people(video_path, start_time, end_time, cancel_token)
+                    else:
+                        face_count = 1
+                    
+                    if platforms:
+                        variants = self.create_platform_variants(
+                            video_path, start_time, end_time, f"{output_dir}/short_{i+1}", moment["text"],
+                            face_count, platforms=platforms, cancel_token=cancel_token
+                        )
+                        variants = {platform: outputs["mp4"] for platform, outputs in variants.items()}
+                    else:
+                        variants = {"short": f"{output_dir}/short_{i+1}.mp4"}
+                        self.create_short_video(video_path, start_time, end_time, variants["short"],
+                                                moment["text"], face_count, cancel_token=cancel_token)
+                    
+                    thumbnail = self.create_thumbnail(video_path, start_time, end_time,
+                                                      next(iter(variants.values())), moment["text"], face_count,
+                                                      cancel_token=cancel_token)
                 
-                output_path = f"{output_dir}/short_{i+1}.mp4"
-                self.create_short_video(video_path, start_time, end_time, output_path, moment["text"], face_count)
+                for output_path in variants.values():
+                    self.video_manager.register_short(
+                        output_path,
+                        source_id=video_info.get('id'),
+                        start_time=start_time,
+                        end_time=end_time,
+                        text=moment["text"],
+                        title=moment["title"],
+                        description=moment["description"],
+                        viral_score=moment.get("viral_score"),
+                        engagement_score=moment.get("engagement_score"),
+                        face_count=face_count,
+                        speakers=moment.get("speakers"),
+                        is_multi_speaker=moment.get("is_multi_speaker")
+                    )
                 
                 generated_shorts.append({
-                    "path": output_path,
+                    "path": next(iter(variants.values())),
+                    "variants": variants if platforms else None,
+                    "thumbnail": thumbnail,
                     "text": moment["text"],
+                    "title": moment["title"],
+                    "description": moment["description"],
                     "start_time": start_time,
                     "end_time": end_time,
-                    "face_count": face_count
+                    "face_count": face_count,
+                    "viral_score": moment.get("viral_score", 0),
+                    "speakers": moment.get("speakers", []),
+                    "is_multi_speaker": moment.get("is_multi_speaker", False),
+                    "engagement_score": moment.get("engagement_score", 0)
                 })
-        
-        # Cleanup
-        os.remove(video_path)
-        if os.path.exists("temp_audio.wav"):
-            os.remove("temp_audio.wav")
+            
+            # Cleanup (user की अपनी local file delete नहीं करनी); KEEP_SOURCE_VIDEOS हो तो search hits के लिए रखना
+            if not video_info.get("local"):
+                if KEEP_SOURCE_VIDEOS and video_info.get('id'):
+                    os.makedirs(SOURCE_VIDEO_DIR, exist_ok=True)
+                    kept_path = os.path.join(SOURCE_VIDEO_DIR, video_info['id'] + os.path.splitext(video_path)[1])
+                    os.replace(video_path, kept_path)
+                    self.transcript_index.set_video_path(video_info['id'], kept_path)
+                    self.fingerprints.bind_file(video_info['id'], kept_path)
+                else:
+                    os.remove(video_path)
+            if os.path.exists("temp_audio.wav"):
+                os.remove("temp_audio.wav")
+            
+        except JobCancelled as e:
+            # आधी बनी files (download .part, temp audio, अधूरा short) हटाना
+            print(f"🛑 Generation cancelled: {e}")
+            cancel_token.cleanup()
+            raise
         
         # Create summary report using video manager
-        video_manager = VideoManager()
-        report_path = video_manager.create_summary_report()
+        report_path = self.video_manager.create_summary_report()
         print(f"📋 Summary report created: {report_path}")
         
         print(f"✅ Generated {len(generated_shorts)} shorts in '{output_dir}' folder!")
@@ -472,12 +921,20 @@ class YouTubeShortsGenerator:
 
 def main():
     parser = argparse.ArgumentParser(description='AI-Powered YouTube Long Form to Viral Shorts Generator')
-    parser.add_argument('--url', required=True, help='YouTube video URL')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--url', help='YouTube video URL')
+    source.add_argument('--file', help='Local video file (no download)')
+    parser.add_argument('--platforms', help=f"Comma-separated platform variants per short, e.g. "
+                                            f"{','.join(DEFAULT_PLATFORMS)} (one decode, one encode each)")
+    parser.add_argument('--profile', choices=list(PROFILES), default=DEFAULT_PROFILE,
+                        help='Speed/quality profile: Whisper model, download resolution, encoder preset, fps, '
+                             'face sampling (worker counts are auto-tuned to this machine)')
     
     args = parser.parse_args()
+    platforms = [p.strip() for p in args.platforms.split(',') if p.strip()] if args.platforms else None
     
-    generator = YouTubeShortsGenerator()
-    shorts = generator.generate_shorts(args.url)
+    generator = YouTubeShortsGenerator(profile=args.profile)
+    shorts = generator.generate_shorts(args.url, video_path=args.file, platforms=platforms)
     
     print("\n📊 Generated AI-Optimized Shorts Summary:")
     for i, short in enumerate(shorts, 1):
@@ -487,7 +944,10 @@ def main():
         print(f"   Speakers: {speakers_text}")
         print(f"   Engagement Score: {short.get('engagement_score', 0):.1f}")
         print(f"   Viral Score: {short.get('viral_score', 0):.1f}")
-        print(f"   File: {short['path']}\n")
+        print(f"   File: {short['path']}")
+        for platform, path in (short.get('variants') or {}).items():
+            print(f"   {platform}: {path}")
+        print()
 
 if __name__ == "__main__":
     main()
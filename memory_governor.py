@@ -0,0 +1,157 @@
+import os
+import math
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from config import (MEMORY_BUDGET_FRACTION, MAX_CONCURRENT_DECODERS, MAX_CONCURRENT_ENCODERS,
+                    DECODER_FRAME_FACTOR, ENCODER_FRAME_FACTOR, BUFFER_POOL_MAX_PER_SHAPE)
+
+
+def available_memory():
+    """Bytes of RAM the system can still hand out (MemAvailable), or None if unknown."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def decoder_bytes(size):
+    """Rough peak memory of one decoder producing RGB frames of size (w, h)."""
+    w, h = size
+    return int(w * h * 3 * DECODER_FRAME_FACTOR)
+
+
+def encoder_bytes(size):
+    """Rough peak memory of one libx264 encoder at size (w, h): yuv420 reference/lookahead frames."""
+    w, h = size
+    return int(w * h * 1.5 * ENCODER_FRAME_FACTOR)
+
+
+def source_frame_size(path):
+    """(w, h) of the video as displayed (rotation applied), read from the header without decoding."""
+    infos = ffmpeg_parse_infos(path)
+    w, h = infos["video_size"]
+    if infos.get("video_rotation") in (90, 270):
+        w, h = h, w
+    return w, h
+
+
+def decode_size(src_size, scale):
+    """Source size shrunk by scale (<= 1), rounded up to even numbers as ffmpeg's scaler wants."""
+    src_w, src_h = src_size
+    if scale >= 1.0:
+        return src_w, src_h
+    w = min(src_w, 2 * math.ceil(src_w * scale / 2))
+    h = min(src_h, 2 * math.ceil(src_h * scale / 2))
+    return w, h
+
+
+class BufferPool:
+    """
+    Output frame buffers reused across renders instead of a fresh full-size
+    allocation per short. acquire() hands out a zeroed array of the given
+    shape; release() returns it, keeping at most max_per_shape per shape.
+    """
+
+    def __init__(self, max_per_shape=BUFFER_POOL_MAX_PER_SHAPE):
+        self.max_per_shape = max_per_shape
+        self._free = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            buffer = free.pop() if free else None
+        if buffer is None:
+            return np.zeros(shape, dtype=dtype)
+        buffer.fill(0)
+        return buffer
+
+    def release(self, buffer):
+        if buffer is None:
+            return
+        key = (buffer.shape, buffer.dtype.str)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_per_shape and not any(b is buffer for b in free):
+                free.append(buffer)
+
+    def pooled_bytes(self):
+        with self._lock:
+            return sum(b.nbytes for free in self._free.values() for b in free)
+
+
+class MemoryGovernor:
+    """
+    Admission control for the memory-heavy parts of rendering. Every decoder
+    and encoder reserves its estimated peak bytes before it starts and waits
+    while the budget (a fraction of the RAM available when the governor was
+    created) or the decoder/encoder caps are used up. A reservation bigger
+    than the whole budget (or the caps) still runs, but alone, so nothing
+    deadlocks.
+    """
+
+    def __init__(self, budget_bytes=None, max_decoders=MAX_CONCURRENT_DECODERS,
+                 max_encoders=MAX_CONCURRENT_ENCODERS):
+        if budget_bytes is None:
+            available = available_memory()
+            budget_bytes = int(available * MEMORY_BUDGET_FRACTION) if available else 4 * 1024 ** 3
+        self.budget_bytes = budget_bytes
+        self.max_decoders = max_decoders
+        self.max_encoders = max_encoders
+        self.reserved_bytes = 0
+        self.decoders = 0
+        self.encoders = 0
+        self._condition = threading.Condition()
+
+    def _fits(self, nbytes, decoders, encoders):
+        if self.decoders == 0 and self.encoders == 0:
+            return True
+        if self.decoders + decoders > self.max_decoders or self.encoders + encoders > self.max_encoders:
+            return False
+        return self.reserved_bytes + nbytes <= self.budget_bytes
+
+    @contextmanager
+    def reserve(self, nbytes, decoders=0, encoders=0, cancel_token=None):
+        """Blocks until nbytes (plus the decoder/encoder slots) fit, holds them for the with-block."""
+        with self._condition:
+            while not self._fits(nbytes, decoders, encoders):
+                if cancel_token is not None:
+                    cancel_token.check()
+                self._condition.wait(timeout=0.5)
+            self.reserved_bytes += nbytes
+            self.decoders += decoders
+            self.encoders += encoders
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.reserved_bytes -= nbytes
+                self.decoders -= decoders
+                self.encoders -= encoders
+                self._condition.notify_all()
+
+    def decoding(self, size, cancel_token=None):
+        """Reservation for one decoder producing frames of size (w, h)."""
+        return self.reserve(decoder_bytes(size), decoders=1, cancel_token=cancel_token)
+
+    def rendering(self, dec_size, out_size, cancel_token=None):
+        """Reservation for a render: one decoder at dec_size feeding one encoder at out_size."""
+        nbytes = decoder_bytes(dec_size) + encoder_bytes(out_size)
+        return self.reserve(nbytes, decoders=1, encoders=1, cancel_token=cancel_token)
+
+
+# Shared by every render in this process (web app threads, CLI, a stage worker)
+FRAME_POOL = BufferPool()
+GOVERNOR = MemoryGovernor()
@@ -0,0 +1,68 @@
+import os
+
+from config import OUTPUT_FASTSTART, OUTPUT_FRAGMENTED, OUTPUT_HLS, HLS_SEGMENT_SECONDS
+
+FRAGMENTED_MOVFLAGS = "+frag_keyframe+empty_moov+default_base_moof"
+
+
+def _tee_escape(value, levels=1):
+    """
+    Backslash-escapes a path for the tee muxer. Filenames are unescaped once
+    (slave list), option values twice (slave list, then the option string).
+    """
+    value = value.replace("\\", "/")
+    for _ in range(levels):
+        for char in "\\:|[]":
+            value = value.replace(char, "\\" + char)
+    return value
+
+
+def hls_playlist_path(output_path):
+    return os.path.join(os.path.splitext(output_path)[0] + "_hls", "playlist.m3u8")
+
+
+def packaging_plan(output_path, faststart=OUTPUT_FASTSTART, fragmented=OUTPUT_FRAGMENTED,
+                   hls=OUTPUT_HLS, segment_seconds=HLS_SEGMENT_SECONDS, has_audio=True):
+    """
+    How to ask write_videofile for the packaged outputs in one encode.
+    Returns (target, ffmpeg_params, outputs): target is what to pass as the
+    filename (a tee muxer spec when HLS is on), outputs maps "mp4"/"hls" to
+    the files that will exist afterwards.
+    """
+    movflags = FRAGMENTED_MOVFLAGS if fragmented else ("+faststart" if faststart else None)
+    outputs = {"mp4": output_path}
+    params = []
+
+    # Regular keyframes so fragments and segments have even, predictable lengths
+    if fragmented or hls:
+        params += ["-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})"]
+
+    if not hls:
+        if movflags:
+            params += ["-movflags", movflags]
+        return output_path, params, outputs
+
+    playlist = hls_playlist_path(output_path)
+    hls_dir = os.path.dirname(playlist)
+    os.makedirs(hls_dir, exist_ok=True)
+    outputs["hls"] = playlist
+
+    mp4_options = "f=mp4" + (f":movflags={movflags}" if movflags else "")
+    hls_options = ":".join([
+        "f=hls",
+        f"hls_time={segment_seconds}",
+        "hls_playlist_type=vod",
+        "hls_segment_type=fmp4",
+        "hls_fmp4_init_filename=init.mp4",
+        "hls_segment_filename=" + _tee_escape(os.path.join(hls_dir, "seg_%03d.m4s"), levels=2),
+    ])
+    target = f"[{mp4_options}]{_tee_escape(output_path)}|[{hls_options}]{_tee_escape(playlist)}"
+
+    # tee needs explicit stream maps: 0 = frames piped by moviepy, 1 = its audio file
+    params += ["-map", "0:v"] + (["-map", "1:a"] if has_audio else []) + ["-f", "tee"]
+    return target, params, outputs
+
+
+def temp_audio_path(output_path):
+    """moviepy names its temp audio after the target; with a tee spec that name is meaningless."""
+    return os.path.splitext(output_path)[0] + "_TEMP_audio.m4a"
@@ -0,0 +1,188 @@
+import os
+import time
+import multiprocessing as mp
+import numpy as np
+
+from audio_decoder import decode_audio, iter_audio_blocks
+from cancellation import check
+from config import (WHISPER_MODEL, TRANSCRIBE_WORKERS, TRANSCRIBE_CHUNK_OVERLAP,
+                    TRANSCRIBE_SILENCE_SEARCH)
+
+SAMPLE_RATE = 16000      # what Whisper expects
+ENERGY_RATE = 8000       # enough to find pauses, half the decode work
+ENERGY_FRAME = 0.1       # seconds per energy frame
+ENERGY_SMOOTHING = 5     # frames averaged when looking for a pause
+
+# Per-process model, created once by the pool initializer
+_worker_model = None
+
+
+def frame_energy(path):
+    """RMS energy per ENERGY_FRAME of the whole soundtrack, decoded in blocks."""
+    frame = int(ENERGY_RATE * ENERGY_FRAME)
+    energies = []
+    for block in iter_audio_blocks(path, ENERGY_RATE, 60):
+        n = len(block) // frame * frame
+        if n:
+            energies.append(np.sqrt(np.mean(block[:n].reshape(-1, frame) ** 2, axis=1)))
+        if len(block) > n:
+            energies.append(np.sqrt(np.mean(block[n:] ** 2, keepdims=True)))
+    return np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+
+
+def find_split_points(energy, n_chunks, search=TRANSCRIBE_SILENCE_SEARCH):
+    """
+    Cut times (seconds) for n_chunks roughly equal chunks. Each even split is
+    moved to the quietest moment within +/- search seconds so we cut in a pause.
+    """
+    duration = len(energy) * ENERGY_FRAME
+    if n_chunks <= 1 or len(energy) == 0:
+        return []
+
+    kernel = np.ones(ENERGY_SMOOTHING) / ENERGY_SMOOTHING
+    smooth = np.convolve(energy, kernel, mode="same")
+    radius = int(search / ENERGY_FRAME)
+
+    cuts = []
+    previous = 0
+    for k in range(1, n_chunks):
+        target = int(k * len(energy) / n_chunks)
+        lo = max(previous + 1, target - radius)
+        hi = min(len(energy) - 1, target + radius)
+        if lo >= hi:
+            continue
+        best = lo + int(np.argmin(smooth[lo:hi]))
+        cuts.append(round(best * ENERGY_FRAME, 2))
+        previous = best
+    return [c for c in cuts if 0 < c < duration]
+
+
+def chunk_spans(cuts, duration, overlap=TRANSCRIBE_CHUNK_OVERLAP):
+    """
+    (start, end, keep_from, keep_to) per chunk: the decoded span includes the
+    overlap, the keep range is where this chunk owns the segments.
+    """
+    edges = [0.0] + list(cuts) + [duration]
+    spans = []
+    for keep_from, keep_to in zip(edges[:-1], edges[1:]):
+        spans.append((max(0.0, keep_from - overlap), min(duration, keep_to + overlap), keep_from, keep_to))
+    return spans
+
+
+def merge_chunk_segments(chunk_results, spans):
+    """
+    Merges per-chunk segments (timestamps relative to each chunk) into one
+    timeline. Inside an overlap a segment belongs to the chunk that owns its
+    midpoint, so every sentence is kept exactly once.
+    """
+    merged = []
+    for segments, (start, _, keep_from, keep_to) in zip(chunk_results, spans):
+        last_chunk = keep_to == spans[-1][3]
+        for segment in segments:
+            seg_start, seg_end = segment["start"] + start, segment["end"] + start
+            middle = (seg_start + seg_end) / 2
+            if middle < keep_from or (middle >= keep_to and not last_chunk):
+                continue
+            merged.append({
+                "start": seg_start,
+                "end": seg_end,
+                "text": segment["text"].strip()
+            })
+
+    merged.sort(key=lambda s: s["start"])
+    # Same words heard twice right at a cut
+    deduped = []
+    for segment in merged:
+        if deduped and segment["text"] == deduped[-1]["text"] and segment["start"] < deduped[-1]["end"]:
+            deduped[-1]["end"] = max(deduped[-1]["end"], segment["end"])
+            continue
+        deduped.append(segment)
+    return deduped
+
+
+def _init_worker(model_name, threads):
+    global _worker_model
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_name)
+
+
+def _transcribe_chunk(path, start, end):
+    audio = decode_audio(path, SAMPLE_RATE, start=start, duration=end - start)
+    result = _worker_model.transcribe(audio, fp16=False)
+    return [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]]
+
+
+class ParallelTranscriber:
+    def __init__(self, model_name=WHISPER_MODEL, workers=TRANSCRIBE_WORKERS,
+                 overlap=TRANSCRIBE_CHUNK_OVERLAP, threads_per_worker=None):
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.overlap = overlap
+        # Cores split between workers so they don't fight over the same threads
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+
+    def transcribe(self, audio_path, cancel_token=None):
+        """
+        Transcribes audio_path in parallel chunks. Returns (segments, text)
+        in the same format as the single-model path. Cancelling the token
+        terminates the worker processes straight away.
+        """
+        started = time.time()
+        energy = frame_energy(audio_path)
+        duration = len(energy) * ENERGY_FRAME
+        spans = chunk_spans(find_split_points(energy, self.workers), duration, self.overlap)
+        print(f"⚡ Transcribing {duration / 60:.1f} min in {len(spans)} chunks "
+              f"({self.workers} workers x {self.threads_per_worker} threads)")
+
+        # spawn: torch and forked processes don't mix
+        pool = mp.get_context("spawn").Pool(min(self.workers, len(spans)), initializer=_init_worker,
+                                            initargs=(self.model_name, self.threads_per_worker))
+        unregister = cancel_token.on_cancel(pool.terminate) if cancel_token is not None else None
+        try:
+            pending = [pool.apply_async(_transcribe_chunk, (audio_path, start, end)) for start, end, _, _ in spans]
+            for result in pending:
+                while not result.ready():
+                    result.wait(0.5)
+                    check(cancel_token)
+            chunk_results = [result.get() for result in pending]
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            if unregister:
+                unregister()
+            pool.join()
+
+        segments = merge_chunk_segments(chunk_results, spans)
+        elapsed = time.time() - started
+        print(f"✅ Transcribed in {elapsed:.1f}s ({duration / elapsed if elapsed > 0 else 0:.1f}x realtime)")
+        return segments, " ".join(s["text"] for s in segments)
+
+
+def transcribe_in_chunks(model, audio_path, chunk_seconds, cancel_token=None):
+    """
+    Single-process transcription in ~chunk_seconds pieces cut at pauses, so
+    a cancel or stage timeout is noticed between pieces instead of after the
+    whole file. Each piece is prompted with the tail of the previous text to
+    keep Whisper's context across cuts.
+    """
+    energy = frame_energy(audio_path)
+    duration = len(energy) * ENERGY_FRAME
+    n_chunks = max(1, int(np.ceil(duration / chunk_seconds)))
+    cuts = find_split_points(energy, n_chunks, search=chunk_seconds / 4)
+    spans = chunk_spans(cuts, duration, TRANSCRIBE_CHUNK_OVERLAP)
+
+    chunk_results = []
+    previous_text = ""
+    for start, end, _, _ in spans:
+        check(cancel_token)
+        audio = decode_audio(audio_path, SAMPLE_RATE, start=start, duration=end - start)
+        result = model.transcribe(audio, fp16=False, initial_prompt=previous_text[-200:] or None)
+        chunk_results.append([{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]])
+        previous_text = result["text"]
+
+    segments = merge_chunk_segments(chunk_results, spans)
+    return segments, " ".join(s["text"] for s in segments)
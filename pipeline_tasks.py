@@ -0,0 +1,175 @@
+import os
+import json
+import uuid
+
+from config import JOB_WORK_DIR, OUTPUT_DIR
+from job_queue import json_default
+from speaker_diarizer import needs_face_scan
+
+# Stage handlers for stage_worker.py: handler(payload, cancel_token) -> (result, follow_ups).
+# Everything a later stage needs is written to the job directory, which (like
+# the queue database) must be on storage every worker node can reach.
+
+_generator = None
+
+
+def get_generator():
+    """One YouTubeShortsGenerator per worker process, created for its first task."""
+    global _generator
+    if _generator is None:
+        from main import YouTubeShortsGenerator
+        _generator = YouTubeShortsGenerator(use_advanced=False)
+    return _generator
+
+
+def _write_json(path, data):
+    # Write-then-rename so a worker dying mid-write never leaves half a file for the next stage
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=json_default)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _job_files(payload):
+    return {name: os.path.join(payload["job_dir"], f"{name}.json") for name in ("source", "transcript")}
+
+
+def _next(payload, **extra):
+    """Payload for a follow-up task: the job's directories plus extra fields."""
+    return dict({"job_dir": payload["job_dir"], "output_dir": payload["output_dir"]}, **extra)
+
+
+def submit_pipeline(queue, url=None, video_path=None, work_dir=JOB_WORK_DIR, output_dir=OUTPUT_DIR):
+    """Queues a generate_shorts run as a download task. Returns the job id."""
+    if not url and not video_path:
+        raise Exception("A URL or a local video path is required")
+    job_id = uuid.uuid4().hex
+    payload = {
+        "url": url,
+        "video_path": os.path.abspath(video_path) if video_path else None,
+        "job_dir": os.path.abspath(os.path.join(work_dir, job_id)),
+        "output_dir": os.path.abspath(os.path.join(output_dir, job_id)),
+    }
+    return queue.submit("download", payload, job_id=job_id)
+
+
+def download_task(payload, cancel_token):
+    generator = get_generator()
+    os.makedirs(payload["job_dir"], exist_ok=True)
+
+    if payload.get("video_path"):
+        video_path, info = generator.load_local_video(payload["video_path"])
+    else:
+        # Same template on every attempt, so a retry (on any node) resumes the .part file
+        template = os.path.join(payload["job_dir"], "source.%(ext)s")
+        video_path, info = generator.download_video(payload["url"], cancel_token, output_template=template)
+
+    source = {
+        "video_path": os.path.abspath(video_path),
+        "id": info.get("id"),
+        "title": info.get("title"),
+        "webpage_url": info.get("webpage_url"),
+        "duration": info.get("duration"),
+        "local": bool(info.get("local")),
+        "captions": info.get("captions"),
+    }
+    _write_json(_job_files(payload)["source"], source)
+    return {"video_path": source["video_path"], "duration": source["duration"]}, [("transcribe", _next(payload))]
+
+
+def transcribe_task(payload, cancel_token):
+    generator = get_generator()
+    files = _job_files(payload)
+    source = _read_json(files["source"])
+
+    audio_path = os.path.join(payload["job_dir"], "audio.wav")
+    try:
+        segments, _ = generator.extract_audio_and_transcribe(
+            source["video_path"], source["id"], cancel_token=cancel_token,
+            captions=source.get("captions"), audio_path=audio_path, source_info=source
+        )
+    finally:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+
+    _write_json(files["transcript"], {"segments": segments})
+    return {"segments": len(segments)}, [("analyze", _next(payload))]
+
+
+def analyze_task(payload, cancel_token):
+    generator = get_generator()
+    files = _job_files(payload)
+    segments = _read_json(files["transcript"])["segments"]
+    source = _read_json(files["source"])
+
+    clip_windows = generator.find_clip_windows(segments, top_k=5, source_id=source.get("id"))
+    cancel_token.check()
+    generator.summarizer.add_titles_and_descriptions(clip_windows)
+
+    # One independent face-index -> render chain per moment
+    follow_ups = [("face_index", _next(payload, index=i, moment=moment)) for i, moment in enumerate(clip_windows)]
+    return {"moments": len(clip_windows)}, follow_ups
+
+
+def face_index_task(payload, cancel_token):
+    generator = get_generator()
+    source = _read_json(_job_files(payload)["source"])
+    moment = payload["moment"]
+
+    start_time = max(0, moment["start"])
+    end_time = min(source.get("duration") or 3600, moment["end"])
+    if needs_face_scan(moment):
+        face_count = generator.detect_faces_and_people(source["video_path"], start_time, end_time, cancel_token)
+    else:
+        face_count = 1
+
+    render = _next(payload, index=payload["index"], moment=moment,
+                   start_time=start_time, end_time=end_time, face_count=face_count)
+    return {"face_count": face_count}, [("render", render)]
+
+
+def render_task(payload, cancel_token):
+    generator = get_generator()
+    source = _read_json(_job_files(payload)["source"])
+    moment = payload["moment"]
+
+    os.makedirs(payload["output_dir"], exist_ok=True)
+    output_path = os.path.join(payload["output_dir"], f"short_{payload['index'] + 1}.mp4")
+    outputs = generator.create_short_video(
+        source["video_path"], payload["start_time"], payload["end_time"], output_path,
+        moment["text"], payload["face_count"], cancel_token=cancel_token
+    )
+    thumbnail = generator.create_thumbnail(
+        source["video_path"], payload["start_time"], payload["end_time"], output_path,
+        moment["text"], payload["face_count"], cancel_token=cancel_token
+    )
+
+    generator.video_manager.register_short(
+        output_path,
+        source_id=source.get("id"),
+        start_time=payload["start_time"],
+        end_time=payload["end_time"],
+        text=moment["text"],
+        title=moment.get("title"),
+        description=moment.get("description"),
+        viral_score=moment.get("viral_score"),
+        engagement_score=moment.get("engagement_score"),
+        face_count=payload["face_count"],
+        speakers=moment.get("speakers"),
+        is_multi_speaker=moment.get("is_multi_speaker")
+    )
+    return {"path": output_path, "outputs": outputs, "thumbnail": thumbnail, "title": moment.get("title")}, []
+
+
+PIPELINE_HANDLERS = {
+    "download": download_task,
+    "transcribe": transcribe_task,
+    "analyze": analyze_task,
+    "face_index": face_index_task,
+    "render": render_task,
+}
@@ -0,0 +1,149 @@
+import os
+import queue
+import threading
+
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+from cancellation import check
+from compositor import FrameCompositor, render_caption
+from split_screen import choose_layout
+from output_packaging import packaging_plan, temp_audio_path
+from config import PLATFORM_PROFILES, VARIANT_QUEUE_FRAMES
+
+_END = object()
+
+
+def variant_path(output_base, platform):
+    """generated_shorts/short_1 + "reels" -> generated_shorts/short_1_reels.mp4"""
+    return f"{output_base}_{platform}.mp4"
+
+
+def variants_decode_scale(platforms, src_size, tracks):
+    """Decode scale that is enough for every platform's crop (the largest any of them needs)."""
+    return max(choose_layout(tracks, src_size, PLATFORM_PROFILES[p]["size"]).source_scale() for p in platforms)
+
+
+class VariantEncoder:
+    """
+    One platform's output: its own layout, safe-area caption, duration cap
+    and ffmpeg encoder process. Decoded frames arrive through a small queue
+    and are composited and piped to ffmpeg on this variant's own thread, so
+    the variants encode in parallel while the source is decoded once.
+    """
+
+    def __init__(self, platform, layout, text, duration, output_path, fps, audio_path=None, preset="medium",
+                 faststart=True, fragmented=False, hls=False, split=False, threads=None):
+        profile = PLATFORM_PROFILES[platform]
+        out_w, out_h = profile["size"]
+        self.platform = platform
+        self.layout = layout
+        self.duration = min(duration, profile["max_duration"])
+
+        caption = render_caption(text, out_w, center_y=out_h // 2 if split else None,
+                                 safe_area=profile["safe_area"], height=out_h) if text else None
+        self.compositor = FrameCompositor(layout, self.duration, overlays=[caption], fade_in=0.5, fade_out=0.5)
+
+        target, params, self.outputs = packaging_plan(output_path, faststart=faststart, fragmented=fragmented,
+                                                      hls=hls, has_audio=audio_path is not None)
+        self.writer = FFMPEG_VideoWriter(target, profile["size"], fps, codec="libx264", audiofile=audio_path,
+                                         preset=preset, bitrate=profile["bitrate"], threads=threads,
+                                         ffmpeg_params=params)
+        self.frames = queue.Queue(maxsize=VARIANT_QUEUE_FRAMES)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                item = self.frames.get()
+                if item is _END:
+                    return
+                t, frame = item
+                self.writer.write_frame(self.compositor.render(frame, t))
+        except Exception as e:
+            self.error = e
+            # Keep draining so the decode loop never blocks on a dead encoder
+            while self.frames.get() is not _END:
+                pass
+
+    def put(self, t, frame):
+        self.frames.put((t, frame))
+
+    def finish(self):
+        """Waits for the queued frames, closes the encoder and gives the layout's buffer back."""
+        self.frames.put(_END)
+        self.thread.join()
+        try:
+            self.writer.close()
+        finally:
+            self.layout.release()
+        if self.error is not None:
+            raise Exception(f"{self.platform} variant failed: {self.error}")
+
+
+def render_platform_variants(clip, output_base, text, tracks, platforms, preset="medium", faststart=True,
+                             fragmented=False, hls=False, pool=None, cancel_token=None, fps=None, threads=None):
+    """
+    Decodes clip (already cut, tracks in its pixels) once and encodes one
+    variant per platform from the same frames. Returns {platform: outputs},
+    outputs as from create_short_video ({"mp4", "hls"?}). fps defaults to
+    the clip's; threads (all encoders together) to ffmpeg's own choice.
+    """
+    fps = fps or clip.fps
+    encoder_threads = max(1, threads // len(platforms)) if threads else None
+    audio_paths = {}
+    encoders = []
+    try:
+        # Audio per distinct (duration cap, bitrate): usually one file shared by all variants
+        for platform in platforms:
+            profile = PLATFORM_PROFILES[platform]
+            key = (min(clip.duration, profile["max_duration"]), profile["audio_bitrate"])
+            if clip.audio is not None and key not in audio_paths:
+                audio_paths[key] = temp_audio_path(variant_path(output_base, platform))
+                clip.audio.subclip(0, key[0]).write_audiofile(audio_paths[key], fps=44100, codec="aac",
+                                                              bitrate=key[1], verbose=False, logger=None)
+                check(cancel_token)
+
+        for platform in platforms:
+            profile = PLATFORM_PROFILES[platform]
+            key = (min(clip.duration, profile["max_duration"]), profile["audio_bitrate"])
+            layout = choose_layout(tracks, clip.size, profile["size"], pool=pool)
+            encoders.append(VariantEncoder(
+                platform, layout, text, clip.duration, variant_path(output_base, platform), fps,
+                audio_path=audio_paths.get(key), preset=preset, faststart=faststart,
+                fragmented=fragmented, hls=hls, split=len(tracks) >= 2, threads=encoder_threads
+            ))
+
+        # One decode: every frame goes to each variant that is still within its duration
+        longest = max(encoder.duration for encoder in encoders)
+        for t, frame in clip.iter_frames(fps=fps, with_times=True, dtype="uint8"):
+            if t >= longest:
+                break
+            check(cancel_token)
+            for encoder in encoders:
+                if encoder.error is not None:
+                    raise Exception(f"{encoder.platform} variant failed: {encoder.error}")
+                if t < encoder.duration:
+                    encoder.put(t, frame)
+
+        pending, encoders = encoders, []
+        errors = []
+        for encoder in pending:
+            try:
+                encoder.finish()
+            except Exception as e:
+                errors.append(str(e))
+        if errors:
+            raise Exception("; ".join(errors))
+        return {encoder.platform: encoder.outputs for encoder in pending}
+    finally:
+        # Failed or cancelled: stop the remaining encoders before anything else
+        for encoder in encoders:
+            try:
+                encoder.finish()
+            except Exception:
+                pass
+        for path in audio_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+
+from shorts_catalog import hash_file
+from output_packaging import hls_playlist_path
+from config import RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES, RENDER_CACHE_VERSION
+
+
+def _canonical(value):
+    """JSON-able form of a key part: floats rounded to the millisecond/pixel, numpy unwrapped."""
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    if isinstance(value, float):
+        return round(value, 3)
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def render_key(**params):
+    """Stable hash of everything that determines a rendered short's bytes."""
+    params["version"] = RENDER_CACHE_VERSION
+    blob = json.dumps(_canonical(params), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _tree_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+class RenderCache:
+    """
+    Rendered shorts stored under their render_key, so re-running the
+    pipeline only encodes shorts whose source or edit parameters changed.
+    Entries are copies (an output overwritten later can't corrupt the
+    cache) and the least recently used ones are evicted once the cache
+    grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(cache_dir, "index.sqlite")
+        os.makedirs(cache_dir, exist_ok=True)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    has_hls INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (last_used);
+
+                CREATE TABLE IF NOT EXISTS source_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    hash TEXT NOT NULL
+                );
+            """)
+        conn.close()
+
+    def source_hash(self, path):
+        """Content hash of a source video, recomputed only when its size or mtime changed."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT size, mtime, hash FROM source_hashes WHERE path = ?", (path,)).fetchone()
+            if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+                digest = row[2]
+            else:
+                digest = hash_file(path)
+                conn.execute("INSERT OR REPLACE INTO source_hashes (path, size, mtime, hash) VALUES (?, ?, ?, ?)",
+                             (path, stat.st_size, stat.st_mtime, digest))
+        conn.close()
+        return digest
+
+    def _entry_paths(self, key):
+        entry_dir = os.path.join(self.cache_dir, key[:2], key)
+        return entry_dir, os.path.join(entry_dir, "short.mp4"), os.path.join(entry_dir, "hls")
+
+    def restore(self, key, output_path):
+        """Copies a cached render to output_path (and its HLS dir). Returns the outputs dict or None."""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT has_hls FROM entries WHERE key = ?", (key,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+
+        entry_dir, mp4_path, hls_dir = self._entry_paths(key)
+        if not os.path.exists(mp4_path) or (row[0] and not os.path.isdir(hls_dir)):
+            self._remove(key)
+            return None
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        shutil.copyfile(mp4_path, output_path)
+        outputs = {"mp4": output_path}
+        if row[0]:
+            playlist = hls_playlist_path(output_path)
+            shutil.rmtree(os.path.dirname(playlist), ignore_errors=True)
+            shutil.copytree(hls_dir, os.path.dirname(playlist))
+            outputs["hls"] = playlist
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        conn.close()
+        return outputs
+
+    def store(self, key, outputs):
+        """Adds a finished render (the outputs dict create_short_video returns), then evicts to size."""
+        entry_dir, mp4_path, hls_dir = self._entry_paths(key)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.makedirs(entry_dir)
+        shutil.copyfile(outputs["mp4"], mp4_path)
+        if outputs.get("hls"):
+            shutil.copytree(os.path.dirname(outputs["hls"]), hls_dir)
+
+        now = time.time()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, size, has_hls, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, _tree_size(entry_dir), int(bool(outputs.get("hls"))), now, now)
+            )
+        conn.close()
+        self.evict()
+
+    def _remove(self, key):
+        shutil.rmtree(self._entry_paths(key)[0], ignore_errors=True)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        conn.close()
+
+    def evict(self):
+        """Drops least recently used entries until the cache fits in max_bytes."""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute("SELECT key, size FROM entries ORDER BY last_used DESC").fetchall()
+        conn.close()
+
+        total = 0
+        evicted = 0
+        for key, size in rows:
+            total += size
+            if total > self.max_bytes:
+                self._remove(key)
+                evicted += 1
+        if evicted:
+            print(f"🧹 Render cache: evicted {evicted} least recently used renders")
+        return evicted
+
+    def stats(self):
+        with sqlite3.connect(self.db_path) as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        conn.close()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes}
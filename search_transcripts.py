@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Search every processed transcript and optionally render the hits as shorts:
+
+    python search_transcripts.py "compound interest"
+    python search_transcripts.py '"exactly this phrase" OR synonym' --source VIDEO_ID
+    python search_transcripts.py "climate*" --render 3 --tier preview
+"""
+
+import time
+import argparse
+
+from transcript_index import TranscriptIndex
+from config import TRANSCRIPT_INDEX_PATH, SEARCH_RESULT_LIMIT, RENDER_TIERS
+
+
+def format_time(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Full-text search across all processed transcripts')
+    parser.add_argument('query', help='Words to find; "quoted phrase", word* prefix and OR are supported')
+    parser.add_argument('--db', default=TRANSCRIPT_INDEX_PATH, help='Transcript index database')
+    parser.add_argument('--limit', type=int, default=SEARCH_RESULT_LIMIT, help='Maximum hits to show')
+    parser.add_argument('--source', help='Only search this source (video id)')
+    parser.add_argument('--render', type=int, default=0, metavar='N', help='Render the top N hits as shorts')
+    parser.add_argument('--tier', default='final', choices=list(RENDER_TIERS), help='Render tier for --render')
+    parser.add_argument('--output', default='generated_shorts', help='Output directory for --render')
+
+    args = parser.parse_args()
+
+    index = TranscriptIndex(args.db)
+    stats = index.stats()
+    print(f"🔍 Searching {stats['segments']:,} segments from {stats['sources']} sources "
+          f"({stats['hours']:.1f} hours)...")
+
+    started = time.perf_counter()
+    hits = index.search(args.query, limit=args.limit, source_id=args.source)
+    took_ms = (time.perf_counter() - started) * 1000
+
+    if not hits:
+        print(f"❌ No matches for: {args.query}")
+        return
+
+    print(f"✅ {len(hits)} hits in {took_ms:.1f} ms:\n")
+    for i, hit in enumerate(hits, 1):
+        print(f"🎯 {i}. {hit['title'] or hit['source_id']} @ {format_time(hit['start'])}-{format_time(hit['end'])}")
+        print(f"   💬 {hit['snippet']}")
+        print(f"   📈 Score: {hit['score']:.2f}")
+
+    if args.render:
+        # Generator (and its models) only when something has to be rendered
+        from main import YouTubeShortsGenerator
+
+        print(f"\n🎬 Rendering top {min(args.render, len(hits))} hits ({args.tier})...")
+        generator = YouTubeShortsGenerator(use_advanced=False)
+        for short in generator.render_search_hits(hits[:args.render], output_dir=args.output, tier=args.tier):
+            print(f"   ✅ {short['path']}")
+
+
+if __name__ == "__main__":
+    main()
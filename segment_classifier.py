@@ -0,0 +1,175 @@
+import os
+import time
+import sqlite3
+import hashlib
+import bisect
+
+try:
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+    print("⚠️ transformers/torch not available. Install with: pip install transformers torch")
+
+from config import (CACHE_DIR, CLASSIFIER_MODELS, CLASSIFIER_BATCH_SIZE,
+                    CLASSIFIER_THREADS, CLASSIFIER_LENGTH_BUCKETS)
+
+MAX_TOKENS = 256
+# SQLite's default limit on bound parameters is 999
+SQL_CHUNK = 900
+
+
+class SegmentClassifier:
+    def __init__(self, models=None, batch_size=CLASSIFIER_BATCH_SIZE,
+                 num_threads=CLASSIFIER_THREADS, length_buckets=CLASSIFIER_LENGTH_BUCKETS, cache_path=None):
+        self.models = models if models is not None else CLASSIFIER_MODELS
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.length_buckets = length_buckets
+        self.cache_path = cache_path or os.path.join(CACHE_DIR, "classifier.sqlite")
+        self._loaded = {}
+        self._init_cache()
+
+    def _init_cache(self):
+        with sqlite3.connect(self.cache_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS predictions (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+
+    def _load(self, task):
+        """Loads (tokenizer, model) for a task once."""
+        if task not in self._loaded:
+            if not TRANSFORMERS_AVAILABLE:
+                raise Exception("transformers is not available. Install with: pip install transformers torch")
+            name = self.models[task]
+            print(f"🧠 Loading {task} model: {name}")
+            torch.set_num_threads(self.num_threads)
+            tokenizer = AutoTokenizer.from_pretrained(name)
+            model = AutoModelForSequenceClassification.from_pretrained(name)
+            model.eval()
+            self._loaded[task] = (tokenizer, model)
+        return self._loaded[task]
+
+    def _token_lengths(self, task, texts):
+        """Token count of each text (truncated at MAX_TOKENS), without padding."""
+        tokenizer, _ = self._load(task)
+        return [len(ids) for ids in tokenizer(texts, truncation=True, max_length=MAX_TOKENS)["input_ids"]]
+
+    def _predict(self, task, texts):
+        """One padded batch through the task's model: a (label, score) per text."""
+        tokenizer, model = self._load(task)
+        inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=MAX_TOKENS)
+        with torch.inference_mode():
+            probs = torch.softmax(model(**inputs).logits, dim=-1)
+        scores, labels = probs.max(dim=-1)
+        return [(model.config.id2label[label_id], score) for label_id, score in zip(labels.tolist(), scores.tolist())]
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _cached(self, model_name, hashes):
+        """Returns {text_hash: (label, score)} for the hashes already on disk."""
+        found = {}
+        unique = list(set(hashes))
+        with sqlite3.connect(self.cache_path) as conn:
+            for c in range(0, len(unique), SQL_CHUNK):
+                chunk = unique[c:c + SQL_CHUNK]
+                rows = conn.execute(
+                    f"SELECT text_hash, label, score FROM predictions "
+                    f"WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [model_name] + chunk
+                )
+                for text_hash, label, score in rows:
+                    found[text_hash] = (label, score)
+        return found
+
+    def bucket_batches(self, lengths):
+        """
+        Groups indices into batches of similar token length: sort by length,
+        then start a new batch whenever it is full or a bucket edge is crossed.
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches = []
+        current, current_bucket = [], None
+        for i in order:
+            bucket = bisect.bisect_left(self.length_buckets, lengths[i])
+            if current and (len(current) >= self.batch_size or bucket != current_bucket):
+                batches.append(current)
+                current = []
+            current.append(i)
+            current_bucket = bucket
+        if current:
+            batches.append(current)
+        return batches
+
+    def classify(self, task, texts):
+        """Returns a {"label", "score"} dict per text, using the disk cache."""
+        model_name = self.models[task]
+        hashes = [self._hash(t) for t in texts]
+        cached = self._cached(model_name, hashes)
+
+        # Duplicate texts (e.g. "Yeah.") only go through the model once
+        todo = {}
+        for i, h in enumerate(hashes):
+            if h not in cached and h not in todo:
+                todo[h] = i
+        pending = list(todo.values())
+
+        if pending:
+            pending_texts = [texts[i] for i in pending]
+            lengths = self._token_lengths(task, pending_texts)
+
+            new_rows = []
+            for batch in self.bucket_batches(lengths):
+                predictions = self._predict(task, [pending_texts[b] for b in batch])
+                for b, (label, score) in zip(batch, predictions):
+                    h = hashes[pending[b]]
+                    cached[h] = (label, score)
+                    new_rows.append((model_name, h, label, score))
+
+            with sqlite3.connect(self.cache_path) as conn:
+                conn.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)", new_rows)
+
+        return [{"label": cached[h][0], "score": cached[h][1]} for h in hashes]
+
+    def annotate(self, segments):
+        """
+        Adds "sentiment" and "emotion" to every segment.
+        Returns throughput stats so we know the stage's capacity.
+        """
+        texts = [s["text"] for s in segments]
+        stats = {"segments": len(texts)}
+
+        for task in self.models:
+            started = time.time()
+            for segment, result in zip(segments, self.classify(task, texts)):
+                segment[task] = result
+            elapsed = time.time() - started
+            stats[f"{task}_seconds"] = elapsed
+            stats[f"{task}_segments_per_second"] = len(texts) / elapsed if elapsed > 0 else float("inf")
+            print(f"✅ {task}: {len(texts)} segments in {elapsed:.1f}s "
+                  f"({stats[f'{task}_segments_per_second']:.0f} segments/s)")
+        return stats
+
+    @staticmethod
+    def intensity(segment):
+        """
+        Emotional intensity in [0, 1]: confidence of a non-neutral emotion,
+        averaged with how decisive the (binary) sentiment call is.
+        """
+        values = []
+        emotion = segment.get("emotion")
+        if emotion:
+            values.append(0.0 if emotion["label"] == "neutral" else emotion["score"])
+        sentiment = segment.get("sentiment")
+        if sentiment:
+            values.append(max(0.0, 2.0 * sentiment["score"] - 1.0))
+        return sum(values) / len(values) if values else 0.0
@@ -0,0 +1,201 @@
+import re
+from collections import defaultdict
+import numpy as np
+from scipy import sparse
+
+from config import HOOK_QUERIES, HOOK_QUERY_WEIGHTS, HOOK_SCORE_WEIGHT, DISTINCTIVENESS_WEIGHT
+
+# Latin/Devanagari words, plus the NUL separator used to join segments so the
+# whole transcript can be tokenized with a single regex pass.
+TOKEN_PATTERN = re.compile(r"[\w\u0900-\u097F]+|\x00")
+SEPARATOR = "\x00"
+
+
+class SegmentScorer:
+    def __init__(self, hook_queries=None, query_weights=None, k1=1.5, b=0.75,
+                 hook_weight=HOOK_SCORE_WEIGHT, distinct_weight=DISTINCTIVENESS_WEIGHT):
+        self.hook_queries = hook_queries if hook_queries is not None else HOOK_QUERIES
+        self.query_weights = query_weights if query_weights is not None else HOOK_QUERY_WEIGHTS
+        self.k1 = k1
+        self.b = b
+        self.hook_weight = hook_weight
+        self.distinct_weight = distinct_weight
+
+    def tokenize(self, text):
+        """
+        Lowercases the text and splits it into words.
+        Apostrophes are dropped so that "won't" and "wont" match.
+        """
+        text = text.lower().replace("'", "").replace("\u2019", "")
+        return [w for w in TOKEN_PATTERN.findall(text) if w != SEPARATOR]
+
+    def build_term_matrix(self, texts):
+        """
+        Builds a (segments x vocabulary) sparse count matrix in one pass
+        over the whole transcript. Columns are unigrams followed by the
+        bigrams seen in this episode, so multi-word hooks ("wait for it")
+        outrank their parts.
+        Returns the CSR matrix, the vocabulary and unigram lengths.
+        """
+        n = len(texts)
+        corpus = SEPARATOR.join(texts).lower().replace("'", "").replace("\u2019", "")
+        tokens = TOKEN_PATTERN.findall(corpus + SEPARATOR)
+
+        # Unseen words get the next free id; keeps the lookup in C
+        words = defaultdict()
+        words.default_factory = words.__len__
+        words[SEPARATOR]
+        ids = np.fromiter(map(words.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+
+        is_sep = ids == 0
+        rows = np.cumsum(is_sep) - is_sep
+        keep = ~is_sep
+        uni_rows, uni_cols = rows[keep], ids[keep] - 1
+        n_words = len(words) - 1
+        lengths = np.bincount(uni_rows, minlength=n).astype(np.float64)
+
+        # Bigrams never span a segment boundary (the separator sits between)
+        pair_ok = keep[:-1] & keep[1:]
+        pair_keys = (ids[:-1] - 1) * n_words + (ids[1:] - 1)
+        bigram_keys, bigram_cols = np.unique(pair_keys[pair_ok], return_inverse=True)
+
+        matrix = sparse.csr_matrix(
+            (
+                np.ones(len(uni_rows) + len(bigram_cols)),
+                (
+                    np.concatenate([uni_rows, rows[:-1][pair_ok]]),
+                    np.concatenate([uni_cols, bigram_cols.ravel() + n_words]),
+                ),
+            ),
+            shape=(n, max(n_words + len(bigram_keys), 1)),
+        )
+        matrix.sum_duplicates()
+
+        del words[SEPARATOR]
+        vocab = {"words": {w: i - 1 for w, i in words.items()}, "bigrams": bigram_keys}
+        return matrix, vocab, lengths
+
+    def _term_columns(self, phrase, vocab):
+        """Maps a hook phrase to the matrix columns of its words and bigrams."""
+        word_ids = vocab["words"]
+        n_words = len(word_ids)
+        ids = [word_ids.get(w) for w in self.tokenize(phrase)]
+        columns = {i for i in ids if i is not None}
+
+        for a, b in zip(ids, ids[1:]):
+            if a is None or b is None:
+                continue
+            key = a * n_words + b
+            pos = np.searchsorted(vocab["bigrams"], key)
+            if pos < len(vocab["bigrams"]) and vocab["bigrams"][pos] == key:
+                columns.add(n_words + int(pos))
+        return columns
+
+    def build_query_matrix(self, vocab, n_columns):
+        """
+        Builds a (query sets x vocabulary) matrix of the hook phrases.
+        Terms that never occur in this episode are dropped.
+        """
+        names = list(self.hook_queries)
+        rows, cols = [], []
+        for row, name in enumerate(names):
+            columns = set()
+            for phrase in self.hook_queries[name]:
+                columns |= self._term_columns(phrase, vocab)
+            rows.extend([row] * len(columns))
+            cols.extend(columns)
+
+        query_matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(names), n_columns),
+        )
+        weights = np.array([self.query_weights.get(name, 1.0) for name in names])
+        return query_matrix, weights
+
+    def score(self, segments):
+        """
+        Scores every segment against the hook query sets (BM25) and
+        against the rest of the episode (TF-IDF distinctiveness).
+        Returns a dict of per-segment numpy arrays, all in [0, 1].
+        """
+        n = len(segments)
+        if n == 0:
+            empty = np.zeros(0)
+            return {"hook": empty, "distinctiveness": empty, "score": empty}
+
+        counts, vocab, lengths = self.build_term_matrix([s["text"] for s in segments])
+
+        # Document frequency / IDF, shared by BM25 and TF-IDF
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+
+        avgdl = max(lengths.mean(), 1.0)
+        row_of = np.repeat(np.arange(n), np.diff(counts.indptr))
+        tf = counts.data
+        norm = self.k1 * (1.0 - self.b + self.b * lengths[row_of] / avgdl)
+        bm25 = sparse.csr_matrix(
+            (tf * (self.k1 + 1.0) / (tf + norm) * idf[counts.indices], counts.indices, counts.indptr),
+            shape=counts.shape,
+        )
+
+        query_matrix, weights = self.build_query_matrix(vocab, counts.shape[1])
+        hook = np.asarray(bm25 @ query_matrix.T @ weights).ravel()
+
+        # Distinctiveness: 1 - cosine(segment, episode centroid) on TF-IDF rows
+        tfidf = sparse.csr_matrix(
+            (np.log1p(tf) * idf[counts.indices], counts.indices, counts.indptr),
+            shape=counts.shape,
+        )
+        row_norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        nonempty = row_norms > 0
+        tfidf = sparse.diags(np.where(nonempty, 1.0 / np.maximum(row_norms, 1e-12), 0.0)) @ tfidf
+        centroid = np.asarray(tfidf.mean(axis=0)).ravel()
+        centroid_norm = np.linalg.norm(centroid)
+        if centroid_norm > 0:
+            similarity = tfidf @ (centroid / centroid_norm)
+        else:
+            similarity = np.zeros(n)
+        distinct = np.where(nonempty, 1.0 - similarity, 0.0)
+        # Don't let one-word segments ("Yeah.") win on distinctiveness alone
+        distinct *= np.minimum(1.0, lengths / avgdl)
+
+        hook = self._normalize(hook)
+        distinct = self._normalize(distinct)
+        return {
+            "hook": hook,
+            "distinctiveness": distinct,
+            "score": self.hook_weight * hook + self.distinct_weight * distinct,
+        }
+
+    def top_moments(self, segments, top_k=10):
+        """
+        Returns the best segments in the viral_moments format
+        (sentence/index/score) plus start/end when segments carry them.
+        """
+        scores = self.score(segments)["score"]
+        if len(scores) == 0:
+            return []
+
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        moments = []
+        for i in best:
+            if scores[i] <= 0:
+                continue
+            moment = {
+                "sentence": segments[i]["text"],
+                "index": int(i),
+                "score": float(scores[i]),
+            }
+            if "start" in segments[i]:
+                moment["start"] = segments[i]["start"]
+                moment["end"] = segments[i]["end"]
+            moments.append(moment)
+        return moments
+
+    @staticmethod
+    def _normalize(values):
+        peak = values.max() if len(values) else 0.0
+        return values / peak if peak > 0 else np.zeros_like(values)
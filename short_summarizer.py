@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import hashlib
+
+try:
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+    print("⚠️ transformers/torch not available. Install with: pip install transformers torch")
+
+from config import (CACHE_DIR, SUMMARIZER_MODEL, SUMMARIZER_BATCH_SIZE,
+                    SUMMARIZER_THREADS, SUMMARIZER_QUANTIZE)
+
+TITLE_MAX_CHARS = 70
+DESCRIPTION_MAX_CHARS = 200
+
+
+class ShortSummarizer:
+    def __init__(self, model_name=SUMMARIZER_MODEL, batch_size=SUMMARIZER_BATCH_SIZE,
+                 num_threads=SUMMARIZER_THREADS, quantize=SUMMARIZER_QUANTIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.quantize = quantize
+        self.cache_dir = os.path.join(CACHE_DIR, "summaries")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Loaded on first use so starting the app doesn't pay for BART
+        self.tokenizer = None
+        self.model = None
+
+    def _load(self):
+        """Loads the model once, optionally int8-quantized for CPU."""
+        if self.model is not None:
+            return
+        if not TRANSFORMERS_AVAILABLE:
+            raise Exception("transformers is not available. Install with: pip install transformers torch")
+
+        print(f"🧠 Loading summarizer: {self.model_name}")
+        torch.set_num_threads(self.num_threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
+        model.eval()
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+    def _token_lengths(self, texts):
+        """Token count of each text, without padding."""
+        self._load()
+        return [len(ids) for ids in self.tokenizer(texts, truncation=True)["input_ids"]]
+
+    def _generate(self, texts, max_length, min_length):
+        """One padded batch through the model."""
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=1024)
+        with torch.inference_mode():
+            output_ids = self.model.generate(
+                **inputs, max_length=max_length, min_length=min_length,
+                num_beams=2, early_stopping=True
+            )
+        return [summary.strip() for summary in self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)]
+
+    def _cache_path(self, text, max_length, min_length):
+        # The int8 model words its summaries slightly differently, so it gets its own entries
+        key = f"{self.model_name}|{'int8' if self.quantize else 'fp32'}|{max_length}|{min_length}|{text}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def summarize(self, texts, max_length=60, min_length=10):
+        """
+        Summarizes a list of texts. Cached results are read from disk; the
+        rest go through the model in length-sorted batches so each batch
+        pads as little as possible.
+        """
+        summaries = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            path = self._cache_path(text, max_length, min_length)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    summaries[i] = json.load(f)["summary"]
+            elif text.strip():
+                pending.append(i)
+            else:
+                summaries[i] = ""
+
+        if not pending:
+            return summaries
+
+        started = time.time()
+
+        # Token lengths without padding, then longest-first batches
+        lengths = self._token_lengths([texts[i] for i in pending])
+        pending = [i for _, i in sorted(zip(lengths, pending), reverse=True)]
+
+        for b in range(0, len(pending), self.batch_size):
+            batch = pending[b:b + self.batch_size]
+            decoded = self._generate([texts[i] for i in batch], max_length, min_length)
+
+            for i, summary in zip(batch, decoded):
+                summaries[i] = summary
+                with open(self._cache_path(texts[i], max_length, min_length), "w", encoding="utf-8") as f:
+                    json.dump({"summary": summaries[i]}, f, ensure_ascii=False)
+
+        print(f"✅ Summarized {len(pending)} moments in {time.time() - started:.1f}s")
+        return summaries
+
+    def add_titles_and_descriptions(self, moments):
+        """
+        Adds "title" and "description" to every moment in one batched pass.
+        The description is the summary; the title is its first sentence.
+        Without transformers, or if the model fails to load or run, both are
+        cut from the moment's own text instead of failing the job.
+        """
+        texts = [m.get("transcript", m["text"]) for m in moments]
+        summaries = [""] * len(moments)
+        try:
+            summaries = self.summarize(texts)
+        except Exception as e:
+            if TRANSFORMERS_AVAILABLE:
+                print(f"⚠️ Summarizer failed, titles come from the transcript: {e}")
+            else:
+                print("⚠️ transformers not available, titles come from the transcript")
+
+        for moment, summary in zip(moments, summaries):
+            moment["description"] = summary or self.make_description(moment["text"])
+            moment["title"] = self.make_title(moment["description"])
+        return moments
+
+    @staticmethod
+    def make_description(text):
+        """The text itself, cut at a word boundary if it is too long for a description."""
+        text = " ".join(text.split())
+        if len(text) > DESCRIPTION_MAX_CHARS:
+            text = text[:DESCRIPTION_MAX_CHARS].rsplit(" ", 1)[0].rstrip(",;:") + "…"
+        return text
+
+    @staticmethod
+    def make_title(summary):
+        """First sentence of the summary, cut at a word boundary."""
+        title = summary.split(". ")[0].strip().rstrip(".")
+        if len(title) > TITLE_MAX_CHARS:
+            title = title[:TITLE_MAX_CHARS].rsplit(" ", 1)[0].rstrip(",;:") + "…"
+        return title
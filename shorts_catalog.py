@@ -0,0 +1,203 @@
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+
+from config import CATALOG_PATH, HASH_CHUNK_SIZE, OUTPUT_DIR
+
+# Columns a caller may set through add_short(); everything else is derived
+METADATA_COLUMNS = [
+    "source_id", "start_time", "end_time", "text", "title", "description",
+    "viral_score", "engagement_score", "face_count", "speakers", "is_multi_speaker",
+]
+
+SORT_COLUMNS = {"created_at", "viral_score", "engagement_score", "file_size", "duration", "filename"}
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 of a file, read in fixed-size chunks so big videos never sit in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ShortsCatalog:
+    def __init__(self, db_path=CATALOG_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS shorts (
+                    path TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    source_id TEXT,
+                    start_time REAL,
+                    end_time REAL,
+                    duration REAL,
+                    text TEXT,
+                    title TEXT,
+                    description TEXT,
+                    viral_score REAL,
+                    engagement_score REAL,
+                    face_count INTEGER,
+                    speakers TEXT,
+                    is_multi_speaker INTEGER,
+                    file_size INTEGER,
+                    file_hash TEXT,
+                    created_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_shorts_source ON shorts (source_id);
+                CREATE INDEX IF NOT EXISTS idx_shorts_created ON shorts (created_at);
+                CREATE INDEX IF NOT EXISTS idx_shorts_viral ON shorts (viral_score);
+
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    hash TEXT NOT NULL
+                );
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def file_hash(self, path, conn=None):
+        """
+        Content hash of a file, recomputed only when its size or mtime
+        changed since the last time we hashed it.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        own_conn = conn is None
+        conn = conn or self._connect()
+        try:
+            row = conn.execute("SELECT size, mtime, hash FROM file_hashes WHERE path = ?", (path,)).fetchone()
+            if row and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime:
+                return row["hash"]
+
+            digest = hash_file(path)
+            conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime, hash) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, digest)
+            )
+            if own_conn:
+                conn.commit()
+            return digest
+        finally:
+            if own_conn:
+                conn.close()
+
+    def add_short(self, path, **metadata):
+        """Adds or updates one rendered short."""
+        path = os.path.abspath(path)
+        values = {key: metadata.get(key) for key in METADATA_COLUMNS}
+        if isinstance(values["speakers"], (list, dict)):
+            values["speakers"] = json.dumps(values["speakers"])
+        if values["start_time"] is not None and values["end_time"] is not None:
+            values["duration"] = values["end_time"] - values["start_time"]
+        else:
+            values["duration"] = metadata.get("duration")
+
+        with self._connect() as conn:
+            values["path"] = path
+            values["filename"] = os.path.basename(path)
+            values["file_size"] = os.path.getsize(path)
+            values["file_hash"] = self.file_hash(path, conn)
+            values["created_at"] = metadata.get("created_at") or datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+
+            columns = ", ".join(values)
+            placeholders = ", ".join("?" * len(values))
+            conn.execute(f"INSERT OR REPLACE INTO shorts ({columns}) VALUES ({placeholders})", list(values.values()))
+        conn.close()
+
+    def remove_short(self, path):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM shorts WHERE path = ?", (os.path.abspath(path),))
+        conn.close()
+
+    def list_shorts(self, source_id=None, min_viral_score=None, since=None,
+                    order_by="created_at", descending=True, limit=None):
+        """Indexed query over the catalog; newest first by default."""
+        if order_by not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {order_by}, use one of {sorted(SORT_COLUMNS)}")
+
+        where, params = [], []
+        if source_id is not None:
+            where.append("source_id = ?")
+            params.append(source_id)
+        if min_viral_score is not None:
+            where.append("viral_score >= ?")
+            params.append(min_viral_score)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+
+        query = "SELECT * FROM shorts"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        conn.close()
+        return [self._row_to_short(row) for row in rows]
+
+    def summary(self):
+        """Aggregate numbers for the summary report, computed in SQL."""
+        with self._connect() as conn:
+            totals = conn.execute("""
+                SELECT COUNT(*) AS count, COALESCE(SUM(file_size), 0) AS total_size,
+                       COALESCE(SUM(duration), 0) AS total_duration, AVG(viral_score) AS avg_viral_score,
+                       COUNT(DISTINCT source_id) AS sources
+                FROM shorts
+            """).fetchone()
+            per_source = conn.execute("""
+                SELECT source_id, COUNT(*) AS count, MAX(viral_score) AS best_score
+                FROM shorts GROUP BY source_id ORDER BY count DESC
+            """).fetchall()
+        conn.close()
+        summary = dict(totals)
+        summary["per_source"] = [dict(row) for row in per_source]
+        return summary
+
+    def sync_directory(self, directory=OUTPUT_DIR):
+        """
+        One-off import of shorts rendered before the catalog existed (reads
+        their _metadata.json if present) and removal of rows whose file is gone.
+        Normal listing never walks the directory.
+        """
+        known = {short["path"] for short in self.list_shorts()}
+        for path in known:
+            if not os.path.exists(path):
+                self.remove_short(path)
+
+        added = 0
+        for name in os.listdir(directory):
+            path = os.path.abspath(os.path.join(directory, name))
+            if not name.endswith(".mp4") or path in known:
+                continue
+            metadata = {}
+            metadata_path = os.path.splitext(path)[0] + "_metadata.json"
+            if os.path.exists(metadata_path):
+                with open(metadata_path, "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+            self.add_short(path, **metadata)
+            added += 1
+        return added
+
+    @staticmethod
+    def _row_to_short(row):
+        short = {key: row[key] for key in row.keys() if row[key] is not None}
+        if "speakers" in short:
+            short["speakers"] = json.loads(short["speakers"])
+        if "is_multi_speaker" in short:
+            short["is_multi_speaker"] = bool(short["is_multi_speaker"])
+        return short
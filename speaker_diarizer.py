@@ -0,0 +1,219 @@
+import time
+import numpy as np
+from scipy.cluster.hierarchy import linkage, fcluster
+
+from audio_decoder import iter_audio_blocks
+from config import (DIARIZATION_MAX_SPEAKERS, DIARIZATION_WINDOW, DIARIZATION_HOP,
+                    DIARIZATION_MAX_WINDOWS, DIARIZATION_MIN_SILHOUETTE, DIARIZATION_MIN_SHARE)
+
+SAMPLE_RATE = 16000
+N_FFT = 512
+WIN_LENGTH = 400          # 25 ms analysis window
+HOP = 160                 # 10 ms per frame
+N_MELS = 40
+BLOCK_SECONDS = 60        # a multiple of DIARIZATION_HOP, so windows tile blocks exactly
+SPEECH_LEVEL = 0.25       # speech sits this far above the quietest windows (between p10 and p90)
+MIN_CLUSTER_SHARE = 0.05  # smaller clusters are transitions/noise, folded into their nearest neighbour
+
+
+def mel_filterbank(sample_rate=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS):
+    """Triangular mel filters, shape (n_mels, n_fft // 2 + 1)."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    edges = mel_to_hz(np.linspace(hz_to_mel(0), hz_to_mel(sample_rate / 2), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def log_mel(samples, filterbank):
+    """Log-mel frames of one block (strided view, one rfft call), shape (frames, n_mels)."""
+    if len(samples) < WIN_LENGTH:
+        return np.zeros((0, filterbank.shape[0]), dtype=np.float32)
+    n_frames = 1 + (len(samples) - WIN_LENGTH) // HOP
+    frames = np.lib.stride_tricks.as_strided(
+        samples, shape=(n_frames, WIN_LENGTH),
+        strides=(samples.strides[0] * HOP, samples.strides[0])
+    )
+    power = np.abs(np.fft.rfft(frames * np.hamming(WIN_LENGTH).astype(np.float32), n=N_FFT, axis=1)) ** 2
+    return np.log(power @ filterbank.T + 1e-10).astype(np.float32)
+
+
+def window_stats(features, window, hop):
+    """Mean and std of features over sliding windows, from cumulative sums."""
+    n = 1 + (len(features) - window) // hop if len(features) >= window else 0
+    if n == 0:
+        return np.zeros((0, features.shape[1] * 2), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    padded = np.vstack([np.zeros((1, features.shape[1])), np.cumsum(features, axis=0, dtype=np.float64)])
+    padded_sq = np.vstack([np.zeros((1, features.shape[1])), np.cumsum(features.astype(np.float64) ** 2, axis=0)])
+    starts = np.arange(n) * hop
+    total = padded[starts + window] - padded[starts]
+    total_sq = padded_sq[starts + window] - padded_sq[starts]
+    mean = total / window
+    std = np.sqrt(np.maximum(total_sq / window - mean ** 2, 0.0))
+    return np.hstack([mean, std]).astype(np.float32), mean.mean(axis=1).astype(np.float32)
+
+
+def silhouette(embeddings, labels):
+    """Mean silhouette with cosine distance (embeddings are L2-normalised)."""
+    clusters = np.unique(labels)
+    if len(clusters) < 2:
+        return -1.0
+    distances = 1.0 - embeddings @ embeddings.T
+    onehot = (labels[:, None] == clusters[None, :]).astype(np.float32)
+    counts = onehot.sum(axis=0)
+    mean_to = distances @ onehot  # (n, k) summed distances to each cluster
+    own = onehot.astype(bool)
+    own_counts = counts[np.argmax(onehot, axis=1)]
+    a = mean_to[own] / np.maximum(own_counts - 1, 1)
+    other = np.where(own, np.inf, mean_to / counts)
+    b = other.min(axis=1)
+    s = (b - a) / np.maximum(np.maximum(a, b), 1e-9)
+    s[own_counts <= 1] = 0.0
+    return float(s.mean())
+
+
+class SpeakerDiarizer:
+    def __init__(self, max_speakers=DIARIZATION_MAX_SPEAKERS, window=DIARIZATION_WINDOW,
+                 hop=DIARIZATION_HOP, max_windows=DIARIZATION_MAX_WINDOWS,
+                 min_silhouette=DIARIZATION_MIN_SILHOUETTE):
+        self.max_speakers = max_speakers
+        self.window_frames = int(round(window * SAMPLE_RATE / HOP))
+        self.hop_frames = int(round(hop * SAMPLE_RATE / HOP))
+        self.max_windows = max_windows
+        self.min_silhouette = min_silhouette
+        self.filterbank = mel_filterbank()
+
+    def embed(self, audio_path):
+        """
+        Speaker embeddings of sliding windows over the soundtrack.
+        Returns (embeddings, window start times, window energies, duration).
+        """
+        embeddings, energies, starts = [], [], []
+        offset = 0.0
+        for block in iter_audio_blocks(audio_path, SAMPLE_RATE, BLOCK_SECONDS):
+            stats, energy = window_stats(log_mel(block, self.filterbank), self.window_frames, self.hop_frames)
+            embeddings.append(stats)
+            energies.append(energy)
+            starts.append(offset + np.arange(len(stats)) * self.hop_frames * HOP / SAMPLE_RATE)
+            offset += len(block) / SAMPLE_RATE
+
+        if not embeddings:
+            return np.zeros((0, 2 * N_MELS), dtype=np.float32), np.zeros(0), np.zeros(0), 0.0
+        return np.vstack(embeddings), np.concatenate(starts), np.concatenate(energies), offset
+
+    def cluster(self, embeddings):
+        """
+        Speaker label per window. Average-linkage (cosine) clustering on at
+        most max_windows windows, the speaker count picked by silhouette, and
+        every other window assigned to the nearest cluster centroid.
+        """
+        n = len(embeddings)
+        if n < 4:
+            return np.zeros(n, dtype=np.int64)
+
+        # Per-dimension normalisation so loudness/channel doesn't dominate
+        normalised = (embeddings - embeddings.mean(axis=0)) / (embeddings.std(axis=0) + 1e-6)
+        normalised /= np.linalg.norm(normalised, axis=1, keepdims=True) + 1e-9
+
+        sample = np.linspace(0, n - 1, min(n, self.max_windows)).astype(np.int64)
+        tree = linkage(normalised[sample], method="average", metric="cosine")
+
+        best_labels, best_score = np.zeros(len(sample), dtype=np.int64), self.min_silhouette
+        for k in range(2, self.max_speakers + 1):
+            labels = fcluster(tree, k, criterion="maxclust") - 1
+            score = silhouette(normalised[sample], labels)
+            if score > best_score:
+                best_labels, best_score = labels, score
+
+        clusters, counts = np.unique(best_labels, return_counts=True)
+        clusters = clusters[counts >= MIN_CLUSTER_SHARE * len(sample)]
+        if len(clusters) <= 1:
+            return np.zeros(n, dtype=np.int64)
+        centroids = np.vstack([normalised[sample][best_labels == c].mean(axis=0) for c in clusters])
+        return np.argmax(normalised @ centroids.T, axis=1).astype(np.int64)
+
+    def label_segments(self, audio_path, segments):
+        """
+        Adds "speaker" (e.g. "SPEAKER_1") to each segment, by the speaker
+        who owns most of the speech windows overlapping it.
+        Returns the number of speakers found.
+        """
+        started = time.time()
+        embeddings, starts, energies, duration = self.embed(audio_path)
+        if len(embeddings) == 0:
+            # Nothing to cluster: leave the segments unlabelled rather than claim one speaker
+            return 1
+
+        low, high = np.percentile(energies, [10, 90])
+        speech = energies >= low + SPEECH_LEVEL * (high - low)
+        labels = np.full(len(embeddings), -1, dtype=np.int64)
+        labels[speech] = self.cluster(embeddings[speech])
+
+        window_seconds = self.window_frames * HOP / SAMPLE_RATE
+        centers = starts + window_seconds / 2
+        order = {}
+        for segment in segments:
+            lo, hi = np.searchsorted(centers, [segment["start"], segment["end"]])
+            inside = labels[lo:hi]
+            inside = inside[inside >= 0]
+            if len(inside) == 0:
+                # Short segment between window centres: nearest speech window
+                nearest = np.argsort(np.abs(centers - (segment["start"] + segment["end"]) / 2))
+                nearest = [i for i in nearest[:8] if labels[i] >= 0]
+                label = labels[nearest[0]] if nearest else 0
+            else:
+                label = np.bincount(inside).argmax()
+            # Speaker ids by first appearance in the transcript
+            segment["speaker"] = f"SPEAKER_{order.setdefault(int(label), len(order))}"
+
+        elapsed = time.time() - started
+        n_speakers = max(1, len(order))
+        print(f"✅ Diarized {duration / 60:.1f} min into {n_speakers} speaker(s) in {elapsed:.1f}s "
+              f"({duration / elapsed if elapsed > 0 else 0:.0f}x realtime)")
+        return n_speakers
+
+
+def clip_speaker_stats(segments, first, last, min_share=DIARIZATION_MIN_SHARE):
+    """
+    Speakers of segments[first..last] by talk time, whether it's a real
+    conversation, and an engagement score (0-10) from turn-taking rate and
+    how evenly the talk time is shared. "diarized" says whether every
+    segment actually carried a speaker label.
+    """
+    clip = segments[first:last + 1]
+    talk = {}
+    for segment in clip:
+        speaker = segment.get("speaker", "SPEAKER_0")
+        talk[speaker] = talk.get(speaker, 0.0) + max(0.0, segment["end"] - segment["start"])
+    total = sum(talk.values()) or 1.0
+    speakers = [s for s, t in sorted(talk.items(), key=lambda item: -item[1]) if t / total >= min_share]
+
+    # Hand-overs between the clip's real speakers only
+    voices = [s.get("speaker", "SPEAKER_0") for s in clip if s.get("speaker", "SPEAKER_0") in speakers]
+    turns = sum(1 for a, b in zip(voices, voices[1:]) if a != b)
+    minutes = max((clip[-1]["end"] - clip[0]["start"]) / 60.0, 1e-6) if clip else 1.0
+    shares = np.array([talk[s] / total for s in speakers])
+    balance = float(-(shares * np.log(shares)).sum() / np.log(len(shares))) if len(shares) > 1 else 0.0
+
+    return {
+        "speakers": speakers or ["SPEAKER_0"],
+        "is_multi_speaker": len(speakers) > 1,
+        "diarized": bool(clip) and all("speaker" in segment for segment in clip),
+        "engagement_score": 10.0 * (0.5 * balance + 0.5 * min(1.0, turns / minutes / 6.0)),
+    }
+
+
+def needs_face_scan(moment):
+    """
+    Only a diarized single-voice clip can skip the face scan. Without
+    speaker labels (diarization failed, an older cached transcript, caption
+    or fallback segments) the speaker count is unknown, so scan.
+    """
+    return moment.get("is_multi_speaker", True) or not moment.get("diarized", False)
@@ -0,0 +1,176 @@
+import numpy as np
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+    print("⚠️ OpenCV not available. Install with: pip install opencv-python")
+
+from compositor import CenterCropLayout
+from config import (FACE_TRACK_FPS, FACE_DETECT_HEIGHT, SPLIT_PANE_FACE_HEIGHT,
+                    SPLIT_MIN_SEPARATION)
+
+
+def _two_means(values, iterations=10):
+    """1-D k-means with k=2, started from the extremes. Returns (labels, centers)."""
+    centers = np.array([values.min(), values.max()], dtype=np.float64)
+    labels = np.zeros(len(values), dtype=np.int64)
+    for _ in range(iterations):
+        labels = (np.abs(values - centers[1]) < np.abs(values - centers[0])).astype(np.int64)
+        for k in (0, 1):
+            if np.any(labels == k):
+                centers[k] = values[labels == k].mean()
+    return labels, centers
+
+
+def track_faces(video_path, start_time, end_time, sample_fps=FACE_TRACK_FPS, cancel_token=None):
+    """
+    Face tracks of the two speakers in [start_time, end_time].
+    Returns a list (left speaker first) of {"times", "cx", "cy", "size"} numpy
+    arrays in source pixels, times relative to start_time. Empty if there
+    aren't two clearly separated people.
+    """
+    if not CV2_AVAILABLE:
+        return []
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    src_w = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+    src_h = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+    scale = min(1.0, FACE_DETECT_HEIGHT / src_h) if src_h else 1.0
+    step = max(1, int(round(fps / sample_fps)))
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, int(start_time * fps))
+    n_frames = int((end_time - start_time) * fps)
+    detections = []  # (t, cx, cy, size)
+    for i in range(n_frames):
+        if cancel_token is not None and cancel_token.cancelled:
+            cap.release()
+            cancel_token.check()
+        # grab() skips decoding-to-BGR for frames we don't sample
+        if not cap.grab():
+            break
+        if i % step:
+            continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        for (x, y, w, h) in face_cascade.detectMultiScale(gray, 1.1, 4):
+            detections.append((i / fps, (x + w / 2) / scale, (y + h / 2) / scale, h / scale))
+    cap.release()
+
+    if len(detections) < 4:
+        return []
+
+    detections = np.array(detections, dtype=np.float64)
+    labels, centers = _two_means(detections[:, 1])
+    if abs(centers[1] - centers[0]) < SPLIT_MIN_SEPARATION * src_w:
+        return []
+
+    tracks = []
+    for k in np.argsort(centers):
+        own = detections[labels == k]
+        # Largest face per sampled time, so a stray false positive can't win
+        own = own[np.lexsort((-own[:, 3], own[:, 0]))]
+        _, first = np.unique(own[:, 0], return_index=True)
+        own = own[first]
+        if len(own) < 2:
+            return []
+        tracks.append({"times": own[:, 0], "cx": own[:, 1], "cy": own[:, 2], "size": own[:, 3]})
+    return tracks
+
+
+def choose_layout(tracks, src_size, out_size, pool=None):
+    """Split screen when there are two speaker tracks, otherwise a centre crop."""
+    if len(tracks) >= 2:
+        return SplitScreenLayout(tracks, src_size, out_size=out_size, pool=pool)
+    return CenterCropLayout(src_size, out_size=out_size, pool=pool)
+
+
+def scale_tracks(tracks, factor):
+    """Face tracks in the pixels of a source decoded at factor times its size."""
+    return [dict(track, cx=track["cx"] * factor, cy=track["cy"] * factor, size=track["size"] * factor)
+            for track in tracks]
+
+
+class SplitScreenLayout:
+    """
+    Top/bottom two-speaker layout as a single frame function: each pane is a
+    face-centred crop of the source resized straight into its half of one
+    preallocated output buffer (taken from pool if given). Use with clip.fl(layout).
+    """
+
+    def __init__(self, tracks, src_size, out_size=(1080, 1920), pool=None):
+        src_w, src_h = src_size
+        out_w, out_h = out_size
+        self.src_size = src_size
+        self.out_size = out_size
+        self.pool = pool
+        self.buffer = pool.acquire((out_h, out_w, 3)) if pool else np.zeros((out_h, out_w, 3), dtype=np.uint8)
+
+        pane_h = out_h // 2
+        pane_sizes = [(out_w, pane_h), (out_w, out_h - pane_h)]
+        views = [self.buffer[:pane_h], self.buffer[pane_h:]]
+
+        self.panes = []
+        for track, (pane_w, pane_h), view in zip(tracks[:2], pane_sizes, views):
+            # Fixed crop size per speaker (no zoom pumping), only the centre follows the face
+            crop_h = float(np.median(track["size"])) / SPLIT_PANE_FACE_HEIGHT
+            crop_h = min(max(crop_h, 0.4 * src_h), src_h)
+            crop_w = crop_h * pane_w / pane_h
+            if crop_w > src_w:
+                crop_w, crop_h = src_w, src_w * pane_h / pane_w
+            self.panes.append({
+                "track": track,
+                "crop": (int(crop_w), int(crop_h)),
+                "size": (pane_w, pane_h),
+                "view": view,
+            })
+
+    def describe(self):
+        """Pane crop sizes and the whole face trajectory, as plain data (part of the render cache key)."""
+        return {
+            "type": "split",
+            "out_size": self.out_size,
+            "panes": [{
+                "crop": pane["crop"],
+                "times": np.round(pane["track"]["times"], 3).tolist(),
+                "cx": np.round(pane["track"]["cx"]).astype(int).tolist(),
+                "cy": np.round(pane["track"]["cy"]).astype(int).tolist(),
+            } for pane in self.panes],
+        }
+
+    def source_scale(self):
+        """How far the source can be downscaled at decode time before any pane's crop would need upscaling."""
+        return min(1.0, max(max(pane["size"][0] / pane["crop"][0], pane["size"][1] / pane["crop"][1])
+                            for pane in self.panes))
+
+    def release(self):
+        if self.pool:
+            self.pool.release(self.buffer)
+            self.buffer = None
+
+    def crop_box(self, pane, t):
+        """(x1, y1, x2, y2) of a pane's crop at time t, clamped to the frame."""
+        track = pane["track"]
+        crop_w, crop_h = pane["crop"]
+        src_w, src_h = self.src_size
+        cx = np.interp(t, track["times"], track["cx"])
+        cy = np.interp(t, track["times"], track["cy"])
+        x1 = int(min(max(cx - crop_w / 2, 0), src_w - crop_w))
+        y1 = int(min(max(cy - crop_h / 2, 0), src_h - crop_h))
+        return x1, y1, x1 + crop_w, y1 + crop_h
+
+    def render(self, frame, t):
+        for pane in self.panes:
+            x1, y1, x2, y2 = self.crop_box(pane, t)
+            cv2.resize(frame[y1:y2, x1:x2], pane["size"], dst=pane["view"], interpolation=cv2.INTER_AREA)
+        return self.buffer
+
+    def __call__(self, get_frame, t):
+        return self.render(get_frame(t), t)
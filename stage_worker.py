@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Stage worker for the distributed pipeline. Run any number of these, on any
+machines that share the queue database and job directories:
+
+    python stage_worker.py submit --url "https://youtube.com/watch?v=..." --db /shared/jobs.sqlite
+    python stage_worker.py work --db /shared/jobs.sqlite                    # all stages
+    python stage_worker.py work --db /shared/jobs.sqlite --stages render    # render-only node
+    python stage_worker.py status <job_id> --db /shared/jobs.sqlite
+"""
+
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+
+from cancellation import CancelToken, JobCancelled
+from job_queue import JobQueue
+from config import (JOB_QUEUE_PATH, JOB_WORK_DIR, OUTPUT_DIR, TASK_LEASE_SECONDS,
+                    TASK_HEARTBEAT_SECONDS, WORKER_POLL_SECONDS)
+
+
+class StageWorker:
+    """
+    Claims tasks from a JobQueue and runs them with the matching handler.
+    While a task runs a background thread heartbeats its lease; if the
+    lease is lost (expired, or the job was cancelled) the handler's
+    CancelToken is cancelled so the work stops instead of finishing twice.
+    """
+
+    def __init__(self, queue, handlers, worker_id=None, stages=None,
+                 heartbeat_seconds=TASK_HEARTBEAT_SECONDS, poll_seconds=WORKER_POLL_SECONDS):
+        self.queue = queue
+        self.handlers = handlers
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.stages = list(stages) if stages else list(handlers)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+
+    def _heartbeat(self, task, token, stop):
+        while not stop.wait(self.heartbeat_seconds):
+            if not self.queue.heartbeat(task["id"], self.worker_id):
+                token.cancel("Lease lost")
+                return
+
+    def run_one(self):
+        """Claims and runs one task. Returns False if there was nothing to do."""
+        task = self.queue.claim(self.worker_id, self.stages)
+        if task is None:
+            return False
+
+        print(f"🛠️ [{self.worker_id}] {task['stage']} task {task['id']} "
+              f"(job {task['job_id'][:8]}, attempt {task['attempts']})")
+        token = CancelToken(task["job_id"])
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(task, token, stop), daemon=True)
+        heartbeat.start()
+        started = time.time()
+
+        try:
+            with token.stage_scope(task["stage"]):
+                result, follow_ups = self.handlers[task["stage"]](task["payload"], token)
+        except JobCancelled as e:
+            if token.cancelled:
+                # Someone else owns the task now; their run writes the same outputs
+                print(f"🛑 [{self.worker_id}] Task {task['id']} stopped: {e}")
+            else:
+                token.cleanup()
+                self.queue.fail(task["id"], self.worker_id, e)
+                print(f"⏱️ [{self.worker_id}] Task {task['id']} timed out: {e}")
+        except Exception as e:
+            token.cleanup()
+            self.queue.fail(task["id"], self.worker_id, e)
+            print(f"❌ [{self.worker_id}] Task {task['id']} failed: {e}")
+        else:
+            if self.queue.complete(task["id"], self.worker_id, result, follow_ups):
+                print(f"✅ [{self.worker_id}] {task['stage']} task {task['id']} done in "
+                      f"{time.time() - started:.1f}s, queued {len(follow_ups)} follow-up tasks")
+            else:
+                print(f"⚠️ [{self.worker_id}] Lease on task {task['id']} was lost, result discarded")
+        finally:
+            stop.set()
+            heartbeat.join()
+        return True
+
+    def run(self, max_tasks=None, exit_when_idle=False):
+        """Works until max_tasks ran, or (with exit_when_idle) the whole queue is drained."""
+        ran = 0
+        while max_tasks is None or ran < max_tasks:
+            if self.run_one():
+                ran += 1
+            elif exit_when_idle and self.queue.is_idle():
+                break
+            else:
+                time.sleep(self.poll_seconds)
+        return ran
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distributed stage workers for the shorts pipeline')
+    parser.add_argument('--db', default=JOB_QUEUE_PATH, help='Queue database (on a shared filesystem for multi-node)')
+    parser.add_argument('--lease', type=float, default=TASK_LEASE_SECONDS, help='Task lease in seconds')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    work = commands.add_parser('work', help='Claim and run tasks')
+    work.add_argument('--stages', help='Comma-separated stages this node runs (default: all)')
+    work.add_argument('--worker-id', help='Defaults to <hostname>-<pid>')
+    work.add_argument('--exit-when-idle', action='store_true', help='Stop once the queue is drained')
+
+    submit = commands.add_parser('submit', help='Queue a new generation job')
+    source = submit.add_mutually_exclusive_group(required=True)
+    source.add_argument('--url', help='YouTube video URL')
+    source.add_argument('--file', help='Local video file (path must be valid on the download node)')
+    submit.add_argument('--work-dir', default=JOB_WORK_DIR, help='Shared directory for per-job files')
+    submit.add_argument('--output-dir', default=OUTPUT_DIR, help='Shared directory for rendered shorts')
+
+    status = commands.add_parser('status', help='Show a job\'s progress and results')
+    status.add_argument('job_id')
+
+    cancel = commands.add_parser('cancel', help='Cancel a job\'s unfinished tasks')
+    cancel.add_argument('job_id')
+
+    args = parser.parse_args()
+    queue = JobQueue(args.db, lease_seconds=args.lease)
+
+    if args.command == 'work':
+        from pipeline_tasks import PIPELINE_HANDLERS
+        stages = args.stages.split(',') if args.stages else None
+        worker = StageWorker(queue, PIPELINE_HANDLERS, worker_id=args.worker_id, stages=stages)
+        print(f"👷 Worker {worker.worker_id} running stages: {', '.join(worker.stages)}")
+        ran = worker.run(exit_when_idle=args.exit_when_idle)
+        print(f"👋 Worker {worker.worker_id} ran {ran} tasks")
+    elif args.command == 'submit':
+        from pipeline_tasks import submit_pipeline
+        job_id = submit_pipeline(queue, url=args.url, video_path=args.file,
+                                 work_dir=args.work_dir, output_dir=args.output_dir)
+        print(f"📨 Submitted job {job_id}")
+    elif args.command == 'status':
+        print(json.dumps(queue.job_status(args.job_id), indent=2, ensure_ascii=False))
+    elif args.command == 'cancel':
+        print(f"🛑 Cancelled {queue.cancel_job(args.job_id)} tasks of job {args.job_id}")
+
+
+if __name__ == "__main__":
+    main()
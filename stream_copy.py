@@ -0,0 +1,184 @@
+import os
+import json
+import bisect
+import hashlib
+import tempfile
+import subprocess
+from fractions import Fraction
+from collections import Counter
+
+from moviepy.config import get_setting
+
+from cancellation import check
+from config import KEYFRAME_INDEX_DIR, PASSTHROUGH_CUT_MODE, PASSTHROUGH_HEAD_CRF
+
+# Codecs whose re-encoded head and stream-copied body the concat demuxer can join: it
+# converts each piece to Annex B (auto_convert), so both keep their own parameter sets
+HEAD_ENCODERS = {"h264": "libx264"}
+
+
+def _run_ffmpeg(args, cancel_token=None):
+    """Runs ffmpeg, polling the cancel token; kills the process if the job is cancelled."""
+    process = subprocess.Popen([get_setting("FFMPEG_BINARY"), "-nostdin", "-y", "-loglevel", "error"] + args,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            try:
+                _, stderr = process.communicate(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                check(cancel_token)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg failed: {stderr.decode(errors='ignore').strip()}")
+
+
+def build_keyframe_index(path):
+    """
+    One demux pass (no decoding) over the first video stream: keyframe
+    times, packet count, the usual frame duration and basic stream facts,
+    from ffmpeg's framecrc packet listing.
+    """
+    process = subprocess.Popen(
+        [get_setting("FFMPEG_BINARY"), "-nostdin", "-loglevel", "error", "-i", path,
+         "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    time_base = Fraction(1, 1000)
+    index = {"keyframes": [], "packets": 0, "duration": 0.0, "frame_duration": None,
+             "codec": None, "width": None, "height": None}
+    durations = Counter()
+    for line in process.stdout:
+        if line.startswith("#tb 0:"):
+            time_base = Fraction(line.split(":", 1)[1].strip())
+        elif line.startswith("#codec_id 0:"):
+            index["codec"] = line.split(":", 1)[1].strip()
+        elif line.startswith("#dimensions 0:"):
+            width, height = line.split(":", 1)[1].strip().split("x")
+            index["width"], index["height"] = int(width), int(height)
+        elif not line.startswith("#"):
+            # stream, dts, pts, duration, size, checksum[, F=flags] - flags only printed when not plain key
+            fields = [f.strip() for f in line.split(",")]
+            pts = float(int(fields[2]) * time_base)
+            index["packets"] += 1
+            index["duration"] = max(index["duration"], pts + float(int(fields[3]) * time_base))
+            durations[int(fields[3])] += 1
+            flags = int(fields[6].split("=")[1], 16) if len(fields) > 6 else 1
+            if flags & 1:
+                index["keyframes"].append(round(pts, 6))
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise Exception(f"Could not index keyframes: {stderr.strip()}")
+
+    # Decode order != presentation order with B-frames; keyframes are looked up by time
+    index["keyframes"].sort()
+    if durations:
+        index["frame_duration"] = float(durations.most_common(1)[0][0] * time_base)
+    return index
+
+
+def _index_path(path, index_dir):
+    stat = os.stat(path)
+    ident = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime}"
+    return os.path.join(index_dir, hashlib.sha1(ident.encode("utf-8")).hexdigest() + ".json")
+
+
+def load_keyframe_index(path, index_dir=KEYFRAME_INDEX_DIR):
+    """The source's keyframe index, built with one demux pass the first time and then read from disk."""
+    index_path = _index_path(path, index_dir)
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    index = build_keyframe_index(path)
+    os.makedirs(index_dir, exist_ok=True)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return index
+
+
+def nearest_keyframe(keyframes, t):
+    i = bisect.bisect_left(keyframes, t)
+    candidates = keyframes[max(0, i - 1):i + 1]
+    return min(candidates, key=lambda k: abs(k - t)) if candidates else 0.0
+
+
+def next_keyframe(keyframes, t):
+    """First keyframe at or after t (None past the last one)."""
+    i = bisect.bisect_left(keyframes, t - 1e-6)
+    return keyframes[i] if i < len(keyframes) else None
+
+
+def passthrough_eligible(index, out_size, face_count):
+    """
+    No crop, scale or split screen needed: the tier keeps the source frame
+    (out_size None, e.g. archive) or the source already is out_size.
+    """
+    if not index.get("keyframes") or index.get("codec") is None:
+        return False
+    if out_size is None:
+        return True
+    return face_count <= 1 and (index["width"], index["height"]) == tuple(out_size)
+
+
+def _movflags(faststart, fragmented):
+    if fragmented:
+        return ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+    return ["-movflags", "+faststart"] if faststart else []
+
+
+def _stream_copy(video_path, keyframe, end_time, output_args, cancel_token):
+    # Input seek just past a keyframe lands exactly on it; with stream copy nothing is decoded
+    _run_ffmpeg(["-ss", f"{keyframe + 0.001:.6f}", "-i", video_path, "-t", f"{end_time - keyframe:.6f}",
+                 "-map", "0:v:0", "-map", "0:a?", "-c", "copy", "-avoid_negative_ts", "make_zero"]
+                + output_args, cancel_token)
+
+
+def passthrough_cut(video_path, start_time, end_time, output_path, index, mode=PASSTHROUGH_CUT_MODE,
+                    faststart=True, fragmented=False, cancel_token=None):
+    """
+    Cuts [start_time, end_time] without re-encoding the bulk of the clip.
+    mode "snap": the start moves to the nearest keyframe and everything is
+    stream-copied. mode "smart": only the partial GOP before the first
+    keyframe inside the clip is re-encoded, the rest is stream-copied, so
+    the start stays frame-accurate. Either way the copied end can run a
+    few frames long (B-frames past end_time that the copy keeps).
+    Returns {"mp4", "start", "end"}.
+    """
+    keyframes = index["keyframes"]
+    first_key = next_keyframe(keyframes, start_time)
+    smart = (mode == "smart" and index["codec"] in HEAD_ENCODERS
+             and first_key is not None and first_key < end_time)
+
+    if not smart or first_key - start_time < 0.001:
+        start = nearest_keyframe(keyframes, start_time) if not smart else first_key
+        _stream_copy(video_path, start, end_time, _movflags(faststart, fragmented) + [output_path], cancel_token)
+        return {"mp4": output_path, "start": start, "end": end_time}
+
+    # Head length in whole source frames, so the body starts exactly where the head ends
+    frame_duration = index.get("frame_duration") or index["duration"] / max(1, index["packets"])
+    head_frames = max(1, int((first_key - start_time) / frame_duration + 1e-6))
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+        # Video only in both pieces: concat offsets the body by the given head duration,
+        # not by the longest stream (AAC pads the head's audio out to whole frames)
+        concat_list = os.path.join(tmp, "pieces.txt")
+        with open(concat_list, "w", encoding="utf-8") as f:
+            f.write(f"file 'head.mp4'\nduration {head_frames * frame_duration:.6f}\nfile 'body.mp4'\n")
+        # Head: frame-accurate seek and a re-encode of just [start, first keyframe)
+        _run_ffmpeg(["-ss", f"{start_time:.6f}", "-i", video_path, "-frames:v", str(head_frames),
+                     "-map", "0:v:0", "-c:v", HEAD_ENCODERS[index["codec"]],
+                     "-crf", str(PASSTHROUGH_HEAD_CRF), "-preset", "fast", "-pix_fmt", "yuv420p",
+                     os.path.join(tmp, "head.mp4")], cancel_token)
+        # Body: video stream-copied from the keyframe
+        _run_ffmpeg(["-ss", f"{first_key + 0.001:.6f}", "-i", video_path, "-t", f"{end_time - first_key:.6f}",
+                     "-map", "0:v:0", "-c:v", "copy", "-avoid_negative_ts", "make_zero",
+                     os.path.join(tmp, "body.mp4")], cancel_token)
+        # Audio is cheap, so it is encoded once for the whole clip straight from the source
+        _run_ffmpeg(["-f", "concat", "-i", concat_list, "-ss", f"{start_time:.6f}", "-i", video_path,
+                     "-t", f"{end_time - start_time:.6f}", "-map", "0:v:0", "-map", "1:a?",
+                     "-c:v", "copy", "-c:a", "aac"] + _movflags(faststart, fragmented)
+                    + [output_path], cancel_token)
+    return {"mp4": output_path, "start": start_time, "end": end_time}
@@ -124,6 +124,1415 @@ def test_advanced_functionality():
         print(f"❌ Advanced test failed: {str(e)}")
         return False
 
+def test_segment_scoring():
+    """Test BM25/TF-IDF moment scoring on a small transcript"""
+    
+    print("\n📈 Testing segment scoring...")
+    
+    try:
+        from segment_scorer import SegmentScorer
+        
+        segments = [
+            {"start": 0, "end": 4, "text": "Welcome back to the show everyone."},
+            {"start": 4, "end": 9, "text": "You won't believe what happened next, it was shocking!"},
+            {"start": 9, "end": 13, "text": "Anyway, welcome back and thanks for watching the show."},
+        ]
+        scores = SegmentScorer().score(segments)
+        best = int(scores["score"].argmax())
+        
+        print(f"✅ Best segment: {segments[best]['text']}")
+        return best == 1 and len(scores["score"]) == len(segments)
+        
+    except Exception as e:
+        print(f"❌ Segment scoring test failed: {str(e)}")
+        return False
+
+def test_clip_windows():
+    """Test clip window selection honours duration bounds and sentence boundaries"""
+    
+    print("\n🪟 Testing clip window selection...")
+    
+    try:
+        from clip_selector import select_clip_windows
+        
+        # 40 segments of 5s each, every other one ends a sentence
+        segments = [
+            {"start": i * 5, "end": i * 5 + 5, "text": f"Part {i}" + ("." if i % 2 else ",")}
+            for i in range(40)
+        ]
+        scores = [1.0 if 10 <= i < 16 else 0.1 for i in range(40)]
+        windows = select_clip_windows(segments, scores, min_duration=15, max_duration=60, top_k=3)
+        
+        for w in windows:
+            print(f"✅ Window: {w['start']}s - {w['end']}s")
+        
+        durations_ok = all(15 <= w["end"] - w["start"] <= 60 for w in windows)
+        boundaries_ok = all(w["first_segment"] % 2 == 0 and w["last_segment"] % 2 == 1 for w in windows)
+        no_overlap = all(
+            a["end"] <= b["start"] or b["end"] <= a["start"]
+            for i, a in enumerate(windows) for b in windows[i + 1:]
+        )
+        best_first = windows[0]["start"] <= 50 and windows[0]["end"] >= 80
+        return len(windows) == 3 and durations_ok and boundaries_ok and no_overlap and best_first
+        
+    except Exception as e:
+        print(f"❌ Clip window test failed: {str(e)}")
+        return False
+
+def test_short_summarizer():
+    """Test batched summaries, their disk cache and the no-model fallback for titles"""
+    
+    print("\n📝 Testing short summarizer...")
+    
+    try:
+        import tempfile
+        from short_summarizer import ShortSummarizer, TITLE_MAX_CHARS, DESCRIPTION_MAX_CHARS
+        
+        class StubSummarizer(ShortSummarizer):
+            """Word counts as token lengths, first words as the summary; records every batch"""
+            batches = []
+            
+            def _token_lengths(self, texts):
+                return [len(t.split()) for t in texts]
+            
+            def _generate(self, texts, max_length, min_length):
+                self.batches.append([len(t.split()) for t in texts])
+                return [" ".join(t.split()[:3]) + "." for t in texts]
+        
+        class BrokenSummarizer(ShortSummarizer):
+            def _token_lengths(self, texts):
+                raise Exception("model download failed")
+        
+        texts = [" ".join(["word"] * n) + f" {n}" for n in (3, 12, 7, 20, 1)] + [""]
+        with tempfile.TemporaryDirectory() as tmp:
+            summarizer = StubSummarizer(batch_size=2, quantize=True)
+            summarizer.cache_dir = tmp
+            first = summarizer.summarize(texts)
+            
+            # Longest first, at most batch_size per batch, empty text never reaches the model
+            batch_ok = StubSummarizer.batches == [[21, 13], [8, 4], [2]] and first[-1] == ""
+            
+            # Second run is all cache hits; the full-precision model has its own entries
+            second = summarizer.summarize(texts)
+            cache_ok = second == first and len(StubSummarizer.batches) == 3
+            fp32 = StubSummarizer(batch_size=8, quantize=False)
+            fp32.cache_dir = tmp
+            fp32.summarize(texts[:2])
+            cache_ok = cache_ok and StubSummarizer.batches[3] == [13, 4]
+            
+            long_text = "This moment is really long and keeps going. " * 10
+            moments = [{"text": long_text}, {"text": "Short and sweet. Then more."}]
+            broken = BrokenSummarizer()
+            broken.cache_dir = tmp
+            broken.add_titles_and_descriptions(moments)
+        
+        # No model: titles/descriptions are cut from the moment's own text instead of failing the job
+        description = moments[0]["description"]
+        fallback_ok = (description.endswith("…") and len(description) <= DESCRIPTION_MAX_CHARS + 1
+                       and moments[0]["title"] == "This moment is really long and keeps going"
+                       and moments[1]["title"] == "Short and sweet"
+                       and all(len(m["title"]) <= TITLE_MAX_CHARS + 1 for m in moments))
+        
+        print(f"✅ Batches (token lengths): {StubSummarizer.batches}")
+        print(f"✅ Fallback title: {moments[0]['title']}")
+        return batch_ok and cache_ok and fallback_ok
+        
+    except Exception as e:
+        print(f"❌ Short summarizer test failed: {str(e)}")
+        return False
+
+def test_segment_classifier():
+    """Test sentiment/emotion length bucketing, batch sizes and the SQLite prediction cache"""
+    
+    print("\n🎭 Testing segment classifier...")
+    
+    try:
+        import tempfile
+        from segment_classifier import SegmentClassifier
+        
+        class StubClassifier(SegmentClassifier):
+            """Word counts as token lengths; records the lengths in every batch sent to a model"""
+            calls = []
+            
+            def _token_lengths(self, task, texts):
+                return [len(t.split()) for t in texts]
+            
+            def _predict(self, task, texts):
+                self.calls.append((task, [len(t.split()) for t in texts]))
+                return [("joy" if "great" in t else "neutral", 0.9) for t in texts]
+        
+        models = {"sentiment": "stub/sentiment", "emotion": "stub/emotion"}
+        words = lambda n: " ".join(["great"] + ["word"] * (n - 1))
+        # 7 distinct texts plus a repeat of the 1-word one
+        segments = [{"text": words(n)} for n in (9, 1, 5, 2, 3, 6, 4, 1)]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = os.path.join(tmp, "classifier.sqlite")
+            options = dict(models=models, batch_size=3, length_buckets=[4, 8, 16], cache_path=cache_path)
+            classifier = StubClassifier(**options)
+            classifier.annotate(segments)
+            
+            # Sorted by length, cut at 3 per batch and at the 4/8/16 token bucket edges; repeats classified once
+            expected = [[1, 2, 3], [4], [5, 6], [9]]
+            batch_ok = (classifier.calls == [("sentiment", b) for b in expected] + [("emotion", b) for b in expected]
+                        and all(s["emotion"] == {"label": "joy", "score": 0.9} for s in segments))
+            
+            # A new instance on the same cache file only sends the one unseen text
+            StubClassifier.calls = []
+            again = [{"text": s["text"]} for s in segments] + [{"text": "something new"}]
+            StubClassifier(**options).annotate(again)
+            cache_ok = (StubClassifier.calls == [("sentiment", [2]), ("emotion", [2])]
+                        and again[0]["sentiment"] == segments[0]["sentiment"]
+                        and again[-1]["emotion"]["label"] == "neutral")
+        
+        intensity_ok = SegmentClassifier.intensity(segments[0]) > SegmentClassifier.intensity(again[-1])
+        
+        print(f"✅ Batches per task (token lengths): {expected}")
+        print(f"✅ Second run sent only: {StubClassifier.calls}")
+        return batch_ok and cache_ok and intensity_ok
+        
+    except Exception as e:
+        print(f"❌ Segment classifier test failed: {str(e)}")
+        return False
+
+def test_shorts_catalog():
+    """Test the shorts catalog: hashes cached by (size, mtime), queries, and find_shorts.py output"""
+    
+    print("\n🗂️ Testing shorts catalog...")
+    
+    try:
+        import io
+        import tempfile
+        import contextlib
+        import find_shorts
+        from shorts_catalog import ShortsCatalog, hash_file
+        from video_manager import VideoManager
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            catalog = ShortsCatalog(os.path.join(tmp, "catalog.sqlite"))
+            paths = [os.path.join(tmp, f"short_{i}.mp4") for i in (1, 2)]
+            for path, content in zip(paths, (b"first video", b"second video!")):
+                with open(path, "wb") as f:
+                    f.write(content)
+            catalog.add_short(paths[0], source_id="ep1", start_time=10.0, end_time=40.0, text="First moment",
+                              viral_score=2.5, speakers=[0, 1], is_multi_speaker=True)
+            catalog.add_short(paths[1], source_id="ep2", start_time=0.0, end_time=20.0, text="Second moment",
+                              viral_score=7.0)
+            first_hash = hash_file(paths[0])
+            
+            # Same size and mtime: the stored hash is trusted, the (changed) bytes are not read again
+            stat = os.stat(paths[0])
+            with open(paths[0], "wb") as f:
+                f.write(b"FIRST VIDEO")
+            os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            reused_ok = catalog.file_hash(paths[0]) == first_hash
+            
+            # New mtime: hashed again
+            os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            recomputed_ok = catalog.file_hash(paths[0]) == hash_file(paths[0]) != first_hash
+            
+            by_score = catalog.list_shorts(order_by="viral_score")
+            query_ok = ([s["filename"] for s in by_score] == ["short_2.mp4", "short_1.mp4"]
+                        and [s["text"] for s in catalog.list_shorts(source_id="ep1")] == ["First moment"]
+                        and by_score[1]["speakers"] == [0, 1] and by_score[1]["duration"] == 30.0
+                        and len(catalog.list_shorts(min_viral_score=5)) == 1)
+            
+            # find_shorts.py lists exactly what was registered, from the catalog alone
+            class TempCatalogManager(VideoManager):
+                def __init__(self):
+                    self.catalog = catalog
+            
+            original_manager = find_shorts.VideoManager
+            find_shorts.VideoManager = TempCatalogManager
+            output = io.StringIO()
+            try:
+                with contextlib.redirect_stdout(output):
+                    find_shorts.main()
+            finally:
+                find_shorts.VideoManager = original_manager
+            listing = output.getvalue()
+            find_ok = ("Found 2 generated shorts" in listing and "short_1.mp4" in listing
+                       and "short_2.mp4" in listing and "💬 Text: Second moment" in listing)
+        
+        print(f"✅ Hash reused for unchanged (size, mtime): {reused_ok}, recomputed after touch: {recomputed_ok}")
+        print(f"✅ find_shorts.py listed: {[s['filename'] for s in by_score]}")
+        return reused_ok and recomputed_ok and query_ok and find_ok
+        
+    except Exception as e:
+        print(f"❌ Shorts catalog test failed: {str(e)}")
+        return False
+
+def test_source_reuse():
+    """Test re-upload detection: a noisy cut of a processed source reuses its transcript, scores and faces"""
+    
+    print("\n♻️ Testing source fingerprint reuse...")
+    
+    try:
+        import wave
+        import tempfile
+        import subprocess
+        import numpy as np
+        from moviepy.config import get_setting
+        from audio_fingerprint import FingerprintIndex, fingerprint_file
+        from transcript_index import TranscriptIndex
+        from config import FINGERPRINT_MIN_RATIO
+        
+        ffmpeg = get_setting("FFMPEG_BINARY")
+        
+        def synth_video(path, seed, seconds=60, size="320x240"):
+            # Quarter-second harmonic tones at random pitches: dense, distinct spectral peaks like speech/music
+            rng = np.random.default_rng(seed)
+            t = np.arange(4000) / 16000
+            audio = np.concatenate([np.hanning(len(t)) * rng.uniform(0.2, 0.8)
+                                    * sum(np.sin(2 * np.pi * f * k * t) / k for k in (1, 2, 3))
+                                    for f in rng.uniform(150, 2500, seconds * 4)])
+            audio += rng.normal(0, 0.02, len(audio))
+            with wave.open(path + ".wav", "wb") as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(16000)
+                w.writeframes((np.clip(audio / 2, -1, 1) * 32767).astype(np.int16).tobytes())
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc=size={size}:rate=10",
+                            "-i", path + ".wav", "-t", str(seconds), "-c:v", "libx264", "-preset", "ultrafast",
+                            "-c:a", "aac", path], check=True)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            generator = YouTubeShortsGenerator(use_advanced=False)
+            generator.fingerprints = FingerprintIndex(os.path.join(tmp, "fingerprints.sqlite"),
+                                                      os.path.join(tmp, "sources"))
+            generator.transcript_index = TranscriptIndex(os.path.join(tmp, "transcripts.sqlite"))
+            audio_path = os.path.join(tmp, "audio.wav")
+            
+            source = os.path.join(tmp, "source.mp4")
+            synth_video(source, seed=1)
+            captions = {"language": "en", "segments": [
+                {"start": i * 5.0, "end": i * 5.0 + 5.0,
+                 "text": f"Line {i} of the episode is about topic {i % 4}, and why it matters so much to everyone."}
+                for i in range(12)
+            ]}
+            segments, _ = generator.extract_audio_and_transcribe(source, "ep1", captions=captions,
+                                                                 audio_path=audio_path)
+            generator.find_clip_windows(segments, top_k=2, source_id="ep1")
+            stored = generator.fingerprints.load_artifact("ep1", "scores")["segments"]
+            source_scores = {s["text"]: s["score"] for s in stored}
+            face_count = generator.detect_faces_and_people(source, 25.0, 45.0)
+            face_saved_ok = generator.fingerprints.face_window("ep1", 25.0, 45.0)["face_count"] == face_count
+            
+            # Stand-in results a two-speaker scan would have stored (testsrc has no faces to find)
+            tracks = [{"times": [0.0, 1.0], "cx": [80.0, 82.0], "cy": [120.0, 118.0], "size": [60.0, 62.0]},
+                      {"times": [0.0, 1.0], "cx": [240.0, 238.0], "cy": [120.0, 121.0], "size": [58.0, 58.0]}]
+            generator.fingerprints.save_face_window("ep1", 25.0, 45.0, face_count=2, frame_size=[320, 240],
+                                                    tracks=tracks)
+            
+            # Same id, same audio, no captions this time: its own transcript comes back instead of Whisper/fallback
+            again, _ = generator.extract_audio_and_transcribe(source, "ep1", audio_path=audio_path)
+            self_ok = [s["text"] for s in again] == [s["text"] for s in captions["segments"]]
+            
+            # Re-upload: 40 s cut at an offset off the hop grid, 2x resolution, pink noise, lower bitrate
+            reupload = os.path.join(tmp, "reupload.mp4")
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-ss", "17.3", "-t", "40", "-i", source,
+                            "-f", "lavfi", "-t", "40", "-i", "anoisesrc=color=pink:amplitude=0.3",
+                            "-filter_complex", "[0:a][1:a]amix=inputs=2:weights=1 0.5[a];[0:v]scale=640:480[v]",
+                            "-map", "[v]", "-map", "[a]", "-c:v", "libx264", "-preset", "ultrafast",
+                            "-c:a", "aac", "-b:a", "48k", reupload], check=True)
+            hashes, times, _ = fingerprint_file(reupload)
+            match = generator.fingerprints.match(hashes, times)
+            reused, _ = generator.extract_audio_and_transcribe(reupload, "reup", audio_path=audio_path)
+            offset = match["offset"]
+            
+            expected = [s["text"] for s in captions["segments"] if s["end"] > 17.3 and s["start"] < 57.3]
+            transcript_ok = ([s["text"] for s in reused] == expected and reused[0]["start"] == 0.0
+                             and abs(reused[1]["start"] - (20.0 - offset)) < 1e-6)
+            match_ok = (match["source_id"] == "ep1" and abs(offset - 17.3) < 0.05
+                        and match["ratio"] >= 3 * FINGERPRINT_MIN_RATIO)
+            
+            scores = generator.stored_scores("reup", reused)
+            scores_ok = scores is not None and all(abs(score - source_scores[s["text"]]) < 1e-9
+                                                   for s, score in zip(reused, scores))
+            
+            # Face count and tracks of the shifted window, tracks scaled to the 640x480 re-upload, no scan
+            faces_ok = generator.detect_faces_and_people(reupload, 25.0 - offset, 45.0 - offset) == 2
+            reused_tracks = generator.face_tracks(reupload, 25.0 - offset, 45.0 - offset, 2)
+            faces_ok = faces_ok and np.allclose(reused_tracks[1]["cx"], [480.0, 476.0])
+            
+            # Unrelated audio never matches
+            other = os.path.join(tmp, "other.mp4")
+            synth_video(other, seed=2, seconds=40)
+            unrelated_ok = generator.fingerprints.match(*fingerprint_file(other)[:2]) is None
+        
+        print(f"✅ Re-upload matched 'ep1' at offset {offset:.2f}s ({match['ratio']:.1%} of hashes, "
+              f"threshold {FINGERPRINT_MIN_RATIO:.0%})")
+        print(f"✅ Reused {len(reused)} segments, scores: {scores_ok}, face count/tracks: {faces_ok}")
+        return (face_saved_ok and self_ok and match_ok and transcript_ok and scores_ok and faces_ok
+                and unrelated_ok)
+        
+    except Exception as e:
+        print(f"❌ Source reuse test failed: {str(e)}")
+        return False
+
+def test_resilient_download():
+    """Test resumable download against a local server that drops connections"""
+    
+    print("\n📥 Testing resilient downloader...")
+    
+    import re
+    import hashlib
+    import tempfile
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    
+    payload = os.urandom(3_000_000)
+    # A page offering two formats with different bytes; the 720p one never finishes
+    files = {"/video.mp4": payload, "/hd.mp4": os.urandom(2_000_000), "/sd.mp4": os.urandom(2_000_000)}
+    page = (b'<html><body><video controls>'
+            b'<source src="/hd.mp4" type="video/mp4" res="720" label="720p">'
+            b'<source src="/sd.mp4" type="video/mp4" res="360" label="360p">'
+            b'</video></body></html>')
+    state = {"requests": 0, "ranges": [], "drop_until": 4, "page_errors": 0, "paths": []}
+    
+    class FlakyHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+        
+        def do_GET(self):
+            state["requests"] += 1
+            state["paths"].append(self.path)
+            if self.path == "/page.html":
+                # Transient server error while the formats are looked up
+                if state["page_errors"] > 0:
+                    state["page_errors"] -= 1
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+                return
+            
+            payload = files[self.path]
+            start = 0
+            if self.headers.get("Range"):
+                state["ranges"].append(self.headers["Range"])
+                start = int(re.match(r"bytes=(\d+)-", self.headers["Range"]).group(1))
+            body = payload[start:]
+            
+            self.send_response(206 if start else 200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(len(body)))
+            if start:
+                self.send_header("Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+            self.end_headers()
+            
+            # First few responses (and every 720p one) die after 500 KB
+            if state["requests"] <= state["drop_until"] or self.path == "/hd.mp4":
+                try:
+                    self.wfile.write(body[:500_000])
+                    self.connection.shutdown(2)
+                except OSError:
+                    pass
+                return
+            self.wfile.write(body)
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    try:
+        from downloader import ResilientDownloader
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            downloader = ResilientDownloader(
+                outtmpl=os.path.join(tmp, "video.%(ext)s"), backoff_base=0.05, max_retries=3
+            )
+            url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+            path, info = downloader.download(url)
+            with open(path, "rb") as f:
+                intact = hashlib.sha256(f.read()).digest() == hashlib.sha256(payload).digest()
+            attempts = info['download_stats']['attempts']
+            throughput = info['download_stats']['throughput_mbps']
+            resumed = len(state["ranges"])
+            
+            # A server that never finishes: max_retries attempts in total, the
+            # first starts the .part file and every later one resumes it once
+            state.update(drop_until=10**6, ranges=[])
+            downloader = ResilientDownloader(
+                outtmpl=os.path.join(tmp, "broken.%(ext)s"), backoff_base=0.05, max_retries=3,
+                format_ladder=["best"]
+            )
+            try:
+                downloader.download(url)
+                bounded = False
+            except Exception:
+                bounded = len(state["ranges"]) == 2
+            broken_resumes = len(state["ranges"])
+            
+            # 720p gives up, 360p starts clean instead of resuming 720p's .part (same
+            # file name); the 503 during lookup is retried, not taken as "no such format"
+            state.update(drop_until=0, page_errors=1, paths=[])
+            downloader = ResilientDownloader(
+                outtmpl=os.path.join(tmp, "ladder.%(ext)s"), backoff_base=0.05, max_retries=2,
+                format_ladder=["best[height<=720]", "worst"]
+            )
+            path, info = downloader.download(f"http://127.0.0.1:{server.server_address[1]}/page.html")
+            with open(path, "rb") as f:
+                ladder_ok = (f.read() == files["/sd.mp4"] and info["download_stats"]["ladder_rung"] == 1
+                             and "/hd.mp4" in state["paths"])
+        
+        print(f"✅ Downloaded intact: {intact} in {attempts} attempts, resumed {resumed} times")
+        print(f"   Throughput: {throughput:.1f} Mbit/s")
+        print(f"✅ Broken server gave up after {broken_resumes} resumes: {bounded}")
+        print(f"✅ Next format after a failed one is intact: {ladder_ok}")
+        return intact and resumed > 0 and attempts <= 3 and bounded and ladder_ok
+        
+    except Exception as e:
+        print(f"❌ Resilient download test failed: {str(e)}")
+        return False
+    
+    finally:
+        server.shutdown()
+
+def test_parallel_transcription_merge():
+    """Test silence-aligned chunking and overlap de-duplication"""
+    
+    print("\n⚡ Testing parallel transcription chunking...")
+    
+    try:
+        import numpy as np
+        from parallel_transcriber import find_split_points, chunk_spans, merge_chunk_segments, ENERGY_FRAME
+        
+        # 10 minutes of "speech" with pauses at 190s and 410s
+        energy = np.ones(6000, dtype=np.float32)
+        energy[1895:1905] = 0.0
+        energy[4095:4105] = 0.0
+        cuts = find_split_points(energy, 3, search=30.0)
+        in_pauses = len(cuts) == 2 and abs(cuts[0] - 190) < 1 and abs(cuts[1] - 410) < 1
+        
+        # Every sentence once, both chunks hear the one across the cut
+        spans = chunk_spans([100.0], 200.0, overlap=2.0)
+        chunk_a = [{"start": 90.0, "end": 95.0, "text": " before"},
+                   {"start": 98.0, "end": 101.5, "text": " across"}]
+        chunk_b = [{"start": 0.0, "end": 3.5, "text": " across"},
+                   {"start": 4.0, "end": 8.0, "text": " after"}]
+        merged = merge_chunk_segments([chunk_a, chunk_b], spans)
+        texts = [s["text"] for s in merged]
+        no_duplicates = texts == ["before", "across", "after"]
+        offsets_ok = merged[2]["start"] == 102.0
+        
+        print(f"✅ Cuts: {cuts} (frame {ENERGY_FRAME}s)")
+        print(f"✅ Merged: {texts}")
+        return in_pauses and no_duplicates and offsets_ok
+        
+    except Exception as e:
+        print(f"❌ Parallel transcription test failed: {str(e)}")
+        return False
+
+def test_split_screen_layout():
+    """Test the top/bottom two-speaker layout frame function"""
+    
+    print("\n🪟 Testing split-screen layout...")
+    
+    try:
+        import numpy as np
+        from split_screen import SplitScreenLayout
+        
+        # 1920x1080 source: red speaker on the left, blue speaker on the right
+        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        frame[:, :960] = (255, 0, 0)
+        frame[:, 960:] = (0, 0, 255)
+        times = np.array([0.0, 10.0])
+        tracks = [
+            {"times": times, "cx": np.array([400.0, 450.0]), "cy": np.array([400.0, 400.0]), "size": np.array([150.0, 150.0])},
+            {"times": times, "cx": np.array([1500.0, 1450.0]), "cy": np.array([420.0, 420.0]), "size": np.array([150.0, 150.0])},
+        ]
+        layout = SplitScreenLayout(tracks, (1920, 1080), out_size=(1080, 1920))
+        
+        first = layout(lambda t: frame, 0.0)
+        second = layout(lambda t: frame, 5.0)
+        
+        split_ok = first.shape == (1920, 1080, 3) and (first[:960] == (255, 0, 0)).all() and (first[960:] == (0, 0, 255)).all()
+        reuses_buffer = first is second
+        
+        print(f"✅ Panes: top={first[480, 540].tolist()} bottom={first[1440, 540].tolist()}")
+        print(f"✅ Crop at 5s: {layout.crop_box(layout.panes[0], 5.0)}")
+        return split_ok and reuses_buffer
+        
+    except Exception as e:
+        print(f"❌ Split-screen test failed: {str(e)}")
+        return False
+
+def test_frame_compositor():
+    """Test the fused crop/resize/caption/fade frame function"""
+    
+    print("\n🎞️ Testing frame compositor...")
+    
+    try:
+        import numpy as np
+        from compositor import CenterCropLayout, FrameCompositor, render_caption
+        
+        frame = np.full((1080, 1920, 3), 200, dtype=np.uint8)
+        caption = render_caption("This is the moment everyone will be talking about", 1080)
+        compositor = FrameCompositor(CenterCropLayout((1920, 1080)), 10.0, overlays=[caption], fade_in=0.5, fade_out=0.5)
+        
+        middle = compositor(lambda t: frame, 5.0)
+        caption_dimmed = middle[caption.y + 5, 5].tolist() == [60, 60, 60]
+        outside_untouched = middle[1500, 540].tolist() == [200, 200, 200]
+        middle_copy = middle.copy()
+        
+        fading = compositor(lambda t: frame, 0.25)
+        faded_half = abs(int(fading[1500, 540, 0]) - 100) <= 1
+        reuses_buffer = fading is middle
+        
+        print(f"✅ Output {middle_copy.shape}, caption px {middle_copy[caption.y + 5, 5].tolist()}, fade px {fading[1500, 540].tolist()}")
+        return caption_dimmed and outside_untouched and faded_half and reuses_buffer
+        
+    except Exception as e:
+        print(f"❌ Frame compositor test failed: {str(e)}")
+        return False
+
+def test_speaker_diarization():
+    """Test diarization on a synthetic two-voice conversation"""
+    
+    print("\n🗣️ Testing speaker diarization...")
+    
+    try:
+        import wave
+        import tempfile
+        import numpy as np
+        from speaker_diarizer import SpeakerDiarizer, clip_speaker_stats, needs_face_scan
+        
+        sr = 16000
+        rng = np.random.default_rng(0)
+        
+        def voice(f0, formants, duration):
+            t = np.arange(int(sr * duration)) / sr
+            phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.03 * np.sin(2 * np.pi * 5 * t))) / sr
+            harmonics = sum(np.sin(h * phase) / h * sum(np.exp(-((h * f0 - f) / 150) ** 2) for f in formants)
+                            for h in range(1, 40))
+            return harmonics * (0.5 + 0.5 * np.abs(np.sin(2 * np.pi * 3 * t)))
+        
+        # 8 alternating turns, then a monologue by the first speaker
+        parts, segments, t = [], [], 0.0
+        for i in range(16):
+            speaker = i % 2 if i < 8 else 0
+            duration = rng.uniform(3, 6)
+            parts.append(voice(120, [500, 1500, 2500], duration) if speaker == 0 else voice(230, [800, 1200, 2900], duration))
+            parts.append(np.zeros(int(sr * 0.4)))
+            segments.append({"start": t, "end": t + duration, "text": f"line {i}", "truth": speaker})
+            t += duration + 0.4
+        audio = np.concatenate(parts)
+        audio = audio / np.abs(audio).max() * 0.5 + rng.normal(0, 0.005, len(audio))
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "conversation.wav")
+            with wave.open(path, "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(sr)
+                f.writeframes((audio * 32767).astype(np.int16).tobytes())
+            SpeakerDiarizer().label_segments(path, segments)
+        
+        correct = sum(s["speaker"] == f"SPEAKER_{s['truth']}" for s in segments)
+        dialogue = clip_speaker_stats(segments, 0, 7)
+        monologue = clip_speaker_stats(segments, 8, 15)
+        
+        # Segments without labels (failed diarization, captions, old cache) must still get a face scan
+        unlabelled = [{k: v for k, v in s.items() if k != "speaker"} for s in segments]
+        unknown = clip_speaker_stats(unlabelled, 8, 15)
+        scans = (needs_face_scan(dialogue), needs_face_scan(monologue), needs_face_scan(unknown))
+        
+        print(f"✅ {correct}/{len(segments)} segments attributed correctly")
+        print(f"✅ Dialogue: {dialogue['speakers']} engagement {dialogue['engagement_score']:.1f}, "
+              f"monologue: {monologue['speakers']}")
+        print(f"✅ Face scan for dialogue/monologue/unlabelled: {scans}")
+        return (correct >= 14 and dialogue["is_multi_speaker"] and not monologue["is_multi_speaker"]
+                and scans == (True, False, True))
+        
+    except Exception as e:
+        print(f"❌ Speaker diarization test failed: {str(e)}")
+        return False
+
+def test_upload_store():
+    """Test chunked, resumable uploads with size and media-type checks"""
+    
+    print("\n📤 Testing upload store...")
+    
+    try:
+        import io
+        import tempfile
+        from upload_store import UploadStore, UploadError
+        
+        data = b"\x00\x00\x00\x18ftypmp42" + os.urandom(300_000)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            store = UploadStore(root=tmp, max_bytes=1_000_000, chunk_size=64 * 1024)
+            
+            # Two requests, the second resuming where the first stopped
+            upload_id = store.create("episode.mp4", len(data))
+            store.write_stream(upload_id, io.BytesIO(data[:100_000]), offset=0)
+            try:
+                store.write_stream(upload_id, io.BytesIO(data[200_000:]), offset=200_000)
+                rejected_gap = False
+            except UploadError as e:
+                rejected_gap = e.status == 409
+            state = store.write_stream(upload_id, io.BytesIO(data[100_000:]), offset=store.state(upload_id)["received"])
+            with open(state["path"], "rb") as f:
+                intact = f.read() == data
+            
+            # Not a video: refused on the first chunk
+            bad_id = store.create("page.mp4")
+            try:
+                store.write_stream(bad_id, io.BytesIO(b"<html>" + b"x" * 1000))
+                rejected_type = False
+            except UploadError as e:
+                rejected_type = e.status == 415
+            
+            # Over the limit: refused before a byte is stored
+            try:
+                store.create("huge.mp4", 5_000_000)
+                rejected_size = False
+            except UploadError as e:
+                rejected_size = e.status == 413
+        
+        print(f"✅ Resumed upload intact: {intact}, gap rejected: {rejected_gap}")
+        print(f"✅ Wrong type rejected: {rejected_type}, oversize rejected: {rejected_size}")
+        return intact and rejected_gap and rejected_type and rejected_size
+        
+    except Exception as e:
+        print(f"❌ Upload store test failed: {str(e)}")
+        return False
+
+def test_output_packaging():
+    """Test faststart MP4 and HLS written by a single encode"""
+    
+    print("\n📦 Testing output packaging...")
+    
+    try:
+        import tempfile
+        from moviepy.editor import ColorClip
+        from output_packaging import packaging_plan, temp_audio_path
+        
+        def top_level_boxes(path):
+            boxes = []
+            with open(path, "rb") as f:
+                while True:
+                    header = f.read(8)
+                    if len(header) < 8:
+                        return boxes
+                    size = int.from_bytes(header[:4], "big")
+                    boxes.append(header[4:].decode("latin-1"))
+                    f.seek(size - 8, 1)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, "short_1.mp4")
+            target, params, outputs = packaging_plan(output_path, faststart=True, hls=True, segment_seconds=1, has_audio=False)
+            clip = ColorClip(size=(320, 240), color=(200, 30, 30), duration=3).set_fps(24)
+            clip.write_videofile(target, codec="libx264", preset="ultrafast", audio=False,
+                                 temp_audiofile=temp_audio_path(output_path), ffmpeg_params=params,
+                                 verbose=False, logger=None)
+            
+            boxes = top_level_boxes(outputs["mp4"])
+            moov_first = "moov" in boxes and boxes.index("moov") < boxes.index("mdat")
+            with open(outputs["hls"]) as f:
+                playlist = f.read()
+            segments = playlist.count("#EXTINF")
+        
+        print(f"✅ MP4 boxes: {boxes}")
+        print(f"✅ HLS playlist with {segments} segments")
+        return moov_first and segments >= 2 and "#EXT-X-ENDLIST" in playlist
+        
+    except Exception as e:
+        print(f"❌ Output packaging test failed: {str(e)}")
+        return False
+
+def test_cancellation():
+    """Test cancel tokens: mid-encode cancel, partial output cleanup and stage budgets"""
+    
+    print("\n🛑 Testing cooperative cancellation...")
+    
+    try:
+        import time
+        import tempfile
+        import threading
+        import numpy as np
+        from moviepy.editor import VideoClip
+        from cancellation import CancelToken, JobCancelled, StageTimeout
+        from compositor import CenterCropLayout, FrameCompositor
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, "short_1.mp4")
+            token = CancelToken("job-1")
+            token.track_output(output_path)
+            callbacks = []
+            token.on_cancel(lambda: callbacks.append("pool terminated"))
+            
+            frame = np.full((360, 640, 3), 120, dtype=np.uint8)
+            clip = VideoClip(lambda t: frame, duration=120).set_fps(24)
+            clip = clip.fl(FrameCompositor(CenterCropLayout((640, 360), (180, 320)), clip.duration,
+                                           cancel_token=token))
+            threading.Timer(0.5, token.cancel).start()
+            
+            started = time.monotonic()
+            try:
+                clip.write_videofile(output_path, codec="libx264", preset="ultrafast", audio=False,
+                                     verbose=False, logger=None)
+                stopped = False
+            except JobCancelled:
+                stopped = True
+            stop_seconds = time.monotonic() - started
+            
+            partial_written = os.path.exists(output_path)
+            token.cleanup()
+            cleaned = not os.path.exists(output_path)
+        
+        budget_token = CancelToken(stage_budgets={"transcribe": 0.05})
+        timed_out = False
+        with budget_token.stage_scope("transcribe"):
+            time.sleep(0.1)
+            try:
+                budget_token.check()
+            except StageTimeout:
+                timed_out = True
+        budget_token.check()  # budget ends with the stage
+        
+        print(f"✅ Encode stopped after {stop_seconds:.2f}s, partial output removed: {cleaned}")
+        print(f"✅ Cancel callbacks: {callbacks}, stage timeout raised: {timed_out}")
+        return (stopped and stop_seconds < 5 and partial_written and cleaned
+                and callbacks == ["pool terminated"] and timed_out)
+        
+    except Exception as e:
+        print(f"❌ Cancellation test failed: {str(e)}")
+        return False
+
+def test_caption_track():
+    """Test caption parsing: rolling auto-caption duplicates, srv3 and quality checks"""
+    
+    print("\n📝 Testing caption track parsing...")
+    
+    try:
+        import io
+        from caption_track import parse_captions, caption_quality, select_caption_track
+        
+        # YouTube-style rolling auto captions: every line repeats once, plus 10 ms transition cues
+        vtt = (
+            "WEBVTT\nKind: captions\nLanguage: en\n\n"
+            "00:00:00.160 --> 00:00:02.070 align:start position:0%\n \n"
+            "so<00:00:00.480><c> today</c><00:00:00.800><c> we're</c><00:00:01.040><c> talking</c>\n\n"
+            "00:00:02.070 --> 00:00:02.080 align:start position:0%\nso today we're talking\n \n\n"
+            "00:00:02.080 --> 00:00:04.630 align:start position:0%\nso today we're talking\n"
+            "about<00:00:02.400><c> money.</c>\n\n"
+            "00:00:04.630 --> 00:00:04.640 align:start position:0%\nabout money.\n \n\n"
+            "00:00:04.640 --> 00:00:07.000 align:start position:0%\nabout money.\n[Music]\n\n"
+            "00:00:07.000 --> 00:00:09.500 align:start position:0%\n[Music]\n&gt;&gt; that&#39;s wild\n"
+        )
+        vtt_segments = parse_captions(io.BytesIO(vtt.encode("utf-8")), "vtt")
+        vtt_ok = [s["text"] for s in vtt_segments] == ["so today we're talking about money.", "that's wild"]
+        vtt_ok = vtt_ok and vtt_segments[0]["start"] == 0.16 and vtt_segments[1]["start"] == 7.0
+        
+        srv3 = (
+            '<?xml version="1.0" encoding="utf-8" ?><timedtext format="3"><body>'
+            '<p t="0" d="2500">Welcome back to the show.</p>'
+            '<p t="2500" d="3000" w="1"><s ac="0">I</s><s t="200"> think</s><s t="400"> so</s></p>'
+            '<p t="5500" d="2000">&gt;&gt; Really?</p>'
+            '</body></timedtext>'
+        )
+        srv3_segments = parse_captions(io.BytesIO(srv3.encode("utf-8")), "srv3")
+        srv3_ok = [s["text"] for s in srv3_segments] == ["Welcome back to the show.", "I think so", "Really?"]
+        
+        quality_ok = caption_quality(srv3_segments, 8.0)[0] and not caption_quality(srv3_segments, 600.0)[0]
+        
+        info = {
+            "subtitles": {"de": [{"ext": "vtt", "url": "creator-de"}]},
+            "automatic_captions": {
+                "fr": [{"ext": "vtt", "url": "translated-fr"}],
+                "en-orig": [{"ext": "json3", "url": "json3"}, {"ext": "srv3", "url": "original-en"}],
+            },
+        }
+        track = select_caption_track(info)
+        track_ok = track["url"] == "original-en" and track["format"] == "srv3" and track["automatic"]
+        
+        print(f"✅ VTT: {[s['text'] for s in vtt_segments]}")
+        print(f"✅ srv3: {len(srv3_segments)} segments, picked track: {track['language']} ({track['format']})")
+        return vtt_ok and srv3_ok and quality_ok and track_ok
+        
+    except Exception as e:
+        print(f"❌ Caption track test failed: {str(e)}")
+        return False
+
+def _split_task(payload, cancel_token):
+    return {"n": payload["n"]}, [("square", {"i": i}) for i in range(payload["n"])]
+
+def _square_task(payload, cancel_token):
+    # A "node" that dies mid-task: the process exits while still holding the lease
+    if payload["i"] == 3 and os.environ.get("TEST_WORKER_CRASH"):
+        os._exit(1)
+    cancel_token.sleep(0.2)
+    return {"square": payload["i"] ** 2}, []
+
+def _run_test_worker(db_path, worker_id, crash):
+    from job_queue import JobQueue
+    from stage_worker import StageWorker
+    if crash:
+        os.environ["TEST_WORKER_CRASH"] = "1"
+    queue = JobQueue(db_path, lease_seconds=1.0, retry_delay=0)
+    handlers = {"split": _split_task, "square": _square_task}
+    StageWorker(queue, handlers, worker_id, heartbeat_seconds=0.3, poll_seconds=0.1).run(exit_when_idle=not crash)
+
+def test_stage_workers():
+    """Test the shared job queue with several local worker processes standing in for nodes"""
+    
+    print("\n👷 Testing distributed stage workers...")
+    
+    try:
+        import time
+        import tempfile
+        import multiprocessing as mp
+        from job_queue import JobQueue
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "jobs.sqlite")
+            queue = JobQueue(db_path, lease_seconds=1.0, retry_delay=0)
+            job_id = queue.submit("split", {"n": 6})
+            
+            # One crashing node first, so it is the one holding task i=3 when it dies
+            context = mp.get_context("spawn")
+            crashing = context.Process(target=_run_test_worker, args=(db_path, "node-crash", True))
+            crashing.start()
+            crashing.join(timeout=60)
+            workers = [context.Process(target=_run_test_worker, args=(db_path, f"node-{n}", False)) for n in range(3)]
+            started = time.time()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join(timeout=60)
+            
+            status = queue.job_status(job_id)
+            squares = sorted(r["square"] for r in status["results"].get("square", []))
+            conn = queue._connect()
+            rows = conn.execute("SELECT lease_owner, attempts, status, error FROM tasks WHERE payload = ?",
+                                ('{"i": 3}',)).fetchall()
+            conn.close()
+        
+        requeued = len(rows) == 1 and rows[0]["attempts"] == 2 and rows[0]["status"] == "done"
+        print(f"✅ Job {status['state']} in {time.time() - started:.1f}s, squares {squares}")
+        print(f"✅ Crashed node's task requeued and finished: {requeued}")
+        return (crashing.exitcode == 1 and status["state"] == "done"
+                and squares == [0, 1, 4, 9, 16, 25] and requeued)
+        
+    except Exception as e:
+        print(f"❌ Stage worker test failed: {str(e)}")
+        return False
+
+def test_render_cache():
+    """Test render cache keys, restore and LRU eviction"""
+    
+    print("\n♻️ Testing render cache...")
+    
+    try:
+        import time
+        import tempfile
+        from render_cache import RenderCache, render_key
+        
+        params = dict(source="abc", start=10.0, end=40.0, layout={"type": "center", "box": (0, 0, 608, 1080)},
+                      overlay_text="hello", music=0.05, encoder={"preset": "medium"})
+        same_key = render_key(**params) == render_key(**dict(params, start=10.0000001))
+        nudged_key = render_key(**params) != render_key(**dict(params, start=10.5))
+        typo_key = render_key(**params) != render_key(**dict(params, overlay_text="hallo"))
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RenderCache(os.path.join(tmp, "renders"), max_bytes=3000)
+            for name in ("a", "b", "c"):
+                path = os.path.join(tmp, f"{name}.mp4")
+                with open(path, "wb") as f:
+                    f.write(name.encode() * 1000)
+                cache.store(name * 64, {"mp4": path})
+                time.sleep(0.01)
+            
+            # Touch "a" (oldest), so adding "d" evicts "b" instead
+            restored = cache.restore("a" * 64, os.path.join(tmp, "out", "short_1.mp4"))
+            with open(restored["mp4"], "rb") as f:
+                restored_ok = f.read() == b"a" * 1000
+            path = os.path.join(tmp, "d.mp4")
+            with open(path, "wb") as f:
+                f.write(b"d" * 1000)
+            cache.store("d" * 64, {"mp4": path})
+            
+            kept = [name for name in "abcd" if cache.restore(name * 64, os.path.join(tmp, "x.mp4"))]
+            stats = cache.stats()
+        
+        print(f"✅ Keys: same={same_key}, nudged differs={nudged_key}, caption typo differs={typo_key}")
+        print(f"✅ Kept after eviction: {kept}, {stats['bytes']} of {stats['max_bytes']} bytes")
+        return same_key and nudged_key and typo_key and restored_ok and kept == ["a", "c", "d"]
+        
+    except Exception as e:
+        print(f"❌ Render cache test failed: {str(e)}")
+        return False
+
+def test_stream_copy():
+    """Test keyframe index and stream-copy passthrough cuts"""
+    
+    print("\n⚡ Testing stream-copy passthrough...")
+    
+    try:
+        import tempfile
+        import subprocess
+        from moviepy.config import get_setting
+        from stream_copy import build_keyframe_index, load_keyframe_index, passthrough_cut
+        
+        ffmpeg = get_setting("FFMPEG_BINARY")
+        with tempfile.TemporaryDirectory() as tmp:
+            # 8s source, keyframe every 2s (48 frames at 24fps), with audio
+            source = os.path.join(tmp, "source.mp4")
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=24",
+                            "-f", "lavfi", "-i", "sine=frequency=440", "-t", "8", "-c:v", "libx264", "-g", "48",
+                            "-keyint_min", "48", "-sc_threshold", "0", "-c:a", "aac", source], check=True)
+            
+            index = load_keyframe_index(source, os.path.join(tmp, "keyframes"))
+            cached = load_keyframe_index(source, os.path.join(tmp, "keyframes"))
+            keyframes_ok = index["keyframes"][:4] == [0.0, 2.0, 4.0, 6.0] and cached == index
+            
+            snap = passthrough_cut(source, 2.3, 6.0, os.path.join(tmp, "snap.mp4"), index, mode="snap")
+            smart = passthrough_cut(source, 2.5, 6.0, os.path.join(tmp, "smart.mp4"), index, mode="smart")
+            
+            probe = subprocess.run([ffmpeg, "-v", "error", "-i", smart["mp4"], "-f", "null", "-"],
+                                   capture_output=True, text=True)
+            from moviepy.editor import VideoFileClip
+            clip = VideoFileClip(smart["mp4"])
+            smart_duration = clip.duration
+            clip.close()
+            
+            # Source encoded unlike the re-encoded head (baseline, no B-frames, 30fps, keyframe
+            # every 4s): the body must still follow the head's last frame with no gap
+            baseline = os.path.join(tmp, "baseline.mp4")
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=30",
+                            "-f", "lavfi", "-i", "sine=frequency=440", "-t", "10", "-c:v", "libx264",
+                            "-profile:v", "baseline", "-pix_fmt", "yuv420p", "-g", "120", "-keyint_min", "120",
+                            "-sc_threshold", "0", "-c:a", "aac", baseline], check=True)
+            joined = passthrough_cut(baseline, 1.3, 7.5, os.path.join(tmp, "joined.mp4"),
+                                     load_keyframe_index(baseline, os.path.join(tmp, "keyframes")), mode="smart")
+            joined_probe = subprocess.run([ffmpeg, "-v", "warning", "-i", joined["mp4"], "-f", "null", "-"],
+                                          capture_output=True, text=True)
+            timeline = build_keyframe_index(joined["mp4"])
+        
+        snap_ok = snap["start"] == 2.0
+        smart_ok = abs(smart_duration - 3.5) < 0.25 and probe.returncode == 0 and not probe.stderr.strip()
+        # 6.2s at 30fps is 186 frames; a gap at the join shows up as a longer timeline than frames
+        join_ok = (timeline["packets"] == 186 and not joined_probe.stderr.strip()
+                   and abs(timeline["packets"] * timeline["frame_duration"] - timeline["duration"]) < 1e-3)
+        print(f"✅ Keyframes: {index['keyframes']}")
+        print(f"✅ Snap cut starts at {snap['start']}s, smart cut is {smart_duration:.2f}s long")
+        print(f"✅ Baseline source join: {timeline['packets']} frames over {timeline['duration']:.4f}s")
+        return keyframes_ok and snap_ok and smart_ok and join_ok
+        
+    except Exception as e:
+        print(f"❌ Stream copy test failed: {str(e)}")
+        return False
+
+def test_memory_governor():
+    """Test decode downscaling, buffer pool reuse and the memory governor"""
+    
+    print("\n🧮 Testing memory governor...")
+    
+    try:
+        import time
+        import threading
+        from compositor import CenterCropLayout
+        from memory_governor import BufferPool, MemoryGovernor, decode_size
+        
+        # 2560x1440 source, 540x960 preview: the 810x1440 crop only needs 960 rows
+        pool = BufferPool(max_per_shape=2)
+        layout = CenterCropLayout((2560, 1440), out_size=(540, 960), pool=pool)
+        dec_size = decode_size((2560, 1440), layout.source_scale())
+        buffer = layout.buffer
+        buffer[:] = 7
+        layout.release()
+        reused = CenterCropLayout(dec_size, out_size=(540, 960), pool=pool)
+        pool_ok = reused.buffer is buffer and not reused.buffer.any()
+        
+        # Budget fits one 100-byte render at a time; the 500-byte one runs alone
+        governor = MemoryGovernor(budget_bytes=150, max_decoders=4, max_encoders=4)
+        state = {"running": 0, "peak": 0}
+        lock = threading.Lock()
+        
+        def render(nbytes):
+            with governor.reserve(nbytes, decoders=1, encoders=1):
+                with lock:
+                    state["running"] += 1
+                    state["peak"] = max(state["peak"], state["running"])
+                time.sleep(0.05)
+                with lock:
+                    state["running"] -= 1
+        
+        threads = [threading.Thread(target=render, args=(n,)) for n in (100, 100, 500, 100)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        governor_ok = state["peak"] == 1 and governor.reserved_bytes == 0 and governor.decoders == 0
+        
+        print(f"✅ Decode size for preview: {dec_size}, pooled buffer reused: {pool_ok}")
+        print(f"✅ Peak concurrent renders under a 150-byte budget: {state['peak']}")
+        return dec_size == (1708, 960) and pool_ok and governor_ok
+        
+    except Exception as e:
+        print(f"❌ Memory governor test failed: {str(e)}")
+        return False
+
+def test_platform_variants():
+    """Test safe-area captions and one-decode platform variant fan-out"""
+    
+    print("\n📱 Testing platform variants...")
+    
+    try:
+        import tempfile
+        import subprocess
+        from moviepy.config import get_setting
+        from moviepy.editor import VideoFileClip
+        from compositor import render_caption
+        from config import PLATFORM_PROFILES
+        from platform_variants import render_platform_variants
+        
+        # Caption band stays out of the UI: below 14% from the top, left of the 16% right rail
+        caption = render_caption("Every platform gets its own caption layout " * 2, 1080,
+                                 safe_area=(0.06, 0.14, 0.16, 0.26), height=1920)
+        safe_ok = caption.x >= 64 and caption.x + caption.w <= 908 and 268 <= caption.y <= 1420 - caption.h
+        
+        # Small stand-in profiles so the encodes stay cheap
+        PLATFORM_PROFILES["test_tall"] = dict(size=(180, 320), max_duration=1.0, bitrate="300k",
+                                              audio_bitrate="64k", safe_area=(0.05, 0.1, 0.05, 0.2))
+        PLATFORM_PROFILES["test_square"] = dict(size=(240, 240), max_duration=60, bitrate="300k",
+                                                audio_bitrate="64k", safe_area=(0.05, 0.05, 0.05, 0.05))
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                source = os.path.join(tmp, "source.mp4")
+                subprocess.run([get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", "-f", "lavfi",
+                                "-i", "testsrc=size=320x240:rate=24", "-f", "lavfi", "-i", "sine=frequency=440",
+                                "-t", "3", "-c:v", "libx264", "-c:a", "aac", source], check=True)
+                video = VideoFileClip(source)
+                outputs = render_platform_variants(video.subclip(0.5, 2.5), os.path.join(tmp, "short_1"), "hello",
+                                                   [], ["test_tall", "test_square"], preset="ultrafast")
+                video.close()
+                
+                results = {}
+                for platform, output in outputs.items():
+                    clip = VideoFileClip(output["mp4"])
+                    results[platform] = (tuple(clip.size), round(clip.duration, 1), clip.audio is not None)
+                    clip.close()
+        finally:
+            del PLATFORM_PROFILES["test_tall"], PLATFORM_PROFILES["test_square"]
+        
+        print(f"✅ Safe-area caption at x={caption.x}..{caption.x + caption.w}, y={caption.y}")
+        print(f"✅ Variants from one decode: {results}")
+        return (safe_ok and results.get("test_tall", (None,))[:2] == ((180, 320), 1.0)
+                and results.get("test_square", (None,))[:2] == ((240, 240), 2.0)
+                and all(r[2] for r in results.values()))
+        
+    except Exception as e:
+        print(f"❌ Platform variants test failed: {str(e)}")
+        return False
+
+def test_search_index():
+    """Test the full-text transcript index, query sanitizing and hit windows"""
+    
+    print("\n🔎 Testing transcript search index...")
+    
+    try:
+        import time
+        import tempfile
+        from transcript_index import TranscriptIndex, to_fts_query, hit_window
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            index = TranscriptIndex(os.path.join(tmp, "transcripts.sqlite"))
+            index.add_transcript("ep1", [
+                {"start": 0.0, "end": 4.0, "text": "Welcome back to the show."},
+                {"start": 4.0, "end": 9.0, "text": "Compound interest is the eighth wonder of the world."},
+                {"start": 9.0, "end": 12.0, "text": "Interest rates went up again.", "speaker": 1},
+            ] + [{"start": 12.0 + i, "end": 13.0 + i, "text": f"Filler line number {i}."} for i in range(20)],
+                title="Money Talk", url="https://example.com/ep1", duration=32.0)
+            index.add_transcript("ep2", [
+                {"start": 30.0, "end": 35.0, "text": "Nobody understands compound interest, honestly."},
+            ], title="Old Episode", duration=60.0)
+            
+            hits = index.search("compound interest")
+            # Both words in a shorter segment rank first; the bm25 score is flipped to higher-is-better
+            ranked_ok = [h["source_id"] for h in hits] == ["ep2", "ep1"] and hits[0]["score"] > hits[1]["score"] > 0
+            snippet_ok = hits[0]["snippet"] == "Nobody understands [compound] [interest], honestly."
+            phrase_ok = [h["start"] for h in index.search('"interest rates"')] == [9.0]
+            prefix_ok = (len(index.search("wond*")) == 1
+                         and index.search("interest", source_id="ep2")[0]["start"] == 30.0)
+            
+            # Re-indexing a source replaces its segments instead of adding to them
+            index.add_transcript("ep2", [{"start": 1.0, "end": 2.0, "text": "A different transcript."}])
+            reindex_ok = (not index.search("nobody") and len(index.search("different")) == 1
+                          and index.get_source("ep2")["title"] == "Old Episode")
+            
+            # The stored video only counts while the file on disk is the one that was indexed
+            video = os.path.join(tmp, "ep1.mp4")
+            with open(video, "wb") as f:
+                f.write(b"x" * 100)
+            index.set_video_path("ep1", video)
+            cached_ok = index.cached_video("ep1") == os.path.abspath(video)
+            time.sleep(0.01)
+            with open(video, "wb") as f:
+                f.write(b"y" * 200)
+            cached_ok = cached_ok and index.cached_video("ep1") is None and index.cached_video("ep2") is None
+        
+        # FTS5 syntax in user input is neutralized instead of raising
+        query_ok = (to_fts_query('NEAR( "rate hike" OR fed* -) AND') == '"NEAR" "rate hike" OR "fed"* "AND"'
+                    and to_fts_query('"" ()') == "")
+        window = hit_window({"start": 100.0, "end": 104.0}, duration=200.0, padding=3.0,
+                            min_duration=15, max_duration=60)
+        window_ok = window == (97.0, 112.0) and hit_window({"start": 1.0, "end": 5.0}, duration=10.0)[1] <= 10.0
+        
+        print(f"✅ Hits for 'compound interest': {[(h['source_id'], round(h['score'], 2)) for h in hits]}")
+        print(f"✅ Snippet: {hits[0]['snippet']}")
+        print(f"✅ Hit window: {window}")
+        return (ranked_ok and snippet_ok and phrase_ok and prefix_ok and reindex_ok and cached_ok
+                and query_ok and window_ok)
+        
+    except Exception as e:
+        print(f"❌ Transcript search test failed: {str(e)}")
+        return False
+
+def test_thumbnails():
+    """Test batched thumbnail scoring and keyframe-only candidate selection"""
+    
+    print("\n🖼️ Testing thumbnail selection...")
+    
+    try:
+        import time
+        import tempfile
+        import subprocess
+        import cv2
+        import numpy as np
+        from moviepy.config import get_setting
+        from thumbnails import score_candidates, select_thumbnail, thumbnail_path
+        
+        # Sharp mid-grey texture vs the same blurred, overexposed and with a face (eyes open / closed)
+        rng = np.random.default_rng(0)
+        sharp = np.clip(128 + rng.normal(0, 40, (160, 90)), 0, 255).astype(np.uint8)
+        blurred = cv2.GaussianBlur(sharp, (9, 9), 3)
+        bright = np.clip(sharp.astype(np.int16) + 120, 0, 255).astype(np.uint8)
+        grays = np.stack([blurred, bright, sharp, sharp, sharp])
+        faces = [[], [], [], [(20, 20, 40, 40, 0)], [(20, 20, 40, 40, 2)]]
+        scores = score_candidates(grays, faces)
+        scoring_ok = scores[2] > max(scores[0], scores[1]) and scores[4] > scores[3] > scores[2]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "source.mp4")
+            subprocess.run([get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", "-f", "lavfi",
+                            "-i", "testsrc=size=640x360:rate=24", "-t", "8", "-c:v", "libx264", "-g", "24", source],
+                           check=True)
+            output_path = thumbnail_path(os.path.join(tmp, "short_1.mp4"))
+            started = time.perf_counter()
+            result = select_thumbnail(source, 1.0, 7.0, output_path, "Best frame", face_count=0,
+                                      out_size=(180, 320))
+            took = time.perf_counter() - started
+            
+            from PIL import Image
+            with Image.open(output_path) as image:
+                size = image.size
+        
+        # 1 s GOP: candidates are the keyframes at 2..6 s, nothing else decoded
+        select_ok = result["candidates"] == 5 and result["time"] in (2.0, 3.0, 4.0, 5.0, 6.0)
+        
+        print(f"✅ Candidate scores: {np.round(scores, 2).tolist()}")
+        print(f"✅ Thumbnail {size} from {result['time']}s of {result['candidates']} keyframes in {took:.2f}s")
+        return scoring_ok and select_ok and size == (180, 320) and output_path.endswith((".jpg", ".webp"))
+        
+    except Exception as e:
+        print(f"❌ Thumbnail test failed: {str(e)}")
+        return False
+
+def test_performance_profiles():
+    """Test speed/quality profiles and hardware auto-tuning"""
+    
+    print("\n⚙️ Testing performance profiles...")
+    
+    try:
+        import tempfile
+        from auto_tune import resolve_profile, auto_tune, probe_hardware
+        from config import PROFILES, WHISPER_MODEL, DOWNLOAD_FORMAT_LADDER, RENDER_TIERS
+        
+        # Balanced keeps the old model/ladder/presets (fps cap and face sampling are new);
+        # fast/quality move every knob the same way
+        balanced = resolve_profile("balanced", tune=False)
+        defaults_ok = (balanced["whisper_model"] == WHISPER_MODEL
+                       and balanced["format_ladder"] == DOWNLOAD_FORMAT_LADDER
+                       and all(balanced["presets"][tier] == s["preset"] for tier, s in RENDER_TIERS.items()))
+        fast, quality = PROFILES["fast"], PROFILES["quality"]
+        ordered_ok = (fast["max_fps"] < balanced["max_fps"] and quality["max_fps"] is None
+                      and fast["face_scan_fps"] < balanced["face_scan_fps"] < quality["face_scan_fps"]
+                      and fast["face_scan_height"] < quality["face_scan_height"])
+        
+        try:
+            resolve_profile("turbo", tune=False)
+            unknown_ok = False
+        except Exception:
+            unknown_ok = True
+        
+        # 16 cores but 8 GB: Whisper "small" workers are limited by RAM, not cores
+        big = auto_tune(quality, {"effective_cores": 16, "memory_bytes": 8e9}, memory=8e9)
+        tiny = auto_tune(fast, {"effective_cores": 1, "memory_bytes": 2e9}, memory=2e9)
+        tune_ok = (big["transcribe_workers"] == 2 and big["transcribe_threads"] == 8
+                   and big["max_encoders"] * big["encoder_threads"] == 16
+                   and all(v == 1 for k, v in tiny.items() if k != "max_decoders"))
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "hardware.json")
+            probe = probe_hardware(path)
+            probe_ok = probe_hardware(path) == probe and 1 <= probe["effective_cores"] <= probe["cores"]
+        
+        print(f"✅ This machine: {probe['cores']} cores ({probe['effective_cores']} effective), "
+              f"{auto_tune(balanced, probe)}")
+        print(f"✅ 16 cores / 8 GB, quality: {big}")
+        return defaults_ok and ordered_ok and unknown_ok and tune_ok and probe_ok
+        
+    except Exception as e:
+        print(f"❌ Performance profiles test failed: {str(e)}")
+        return False
+
+def test_finalize_route():
+    """Test /finalize: refused without previews, renders the approved previews at the final tier"""
+    
+    print("\n🎞️ Testing /finalize route...")
+    
+    cwd = os.getcwd()
+    try:
+        import time
+        import tempfile
+        import subprocess
+        from moviepy.config import get_setting
+        from moviepy.editor import VideoFileClip
+        from config import RENDER_TIERS
+        
+        final_size = RENDER_TIERS["final"]["size"]
+        with tempfile.TemporaryDirectory() as tmp:
+            # web_app keeps its uploads/index/outputs relative to the working directory
+            os.chdir(tmp)
+            import web_app
+            client = web_app.app.test_client()
+            web_app.job_context.update(generator=None, video_path=None)
+            web_app.generation_status.update(is_running=False, shorts=[])
+            
+            nothing_ok = client.post('/finalize', json={"shorts": [0]}).status_code == 400
+            
+            source = os.path.join(tmp, "source.mp4")
+            subprocess.run([get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", "-f", "lavfi",
+                            "-i", "testsrc=size=320x240:rate=24", "-f", "lavfi", "-i", "sine=frequency=440",
+                            "-t", "4", "-c:v", "libx264", "-c:a", "aac", source], check=True)
+            
+            # State a preview run leaves behind; small final size so the encode stays cheap
+            os.makedirs("generated_shorts")
+            RENDER_TIERS["final"]["size"] = (180, 320)
+            web_app.job_context.update(generator=YouTubeShortsGenerator(use_advanced=False), video_path=source)
+            web_app.generation_status["shorts"] = [
+                {"filename": f"short_{i+1}_preview.mp4", "final_filename": None, "tier": "preview",
+                 "text": f"Moment {i+1}", "title": None, "start_time": start, "end_time": start + 1.5,
+                 "face_count": 0, "source_id": "source"}
+                for i, start in enumerate((0.0, 2.0))
+            ]
+            
+            unknown_ok = client.post('/finalize', json={"shorts": ["nope.mp4"]}).status_code == 400
+            response = client.post('/finalize', json={"shorts": ["short_2_preview.mp4"]})
+            busy_ok = client.post('/finalize', json={"shorts": [0]}).status_code == 400
+            
+            deadline = time.time() + 120
+            while web_app.generation_status["is_running"] and time.time() < deadline:
+                time.sleep(0.2)
+            
+            shorts = web_app.generation_status["shorts"]
+            output = os.path.join("generated_shorts", "short_2.mp4")
+            clip = VideoFileClip(output)
+            size, duration = tuple(clip.size), clip.duration
+            clip.close()
+            web_app.job_context.update(generator=None, video_path=None)
+        
+        # Only the approved preview is rendered again, at the final tier's size
+        render_ok = (response.status_code == 200 and shorts[1]["tier"] == "final"
+                     and shorts[1]["final_filename"] == "short_2.mp4" and shorts[0]["tier"] == "preview"
+                     and size == (180, 320) and abs(duration - 1.5) < 0.2)
+        
+        print(f"✅ Finalized {shorts[1]['final_filename']}: {size}, {duration:.2f}s "
+              f"({web_app.generation_status['message']})")
+        return nothing_ok and unknown_ok and busy_ok and render_ok
+        
+    except Exception as e:
+        print(f"❌ Finalize route test failed: {str(e)}")
+        return False
+    
+    finally:
+        RENDER_TIERS["final"]["size"] = final_size
+        os.chdir(cwd)
+
+def test_search_render_route():
+    """Test /search/render: an indexed hit rendered from the kept source, bad tiers refused"""
+    
+    print("\n🔎 Testing /search/render...")
+    
+    cwd = os.getcwd()
+    try:
+        import time
+        import tempfile
+        import subprocess
+        from moviepy.config import get_setting
+        from moviepy.editor import VideoFileClip
+        from config import RENDER_TIERS
+        from transcript_index import TranscriptIndex
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            import web_app
+            client = web_app.app.test_client()
+            web_app.generation_status.update(is_running=False, shorts=[])
+            
+            source = os.path.join(tmp, "source.mp4")
+            subprocess.run([get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", "-f", "lavfi",
+                            "-i", "testsrc=size=320x240:rate=24", "-f", "lavfi", "-i", "sine=frequency=440",
+                            "-t", "6", "-c:v", "libx264", "-c:a", "aac", source], check=True)
+            
+            # A processed source: transcript indexed, video kept where the index says
+            index = TranscriptIndex(os.path.join(tmp, "transcripts.sqlite"))
+            index.add_transcript("ep1", [
+                {"start": 0.0, "end": 2.0, "text": "Welcome back."},
+                {"start": 2.0, "end": 4.0, "text": "Compound interest is the eighth wonder."},
+            ], title="Money Talk", video_path=source, duration=6.0)
+            generator = YouTubeShortsGenerator(use_advanced=False)
+            generator.transcript_index = index
+            shared_index, web_app.transcript_index = web_app.transcript_index, index
+            web_app.job_context.update(generator=generator, video_path=None)
+            
+            hits = client.get('/search', query_string={"q": "compound interest"}).get_json()["hits"]
+            bad_tier_ok = client.post('/search/render', json={"hits": hits, "tier": "4k"}).status_code == 400
+            response = client.post('/search/render', json={"hits": hits[:1], "tier": "preview"})
+            
+            deadline = time.time() + 120
+            while web_app.generation_status["is_running"] and time.time() < deadline:
+                time.sleep(0.2)
+            
+            shorts = web_app.generation_status["shorts"]
+            clip = VideoFileClip(os.path.join("generated_shorts", shorts[0]["filename"]))
+            size, duration = tuple(clip.size), clip.duration
+            clip.close()
+            web_app.job_context.update(generator=None)
+            web_app.transcript_index = shared_index
+        
+        # The hit is padded out to a clip window, clamped to the 6 s source
+        render_ok = (response.status_code == 200 and len(shorts) == 1 and shorts[0]["source_id"] == "ep1"
+                     and shorts[0]["tier"] == "preview" and size == RENDER_TIERS["preview"]["size"]
+                     and abs(duration - 6.0) < 0.3)
+        
+        print(f"✅ Rendered {shorts[0]['filename']}: {size}, {duration:.2f}s "
+              f"({web_app.generation_status['message']})")
+        return bad_tier_ok and render_ok
+        
+    except Exception as e:
+        print(f"❌ Search render route test failed: {str(e)}")
+        return False
+    
+    finally:
+        os.chdir(cwd)
+
 if __name__ == "__main__":
     print("🚀 AI-Powered YouTube Shorts Generator Test Suite")
     print("=" * 60)
@@ -137,12 +1546,70 @@ if __name__ == "__main__":
     # Test advanced functionality
     advanced_test = test_advanced_functionality()
     
+    # Test moment scoring
+    scoring_test = test_segment_scoring()
+    windows_test = test_clip_windows()
+    summarizer_test = test_short_summarizer()
+    classifier_test = test_segment_classifier()
+    catalog_test = test_shorts_catalog()
+    reuse_test = test_source_reuse()
+    download_test = test_resilient_download()
+    transcription_test = test_parallel_transcription_merge()
+    split_screen_test = test_split_screen_layout()
+    compositor_test = test_frame_compositor()
+    diarization_test = test_speaker_diarization()
+    upload_test = test_upload_store()
+    packaging_test = test_output_packaging()
+    cancellation_test = test_cancellation()
+    caption_test = test_caption_track()
+    workers_test = test_stage_workers()
+    render_cache_test = test_render_cache()
+    stream_copy_test = test_stream_copy()
+    memory_test = test_memory_governor()
+    variants_test = test_platform_variants()
+    search_test = test_search_index()
+    thumbnail_test = test_thumbnails()
+    profiles_test = test_performance_profiles()
+    finalize_test = test_finalize_route()
+    search_render_test = test_search_render_route()
+    
     print("\n" + "=" * 60)
     print("📊 Test Results:")
     print(f"Real Video Processing: {'✅ PASS' if basic_test else '❌ FAIL'}")
     print(f"Advanced AI Features: {'✅ PASS' if advanced_test else '❌ FAIL'}")
+    print(f"Segment Scoring: {'✅ PASS' if scoring_test else '❌ FAIL'}")
+    print(f"Clip Windows: {'✅ PASS' if windows_test else '❌ FAIL'}")
+    print(f"Short Summarizer: {'✅ PASS' if summarizer_test else '❌ FAIL'}")
+    print(f"Segment Classifier: {'✅ PASS' if classifier_test else '❌ FAIL'}")
+    print(f"Shorts Catalog: {'✅ PASS' if catalog_test else '❌ FAIL'}")
+    print(f"Source Reuse: {'✅ PASS' if reuse_test else '❌ FAIL'}")
+    print(f"Resilient Download: {'✅ PASS' if download_test else '❌ FAIL'}")
+    print(f"Parallel Transcription: {'✅ PASS' if transcription_test else '❌ FAIL'}")
+    print(f"Split Screen: {'✅ PASS' if split_screen_test else '❌ FAIL'}")
+    print(f"Frame Compositor: {'✅ PASS' if compositor_test else '❌ FAIL'}")
+    print(f"Speaker Diarization: {'✅ PASS' if diarization_test else '❌ FAIL'}")
+    print(f"Upload Store: {'✅ PASS' if upload_test else '❌ FAIL'}")
+    print(f"Output Packaging: {'✅ PASS' if packaging_test else '❌ FAIL'}")
+    print(f"Cancellation: {'✅ PASS' if cancellation_test else '❌ FAIL'}")
+    print(f"Caption Track: {'✅ PASS' if caption_test else '❌ FAIL'}")
+    print(f"Stage Workers: {'✅ PASS' if workers_test else '❌ FAIL'}")
+    print(f"Render Cache: {'✅ PASS' if render_cache_test else '❌ FAIL'}")
+    print(f"Stream Copy: {'✅ PASS' if stream_copy_test else '❌ FAIL'}")
+    print(f"Memory Governor: {'✅ PASS' if memory_test else '❌ FAIL'}")
+    print(f"Platform Variants: {'✅ PASS' if variants_test else '❌ FAIL'}")
+    print(f"Transcript Search: {'✅ PASS' if search_test else '❌ FAIL'}")
+    print(f"Thumbnails: {'✅ PASS' if thumbnail_test else '❌ FAIL'}")
+    print(f"Performance Profiles: {'✅ PASS' if profiles_test else '❌ FAIL'}")
+    print(f"Finalize Route: {'✅ PASS' if finalize_test else '❌ FAIL'}")
+    print(f"Search Render Route: {'✅ PASS' if search_render_test else '❌ FAIL'}")
     
-    if basic_test and advanced_test:
+    if (basic_test and advanced_test and scoring_test and windows_test and summarizer_test and classifier_test
+            and catalog_test and reuse_test and download_test and transcription_test and split_screen_test
+            and compositor_test
+            and diarization_test and upload_test and packaging_test and cancellation_test and caption_test
+            and workers_test and render_cache_test and stream_copy_test and memory_test
+            and variants_test and search_test and thumbnail_test and profiles_test and finalize_test
+            and search_render_test):
         print("\n🎉 All systems ready! Ready for real podcast processing.")
         print("🔥 Use: python main.py --url 'YOUR_YOUTUBE_URL'")
     else:
@@ -0,0 +1,219 @@
+import os
+import subprocess
+import numpy as np
+from moviepy.config import get_setting
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+    print("⚠️ OpenCV not available. Install with: pip install opencv-python")
+
+from cancellation import check
+from compositor import render_caption
+from split_screen import choose_layout, scale_tracks
+from stream_copy import load_keyframe_index
+from memory_governor import source_frame_size, decode_size
+from config import (THUMBNAIL_FORMAT, THUMBNAIL_QUALITY, THUMBNAIL_SAMPLES, THUMBNAIL_SCORE_HEIGHT,
+                    THUMBNAIL_WEIGHTS, FACE_TRACK_FPS)
+
+_cascades = {}
+
+
+def _cascade(name):
+    if name not in _cascades:
+        _cascades[name] = cv2.CascadeClassifier(cv2.data.haarcascades + name)
+    return _cascades[name]
+
+
+def thumbnail_path(video_path, fmt=THUMBNAIL_FORMAT):
+    """generated_shorts/short_1.mp4 -> generated_shorts/short_1.jpg"""
+    return f"{os.path.splitext(video_path)[0]}.{fmt}"
+
+
+def _read_raw(args, size, cancel_token=None):
+    """Runs ffmpeg with args (input side) and reads its rgb24 frames of size (w, h) from the pipe."""
+    w, h = size
+    frame_bytes = w * h * 3
+    process = subprocess.Popen(
+        [get_setting("FFMPEG_BINARY"), "-nostdin", "-loglevel", "error"] + args
+        + ["-f", "rawvideo", "-pix_fmt", "rgb24", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    frames = []
+    try:
+        while True:
+            check(cancel_token)
+            data = process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            frames.append(np.frombuffer(data, dtype=np.uint8).reshape(h, w, 3).copy())
+    finally:
+        process.kill()
+        process.wait()
+    return frames
+
+
+def read_candidates(video_path, keyframes, start_time, end_time, size, samples=THUMBNAIL_SAMPLES,
+                    cancel_token=None):
+    """
+    Candidate frames of the window as [(t, frame)] at size (w, h), in one
+    forward pass that decodes nothing but keyframes (every other frame is
+    skipped by the decoder), strided down to `samples`. Keyframes are also
+    the encoder's best-quality pictures. The fade-in/out half seconds at the
+    edges are left out. A GOP longer than the window leaves no keyframe
+    inside; then the middle frame is seeked to and decoded instead.
+    """
+    lo, hi = start_time + 0.5, end_time - 0.5
+    if hi <= lo:
+        lo, hi = start_time, end_time
+    w, h = size
+    inside = [k for k in keyframes if lo <= k < hi]
+    if not inside:
+        middle = (lo + hi) / 2
+        frames = _read_raw(["-ss", f"{middle:.6f}", "-i", video_path, "-map", "0:v:0", "-frames:v", "1",
+                            "-vf", f"scale={w}:{h}"], size, cancel_token)
+        return [(middle, frame) for frame in frames]
+
+    stride = -(-len(inside) // samples)
+    frames = _read_raw(["-skip_frame", "nokey", "-ss", f"{lo:.6f}", "-to", f"{hi:.6f}", "-i", video_path,
+                        "-map", "0:v:0", "-vf", f"select=not(mod(n\\,{stride})),scale={w}:{h}",
+                        "-fps_mode", "passthrough"], size, cancel_token)
+    # Output frames are exactly the window's keyframes in order, so their times come from the index
+    return list(zip(inside[::stride], frames))
+
+
+def detect_faces(grays):
+    """Haar faces in each scoring image: per candidate a list of (x, y, w, h)."""
+    min_size = max(24, grays.shape[1] // 12)
+    return [[tuple(map(int, box)) for box in _cascade('haarcascade_frontalface_default.xml').detectMultiScale(
+        gray, 1.1, 4, minSize=(min_size, min_size))] for gray in grays]
+
+
+def faces_from_tracks(layout, times, scale):
+    """
+    Face boxes from the split screen's speaker tracks (already computed for
+    the render) mapped into each candidate's scoring image, so no detection
+    runs. A speaker counts as present when the track has a detection within
+    one sampling interval of t.
+    """
+    tolerance = 1.5 / FACE_TRACK_FPS
+    faces = []
+    for t in times:
+        boxes = []
+        top = 0
+        for pane in layout.panes:
+            track = pane["track"]
+            if np.min(np.abs(track["times"] - t)) <= tolerance:
+                x1, y1, x2, y2 = layout.crop_box(pane, t)
+                pane_w, pane_h = pane["size"]
+                sx, sy = pane_w / (x2 - x1), pane_h / (y2 - y1)
+                cx = (np.interp(t, track["times"], track["cx"]) - x1) * sx
+                cy = (np.interp(t, track["times"], track["cy"]) - y1) * sy + top
+                size = np.interp(t, track["times"], track["size"]) * sy
+                boxes.append(tuple(int(v * scale) for v in (cx - size / 2, cy - size / 2, size, size)))
+            top += pane["size"][1]
+        faces.append(boxes)
+    return faces
+
+
+def count_eyes(gray, box):
+    """Open eyes found in the upper half of a face box (the Haar eye model mostly misses closed ones)."""
+    x, y, w, h = box
+    roi = gray[max(0, y):max(0, y + h // 2), max(0, x):max(0, x + w)]
+    if roi.shape[0] < 12 or roi.shape[1] < 24:
+        return 0
+    eyes = _cascade('haarcascade_eye.xml').detectMultiScale(roi, 1.1, 3, minSize=(w // 8, w // 8))
+    return min(len(eyes), 2)
+
+
+def score_candidates(grays, faces, weights=THUMBNAIL_WEIGHTS):
+    """
+    Scores every candidate at once. grays: (N, H, W) uint8 stack; faces:
+    per candidate a list of (x, y, w, h, eyes). Sharpness (Laplacian
+    variance, relative to the sharpest candidate), exposure (mid-grey mean,
+    few clipped pixels), face size and open eyes, weighted. Higher is better.
+    """
+    stack = grays.astype(np.float32)
+    # 4-neighbour Laplacian of the whole stack in one expression
+    laplacian = (4 * stack[:, 1:-1, 1:-1] - stack[:, :-2, 1:-1] - stack[:, 2:, 1:-1]
+                 - stack[:, 1:-1, :-2] - stack[:, 1:-1, 2:])
+    sharpness = laplacian.var(axis=(1, 2))
+    sharpness = sharpness / sharpness.max() if sharpness.max() > 0 else sharpness
+
+    mean = stack.mean(axis=(1, 2)) / 255
+    clipped = ((grays < 8) | (grays > 247)).mean(axis=(1, 2))
+    exposure = np.clip(1 - 2 * np.abs(mean - 0.5) - 2 * clipped, 0, 1)
+
+    height = grays.shape[1]
+    # A face a quarter of the frame tall (or bigger) counts fully
+    face = np.array([min(1.0, max(f[3] for f in boxes) / (0.25 * height)) if boxes else 0.0 for boxes in faces])
+    eyes = np.array([np.mean([f[4] / 2 for f in boxes]) if boxes else 0.0 for boxes in faces])
+
+    return (weights["sharpness"] * sharpness + weights["exposure"] * exposure
+            + weights["face"] * face + weights["eyes"] * eyes)
+
+
+def write_image(path, image, quality=THUMBNAIL_QUALITY):
+    """RGB array -> JPEG or WebP, by the path's extension."""
+    if path.lower().endswith(".webp"):
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    else:
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if not cv2.imwrite(path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR), params):
+        raise Exception(f"Could not write thumbnail {path}")
+
+
+def select_thumbnail(video_path, start_time, end_time, output_path, text=None, tracks=(), face_count=None,
+                     out_size=(1080, 1920), cancel_token=None):
+    """
+    Writes the best frame of [start_time, end_time] to output_path, framed
+    like the short (same layout and caption). tracks: the split-screen face
+    tracks if the short has them; face_count 0 skips face detection.
+    Returns {"path", "time", "score", "candidates"}.
+    """
+    # Decoded only as large as the short's crop needs, like the render itself
+    src_size = source_frame_size(video_path)
+    tracks = list(tracks)
+    dec_size = decode_size(src_size, choose_layout(tracks, src_size, out_size).source_scale())
+    if dec_size != src_size:
+        tracks = scale_tracks(tracks, dec_size[0] / src_size[0])
+
+    keyframes = load_keyframe_index(video_path)["keyframes"]
+    frames = read_candidates(video_path, keyframes, start_time, end_time, dec_size, cancel_token=cancel_token)
+    if not frames:
+        raise Exception("No frames could be read for the thumbnail")
+
+    out_w, out_h = out_size
+    score_h = min(THUMBNAIL_SCORE_HEIGHT, out_h)
+    score_w = int(round(out_w * score_h / out_h))
+    layout = choose_layout(tracks, dec_size, out_size)
+    times = [t - start_time for t, _ in frames]
+
+    # Each candidate framed as the short frames it, then shrunk to a grey scoring image
+    composed = []
+    for (_, frame), t in zip(frames, times):
+        composed.append(layout.render(frame, t).copy())
+    del frames
+    grays = np.stack([cv2.resize(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY), (score_w, score_h),
+                                 interpolation=cv2.INTER_AREA) for image in composed])
+    check(cancel_token)
+
+    if len(tracks) >= 2:
+        boxes = faces_from_tracks(layout, times, score_h / out_h)
+    elif face_count == 0:
+        boxes = [[] for _ in composed]
+    else:
+        boxes = detect_faces(grays)
+    faces = [[box + (count_eyes(gray, box),) for box in frame_boxes] for gray, frame_boxes in zip(grays, boxes)]
+
+    scores = score_candidates(grays, faces)
+    best = int(np.argmax(scores))
+    image = composed[best]
+    caption = render_caption(text, out_w, center_y=out_h // 2 if len(tracks) >= 2 else None) if text else None
+    if caption is not None:
+        caption.blend_into(image)
+    write_image(output_path, image)
+    return {"path": output_path, "time": start_time + times[best], "score": float(scores[best]),
+            "candidates": len(composed)}
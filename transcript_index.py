@@ -0,0 +1,183 @@
+import os
+import re
+import time
+import sqlite3
+
+from config import (TRANSCRIPT_INDEX_PATH, SEARCH_RESULT_LIMIT, SEARCH_HIT_PADDING,
+                    MIN_CLIP_DURATION, MAX_CLIP_DURATION)
+
+
+def to_fts_query(text):
+    """
+    Free text -> FTS5 query: every word must appear (as a prefix if it ends
+    in *), "quoted words" must appear as a phrase and OR between terms is
+    kept. Anything else FTS5 would treat as syntax is dropped.
+    """
+    terms = []
+    for token in re.findall(r'"[^"]*"|\S+', text):
+        if token.startswith('"'):
+            words = re.findall(r"\w+", token)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+        elif token == "OR" and terms and terms[-1] != "OR":
+            terms.append("OR")
+        else:
+            prefix = token.endswith("*")
+            for word in re.findall(r"\w+", token):
+                terms.append(f'"{word}"' + ("*" if prefix else ""))
+    while terms and terms[-1] == "OR":
+        terms.pop()
+    return " ".join(terms)
+
+
+def hit_window(hit, duration=None, padding=SEARCH_HIT_PADDING,
+               min_duration=MIN_CLIP_DURATION, max_duration=MAX_CLIP_DURATION):
+    """(start, end) of a short around a search hit: padded, at least min_duration, at most max_duration."""
+    start = max(0.0, hit["start"] - padding)
+    end = max(hit["end"] + padding, start + min_duration)
+    end = min(end, start + max_duration)
+    if duration:
+        end = min(end, duration)
+    return start, end
+
+
+class TranscriptIndex:
+    """
+    Every processed episode's transcript segments in one SQLite file with an
+    FTS5 index over their text, so "every time someone said X" is a single
+    ranked query across all sources instead of a reprocess. Segments keep
+    their timestamps; sources keep where the video is (and its URL), so hits
+    can be rendered later without transcribing again.
+    """
+
+    def __init__(self, db_path=TRANSCRIPT_INDEX_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sources (
+                    source_id TEXT PRIMARY KEY,
+                    title TEXT,
+                    url TEXT,
+                    video_path TEXT,
+                    video_size INTEGER,
+                    video_mtime REAL,
+                    duration REAL,
+                    indexed_at REAL NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS segments (
+                    id INTEGER PRIMARY KEY,
+                    source_id TEXT NOT NULL,
+                    start_time REAL NOT NULL,
+                    end_time REAL NOT NULL,
+                    speaker TEXT,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_segments_source ON segments (source_id, start_time);
+
+                -- External-content FTS table: the text lives once, in segments
+                CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+                    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+                    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+                    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+            """)
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add_transcript(self, source_id, segments, title=None, url=None, video_path=None, duration=None):
+        """Indexes (or re-indexes) one source's segments. Returns how many were stored."""
+        rows = [(source_id, float(s["start"]), float(s["end"]),
+                 None if s.get("speaker") is None else str(s["speaker"]), s["text"].strip())
+                for s in segments if s.get("text", "").strip()]
+        with self._connect() as conn:
+            old = conn.execute("SELECT * FROM sources WHERE source_id = ?", (source_id,)).fetchone()
+            conn.execute("DELETE FROM segments WHERE source_id = ?", (source_id,))
+            conn.executemany(
+                "INSERT INTO segments (source_id, start_time, end_time, speaker, text) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sources (source_id, title, url, video_path, video_size, video_mtime, "
+                "duration, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (source_id, title or (old and old["title"]), url or (old and old["url"]),
+                 None, None, None, duration or (old and old["duration"]), time.time())
+            )
+        conn.close()
+        if video_path:
+            self.set_video_path(source_id, video_path)
+        elif old is not None and old["video_path"]:
+            self.set_video_path(source_id, old["video_path"])
+        return len(rows)
+
+    def set_video_path(self, source_id, video_path):
+        """Where the source video is now; size/mtime are kept to notice if the file is replaced."""
+        path = os.path.abspath(video_path)
+        stat = os.stat(path) if os.path.exists(path) else None
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE sources SET video_path = ?, video_size = ?, video_mtime = ? WHERE source_id = ?",
+                (path, stat and stat.st_size, stat and stat.st_mtime, source_id)
+            )
+        conn.close()
+
+    def get_source(self, source_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM sources WHERE source_id = ?", (source_id,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def cached_video(self, source_id):
+        """The indexed source video if it is still on disk unchanged (temp files get overwritten), else None."""
+        source = self.get_source(source_id)
+        if not source or not source["video_path"] or not os.path.exists(source["video_path"]):
+            return None
+        stat = os.stat(source["video_path"])
+        if stat.st_size != source["video_size"] or stat.st_mtime != source["video_mtime"]:
+            return None
+        return source["video_path"]
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT, source_id=None):
+        """
+        Ranked (bm25) segments matching query across every indexed source.
+        Returns [{"source_id", "title", "start", "end", "speaker", "text",
+        "snippet", "score"}], best first.
+        """
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        sql = """
+            SELECT s.source_id, src.title, s.start_time AS start, s.end_time AS "end", s.speaker, s.text,
+                   snippet(segments_fts, 0, '[', ']', '…', 16) AS snippet,
+                   bm25(segments_fts) AS score
+            FROM segments_fts
+            JOIN segments s ON s.id = segments_fts.rowid
+            LEFT JOIN sources src ON src.source_id = s.source_id
+            WHERE segments_fts MATCH ?
+        """
+        params = [fts_query]
+        if source_id:
+            sql += " AND s.source_id = ?"
+            params.append(source_id)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        conn.close()
+        # bm25() is lower-is-better; flip it so higher scores are better hits
+        return [dict(row, score=-row["score"]) for row in rows]
+
+    def stats(self):
+        with self._connect() as conn:
+            sources = conn.execute("SELECT COUNT(*), COALESCE(SUM(duration), 0) FROM sources").fetchone()
+            segments = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        conn.close()
+        return {"sources": sources[0], "hours": sources[1] / 3600, "segments": segments}
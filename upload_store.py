@@ -0,0 +1,195 @@
+import os
+import json
+import uuid
+from datetime import datetime
+
+from config import UPLOADS_DIR, UPLOAD_MAX_BYTES, UPLOAD_CHUNK_SIZE
+
+# (offset, magic bytes, extension) of the containers we can process
+MEDIA_SIGNATURES = [
+    (4, b"ftyp", ".mp4"),                # MP4 / MOV / M4A
+    (0, b"\x1a\x45\xdf\xa3", ".mkv"),    # Matroska / WebM
+    (0, b"FLV", ".flv"),
+    (0, b"\x00\x00\x01\xba", ".mpg"),    # MPEG program stream
+    (0, b"OggS", ".ogg"),
+    (0, b"fLaC", ".flac"),
+    (0, b"ID3", ".mp3"),
+]
+SNIFF_BYTES = 189  # enough for every signature plus two MPEG-TS sync bytes
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def sniff_media_type(head):
+    """Container extension from a file's first bytes, or None if it isn't media we handle."""
+    for offset, magic, extension in MEDIA_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return extension
+    if head[:4] == b"RIFF":
+        return {b"AVI ": ".avi", b"WAVE": ".wav"}.get(head[8:12])
+    if len(head) >= SNIFF_BYTES and head[0] == 0x47 and head[188] == 0x47:
+        return ".ts"
+    if head[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return ".mp3"
+    return None
+
+
+class UploadStore:
+    """
+    Uploads written straight into uploads/<upload_id>/ in fixed-size chunks.
+    An upload can be continued from its last received byte, so multi-GB
+    files survive dropped connections; nothing is held in memory beyond one
+    chunk.
+    """
+
+    def __init__(self, root=UPLOADS_DIR, max_bytes=UPLOAD_MAX_BYTES, chunk_size=UPLOAD_CHUNK_SIZE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, upload_id):
+        if not upload_id or not all(c in "0123456789abcdef" for c in upload_id):
+            raise UploadError("Invalid upload id", 404)
+        return os.path.join(self.root, upload_id)
+
+    def _part_path(self, upload_id):
+        return os.path.join(self._dir(upload_id), "source.part")
+
+    def _save_state(self, upload_id, state):
+        with open(os.path.join(self._dir(upload_id), "upload.json"), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    def state(self, upload_id):
+        path = os.path.join(self._dir(upload_id), "upload.json")
+        if not os.path.exists(path):
+            raise UploadError("Unknown upload", 404)
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        # The file on disk is the truth: a crash mid-chunk keeps whatever was flushed
+        part = self._part_path(upload_id)
+        if not state.get("complete"):
+            state["received"] = os.path.getsize(part) if os.path.exists(part) else 0
+        return state
+
+    def create(self, filename=None, size=None):
+        """Starts an upload; size (if known) is checked against the limit up front."""
+        if size is not None and int(size) > self.max_bytes:
+            raise UploadError(f"File is larger than the {self.max_bytes // 1024 ** 3} GB limit", 413)
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._dir(upload_id))
+        self._save_state(upload_id, {
+            "upload_id": upload_id,
+            "filename": os.path.basename(filename or "upload"),
+            "size": int(size) if size is not None else None,
+            "received": 0,
+            "media_type": None,
+            "complete": False,
+            "path": None,
+            "created_at": datetime.now().isoformat(),
+        })
+        return upload_id
+
+    def open_writer(self, upload_id, offset=0):
+        """A file-like sink for upload_id that enforces the limits as bytes arrive."""
+        state = self.state(upload_id)
+        if state["complete"]:
+            raise UploadError("Upload already complete", 409)
+        if offset != state["received"]:
+            raise UploadError(f"Expected offset {state['received']}, got {offset}", 409)
+        return UploadWriter(self, upload_id, state)
+
+    def write_stream(self, upload_id, stream, offset=0, length=None):
+        """
+        Copies a request body into the upload in chunk_size steps, starting
+        at offset. Returns the upload state afterwards.
+        """
+        writer = self.open_writer(upload_id, offset)
+        try:
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = stream.read(self.chunk_size if remaining is None else min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                writer.write(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+        finally:
+            writer.close()
+        return self.finish_if_complete(upload_id)
+
+    def finish_if_complete(self, upload_id, size=None):
+        """Renames source.part to source.<ext> once every byte has arrived."""
+        state = self.state(upload_id)
+        if size is not None:
+            state["size"] = size
+        if state["complete"] or state["size"] is None or state["received"] < state["size"]:
+            self._save_state(upload_id, state)
+            return state
+        if state["media_type"] is None:
+            raise UploadError("Upload is not a supported audio/video file", 415)
+        path = os.path.join(self._dir(upload_id), "source" + state["media_type"])
+        os.replace(self._part_path(upload_id), path)
+        state.update(complete=True, path=path)
+        self._save_state(upload_id, state)
+        return state
+
+    def local_path(self, upload_id):
+        state = self.state(upload_id)
+        if not state["complete"]:
+            raise UploadError(f"Upload incomplete ({state['received']} of {state['size']} bytes)", 409)
+        return state["path"], state
+
+
+class UploadWriter:
+    """Appends to source.part, sniffing the media type and enforcing size limits while writing."""
+
+    def __init__(self, store, upload_id, state):
+        self.store = store
+        self.upload_id = upload_id
+        self.state = state
+        self.received = state["received"]
+        self.limit = min(store.max_bytes, state["size"]) if state["size"] is not None else store.max_bytes
+        self.head = b""
+        if state["media_type"] is None and self.received:
+            # Resumed before the type could be sniffed: start from what's on disk
+            with open(store._part_path(upload_id), "rb") as f:
+                self.head = f.read(SNIFF_BYTES)
+        self.file = open(store._part_path(upload_id), "ab")
+
+    def write(self, data):
+        if self.received + len(data) > self.limit:
+            raise UploadError("Upload exceeds the declared size or the size limit", 413)
+
+        if self.state["media_type"] is None and len(self.head) < SNIFF_BYTES:
+            self.head += data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES or self.received + len(data) == self.state.get("size"):
+                media_type = sniff_media_type(self.head)
+                if media_type is None:
+                    raise UploadError("Upload is not a supported audio/video file", 415)
+                self.state["media_type"] = media_type
+                self.store._save_state(self.upload_id, self.state)
+
+        self.file.write(data)
+        self.received += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        self.state["received"] = self.received
+        self.store._save_state(self.upload_id, self.state)
+
+    # werkzeug's multipart parser treats the sink as a file
+    def seek(self, *args):
+        return self.received
+
+    def tell(self):
+        return self.received
+
+    def flush(self):
+        self.file.flush()
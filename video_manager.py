@@ -1,12 +1,15 @@
 import os
 import yt_dlp
-from config import VIDEO_DIR
+from datetime import datetime
+from config import VIDEO_DIR, OUTPUT_DIR
+from shorts_catalog import ShortsCatalog
 
 class VideoManager:
     def __init__(self):
         self.video_dir = VIDEO_DIR
         if not os.path.exists(self.video_dir):
             os.makedirs(self.video_dir)
+        self.catalog = ShortsCatalog()
 
     def download_video(self, url):
         """
@@ -42,3 +45,56 @@ class VideoManager:
                     os.remove(os.path.join(self.video_dir, f))
                 except:
                     pass
+
+    def register_short(self, path, **metadata):
+        """
+        Adds a freshly rendered short to the catalog (hashes it once).
+        """
+        self.catalog.add_short(path, **metadata)
+
+    def find_generated_shorts(self, **filters):
+        """
+        Lists generated shorts from the catalog, newest first.
+        Filters: source_id, min_viral_score, since, order_by, descending, limit.
+        """
+        return self.catalog.list_shorts(**filters)
+
+    def create_summary_report(self):
+        """
+        Writes SHORTS_SUMMARY.md from catalog queries and returns its path.
+        """
+        summary = self.catalog.summary()
+        shorts = self.catalog.list_shorts(order_by="viral_score")
+
+        lines = [
+            "# 🎬 Generated Shorts Summary",
+            "",
+            f"*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*",
+            "",
+            f"- **Total shorts:** {summary['count']}",
+            f"- **Source videos:** {summary['sources']}",
+            f"- **Total duration:** {summary['total_duration']:.1f}s",
+            f"- **Total size:** {summary['total_size']:,} bytes",
+        ]
+        if summary["avg_viral_score"] is not None:
+            lines.append(f"- **Average viral score:** {summary['avg_viral_score']:.2f}")
+
+        lines += ["", "## 📹 Shorts", "", "| File | Source | Time | Score | Title |", "|---|---|---|---|---|"]
+        for short in shorts:
+            time_range = ""
+            if "start_time" in short and "end_time" in short:
+                time_range = f"{short['start_time']:.1f}s - {short['end_time']:.1f}s"
+            score = f"{short['viral_score']:.2f}" if "viral_score" in short else ""
+            title = short.get("title", short.get("text", ""))[:60].replace("|", "/")
+            lines.append(f"| {short['filename']} | {short.get('source_id', '')} | {time_range} | {score} | {title} |")
+
+        report_path = os.path.join(OUTPUT_DIR, "SHORTS_SUMMARY.md")
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return report_path
+
+if __name__ == "__main__":
+    manager = VideoManager()
+    added = manager.catalog.sync_directory()
+    print(f"📚 Catalog synced ({added} new shorts)")
+    print(f"📋 Summary report created: {manager.create_summary_report()}")
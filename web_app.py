@@ -1,19 +1,57 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Request, render_template, request, jsonify, send_file, send_from_directory
 import os
+import re
 import threading
+import time
+import uuid
 from main import YouTubeShortsGenerator
+from cancellation import CancelToken, JobCancelled
+from upload_store import UploadStore, UploadError
+from transcript_index import TranscriptIndex
+from speaker_diarizer import needs_face_scan
+from config import SEARCH_RESULT_LIMIT, PROFILES, DEFAULT_PROFILE, RENDER_TIERS
 import json
 
+
+class UploadRequest(Request):
+    """Streams the multipart file part of /upload straight into the upload's work directory"""
+    upload_writer = None
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_writer is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        writer, self.upload_writer = self.upload_writer, None
+        if filename:
+            writer.state["filename"] = os.path.basename(filename)
+        return writer
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
+
+upload_store = UploadStore()
+transcript_index = TranscriptIndex()
 
 # Global variable to track generation status
 generation_status = {
     "is_running": False,
     "progress": 0,
     "message": "",
-    "shorts": []
+    "shorts": [],
+    "job_id": None
+}
+
+# Objects the finalize step needs from the last generation run
+# (kept out of generation_status because that dict is returned as JSON)
+job_context = {
+    "generator": None,
+    "video_path": None,
+    "cancel_token": None
 }
 
+# Checking is_running and starting a job has to be one step, or two requests can both start
+job_lock = threading.Lock()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -22,56 +60,91 @@ def index():
 def generate_shorts():
     global generation_status
     
-    if generation_status["is_running"]:
-        return jsonify({"error": "Generation already in progress"}), 400
-    
     data = request.json
     url = data.get('url')
+    upload_id = data.get('upload_id')
+    profile = data.get('profile') or DEFAULT_PROFILE
+    
+    if not url and not upload_id:
+        return jsonify({"error": "URL or upload_id is required"}), 400
+    
+    if profile not in PROFILES:
+        return jsonify({"error": f"Unknown profile '{profile}' (choose from: {', '.join(PROFILES)})"}), 400
+    
+    # Uploaded file: local path, no download stage
+    local_path = None
+    if upload_id:
+        try:
+            local_path, _ = upload_store.local_path(upload_id)
+        except UploadError as e:
+            return jsonify({"error": str(e)}), e.status
     
-    if not url:
-        return jsonify({"error": "URL is required"}), 400
+    with job_lock:
+        if generation_status["is_running"]:
+            return jsonify({"error": "Generation already in progress"}), 400
+        job_id = start_job()
     
     # Start generation in background thread
-    thread = threading.Thread(target=generate_shorts_background, args=(url,))
+    thread = threading.Thread(target=generate_shorts_background, args=(url, local_path, upload_id, profile))
     thread.start()
     
-    return jsonify({"message": "Generation started"})
+    return jsonify({"message": "Generation started", "job_id": job_id})
 
-def generate_shorts_background(url):
+def start_job():
+    """New job id and cancel token; set before the thread starts so /cancel works right away"""
+    job_id = uuid.uuid4().hex
+    job_context["cancel_token"] = CancelToken(job_id)
+    generation_status["job_id"] = job_id
+    generation_status["is_running"] = True
+    return job_id
+
+def generate_shorts_background(url, local_path=None, upload_id=None, profile=None):
     global generation_status
+    token = job_context["cancel_token"]
     
     try:
-        generation_status["is_running"] = True
         generation_status["progress"] = 0
         generation_status["message"] = "Starting generation..."
         generation_status["shorts"] = []
         
-        generator = YouTubeShortsGenerator()
+        generator = YouTubeShortsGenerator(profile=profile)
         
         # Update progress
         generation_status["progress"] = 10
-        generation_status["message"] = "Downloading video..."
         
-        # Download video
-        video_path, video_info = generator.download_video(url)
+        if local_path:
+            generation_status["message"] = "Using uploaded video..."
+            video_path, video_info = generator.load_local_video(local_path, source_id=upload_id)
+        else:
+            generation_status["message"] = "Downloading video..."
+            
+            # Download video
+            token.track_output("temp_video.*")
+            with token.stage_scope("download"):
+                video_path, video_info = generator.download_video(url, token)
+        token.track_output("temp_audio.wav")
         
         generation_status["progress"] = 30
         generation_status["message"] = "Extracting audio and transcribing..."
         
         # Extract audio and transcribe
-        segments, full_text = generator.extract_audio_and_transcribe(video_path)
+        with token.stage_scope("transcribe"):
+            segments, full_text = generator.extract_audio_and_transcribe(
+                video_path, video_info.get('id'), cancel_token=token, captions=video_info.get('captions'),
+                source_info=video_info
+            )
         
         generation_status["progress"] = 50
         generation_status["message"] = "Analyzing content..."
         
-        # Analyze content
-        viral_moments = generator.analyze_content(full_text)
-        
-        generation_status["progress"] = 70
-        generation_status["message"] = "Finding timestamps..."
-        
-        # Find timestamps
-        moments_with_timestamps = generator.find_timestamps_for_moments(viral_moments, segments)
+        with token.stage_scope("analyze"):
+            # Score segments and pick sentence-aligned clip windows
+            clip_windows = generator.find_clip_windows(segments, top_k=5, source_id=video_info.get('id'))
+            
+            generation_status["progress"] = 70
+            generation_status["message"] = "Writing titles and descriptions..."
+            
+            generator.summarizer.add_titles_and_descriptions(clip_windows)
         
         generation_status["progress"] = 80
         generation_status["message"] = "Generating shorts..."
@@ -82,43 +155,66 @@ def generate_shorts_background(url):
         
         generated_shorts = []
         
-        for i, moment in enumerate(moments_with_timestamps[:5]):
-            start_time = max(0, moment["start"] - 2)
-            end_time = min(video_info.get('duration', 3600), moment["end"] + 2)
+        for i, moment in enumerate(clip_windows):
+            start_time = max(0, moment["start"])
+            end_time = min(video_info.get('duration', 3600), moment["end"])
             
-            face_count = generator.detect_faces_and_people(video_path, start_time, end_time)
-            
-            output_path = f"{output_dir}/short_{i+1}.mp4"
-            generator.create_short_video(video_path, start_time, end_time, output_path, moment["text"], face_count)
+            with token.stage_scope("render"):
+                # Single-voice clips skip the face scan (no split screen for them)
+                if needs_face_scan(moment):
+                    face_count = generator.detect_faces_and_people(video_path, start_time, end_time, token)
+                else:
+                    face_count = 1
+                
+                # Cheap low-res preview first; the full render happens on /finalize
+                output_path = f"{output_dir}/short_{i+1}_preview.mp4"
+                generator.create_short_video(video_path, start_time, end_time, output_path, moment["text"],
+                                             face_count, tier="preview", cancel_token=token)
             
             short_data = {
                 "path": output_path,
                 "text": moment["text"],
+                "title": moment["title"],
+                "description": moment["description"],
                 "start_time": start_time,
                 "end_time": end_time,
                 "face_count": face_count,
-                "filename": f"short_{i+1}.mp4"
+                "filename": f"short_{i+1}_preview.mp4",
+                "final_filename": None,
+                "tier": "preview",
+                "source_id": video_info.get('id')
             }
             
             # Add advanced data if available
-            if hasattr(moment, 'viral_score'):
+            if 'viral_score' in moment:
                 short_data["viral_score"] = moment["viral_score"]
-            if hasattr(moment, 'sentiment'):
+            if 'sentiment' in moment:
                 short_data["sentiment"] = moment["sentiment"]["label"]
-            if hasattr(moment, 'emotion'):
+            if 'emotion' in moment:
                 short_data["emotion"] = moment["emotion"]["label"]
+            if 'speakers' in moment:
+                short_data["speakers"] = moment["speakers"]
+                short_data["is_multi_speaker"] = moment["is_multi_speaker"]
+                short_data["engagement_score"] = moment["engagement_score"]
             
             generated_shorts.append(short_data)
         
-        # Cleanup
-        os.remove(video_path)
+        # Keep the source video for /finalize; only the audio is temporary
+        job_context["generator"] = generator
+        job_context["video_path"] = video_path
         if os.path.exists("temp_audio.wav"):
             os.remove("temp_audio.wav")
         
         generation_status["progress"] = 100
-        generation_status["message"] = "Generation completed!"
+        generation_status["message"] = "Previews ready! Approve shorts to render them in full quality."
         generation_status["shorts"] = generated_shorts
         
+    except JobCancelled as e:
+        # Downloaded source, temp audio and half-written previews all go
+        token.cleanup()
+        generation_status["message"] = f"Cancelled: {str(e)}"
+        generation_status["progress"] = 0
+    
     except Exception as e:
         generation_status["message"] = f"Error: {str(e)}"
         generation_status["progress"] = 0
@@ -126,6 +222,247 @@ def generate_shorts_background(url):
     finally:
         generation_status["is_running"] = False
 
+@app.route('/finalize', methods=['POST'])
+def finalize_shorts():
+    global generation_status
+    
+    data = request.json or {}
+    requested = data.get('shorts', [])
+    
+    with job_lock:
+        if generation_status["is_running"]:
+            return jsonify({"error": "Generation already in progress"}), 400
+        
+        if not job_context["video_path"] or not os.path.exists(job_context["video_path"]):
+            return jsonify({"error": "No source video available, generate previews first"}), 400
+        
+        # Approved shorts can be given by preview filename or by index
+        selected = []
+        for i, short in enumerate(generation_status["shorts"]):
+            if short["filename"] in requested or i in requested:
+                selected.append(short)
+        
+        if not selected:
+            return jsonify({"error": "No matching shorts to finalize"}), 400
+        
+        job_id = start_job()
+    thread = threading.Thread(target=finalize_shorts_background, args=(selected,))
+    thread.start()
+    
+    return jsonify({"message": f"Finalizing {len(selected)} shorts", "job_id": job_id})
+
+def finalize_shorts_background(selected):
+    global generation_status
+    token = job_context["cancel_token"]
+    
+    try:
+        generator = job_context["generator"]
+        video_path = job_context["video_path"]
+        
+        for n, short in enumerate(selected):
+            generation_status["progress"] = int(100 * n / len(selected))
+            generation_status["message"] = f"Rendering final short {n+1}/{len(selected)}..."
+            
+            final_filename = short["filename"].replace("_preview", "")
+            output_path = os.path.join("generated_shorts", final_filename)
+            with token.stage_scope("render"):
+                generator.create_short_video(
+                    video_path, short["start_time"], short["end_time"], output_path,
+                    short["text"], short["face_count"], tier="final", cancel_token=token
+                )
+                thumbnail = generator.create_thumbnail(
+                    video_path, short["start_time"], short["end_time"], output_path,
+                    short["text"], short["face_count"], cancel_token=token
+                )
+            
+            short["final_filename"] = final_filename
+            short["thumbnail"] = os.path.basename(thumbnail) if thumbnail else None
+            short["tier"] = "final"
+            
+            generator.video_manager.register_short(
+                output_path,
+                source_id=short.get("source_id"),
+                start_time=short["start_time"],
+                end_time=short["end_time"],
+                text=short["text"],
+                title=short.get("title"),
+                description=short.get("description"),
+                viral_score=short.get("viral_score"),
+                engagement_score=short.get("engagement_score"),
+                face_count=short["face_count"],
+                speakers=short.get("speakers"),
+                is_multi_speaker=short.get("is_multi_speaker")
+            )
+        
+        generation_status["progress"] = 100
+        generation_status["message"] = f"Finalized {len(selected)} shorts!"
+        
+    except JobCancelled as e:
+        # Already finished shorts stay; only the one being rendered is removed
+        token.cleanup()
+        generation_status["message"] = f"Cancelled: {str(e)}"
+        generation_status["progress"] = 0
+    
+    except Exception as e:
+        generation_status["message"] = f"Error: {str(e)}"
+        generation_status["progress"] = 0
+    
+    finally:
+        generation_status["is_running"] = False
+
+@app.route('/search')
+def search_transcripts():
+    """Full-text search over every transcript processed so far (?q=...&limit=...&source_id=...)"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    
+    limit = request.args.get('limit', SEARCH_RESULT_LIMIT, type=int)
+    started = time.perf_counter()
+    hits = transcript_index.search(query, limit=limit, source_id=request.args.get('source_id'))
+    took_ms = (time.perf_counter() - started) * 1000
+    
+    return jsonify({"query": query, "hits": hits, "took_ms": round(took_ms, 2)})
+
+@app.route('/search/render', methods=['POST'])
+def render_search_hits():
+    global generation_status
+    
+    data = request.json or {}
+    hits = [hit for hit in data.get('hits', [])
+            if isinstance(hit, dict) and {"source_id", "start", "end", "text"} <= set(hit)]
+    if not hits:
+        return jsonify({"error": "No search hits to render"}), 400
+    
+    tier = data.get('tier', 'final')
+    if tier not in RENDER_TIERS:
+        return jsonify({"error": f"Unknown tier '{tier}' (choose from: {', '.join(RENDER_TIERS)})"}), 400
+    
+    with job_lock:
+        if generation_status["is_running"]:
+            return jsonify({"error": "Generation already in progress"}), 400
+        job_id = start_job()
+    
+    thread = threading.Thread(target=render_search_hits_background, args=(hits, tier))
+    thread.start()
+    
+    return jsonify({"message": f"Rendering {len(hits)} search hits", "job_id": job_id})
+
+def render_search_hits_background(hits, tier):
+    global generation_status
+    token = job_context["cancel_token"]
+    
+    try:
+        generation_status["progress"] = 0
+        generation_status["shorts"] = []
+        generator = job_context["generator"] or YouTubeShortsGenerator(use_advanced=False)
+        
+        rendered = []
+        for n, hit in enumerate(hits):
+            generation_status["progress"] = int(100 * n / len(hits))
+            generation_status["message"] = f"Rendering search hit {n+1}/{len(hits)}..."
+            
+            # Source comes from the kept copy or a fresh download; never re-transcribed
+            with token.stage_scope("render"):
+                shorts = generator.render_search_hits([hit], tier=tier, cancel_token=token)
+            for short in shorts:
+                filename = os.path.basename(short.pop("path"))
+                thumbnail = short["thumbnail"] and os.path.basename(short["thumbnail"])
+                short.update(filename=filename, final_filename=filename, thumbnail=thumbnail, tier=tier)
+                rendered.append(short)
+            generation_status["shorts"] = list(rendered)
+        
+        generation_status["progress"] = 100
+        generation_status["message"] = f"Rendered {len(rendered)} shorts from search!"
+        
+    except JobCancelled as e:
+        token.cleanup()
+        generation_status["message"] = f"Cancelled: {str(e)}"
+        generation_status["progress"] = 0
+    
+    except Exception as e:
+        generation_status["message"] = f"Error: {str(e)}"
+        generation_status["progress"] = 0
+    
+    finally:
+        generation_status["is_running"] = False
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    """Single-request multipart upload (field "file"), written to disk chunk by chunk"""
+    if request.content_length is not None and request.content_length > upload_store.max_bytes:
+        return jsonify({"error": "File is larger than the upload limit"}), 413
+    
+    upload_id = upload_store.create()
+    writer = upload_store.open_writer(upload_id)
+    request.upload_writer = writer
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file part named 'file'"}), 400
+        writer.close()
+        return jsonify(upload_store.finish_if_complete(upload_id, size=writer.received))
+    except UploadError as e:
+        return jsonify({"error": str(e), "upload_id": upload_id}), e.status
+    finally:
+        writer.close()
+
+@app.route('/upload/init', methods=['POST'])
+def init_upload():
+    """Resumable upload start: {"filename", "size"} → upload_id; bytes then go to PUT /upload/<id>"""
+    data = request.json or {}
+    try:
+        upload_id = upload_store.create(data.get('filename'), data.get('size'))
+    except (UploadError, ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), getattr(e, "status", 400)
+    return jsonify({"upload_id": upload_id, "chunk_size": upload_store.chunk_size, "received": 0})
+
+@app.route('/upload/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    Raw bytes for a resumable upload. Content-Range: bytes <start>-<end>/<total>
+    must start at the received offset (409 returns the offset to resume from).
+    """
+    offset, total = 0, None
+    content_range = request.headers.get('Content-Range')
+    if content_range:
+        match = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", content_range)
+        if not match:
+            return jsonify({"error": "Malformed Content-Range"}), 400
+        offset = int(match.group(1))
+        total = int(match.group(3)) if match.group(3) != "*" else None
+    
+    try:
+        state = upload_store.state(upload_id)
+        if total is not None and state["size"] is None:
+            if total > upload_store.max_bytes:
+                raise UploadError("File is larger than the upload limit", 413)
+            state = upload_store.finish_if_complete(upload_id, size=total)
+        state = upload_store.write_stream(upload_id, request.stream, offset, request.content_length)
+    except UploadError as e:
+        current = upload_store.state(upload_id) if e.status == 409 else {}
+        return jsonify({"error": str(e), "received": current.get("received")}), e.status
+    return jsonify(state)
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """How much of an upload has arrived, so a client knows where to resume"""
+    try:
+        return jsonify(upload_store.state(upload_id))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+@app.route('/cancel/<job_id>', methods=['POST'])
+def cancel_job(job_id):
+    """Stops the running job at its next check (worker pools are terminated immediately)"""
+    token = job_context["cancel_token"]
+    if token is None or token.job_id != job_id:
+        return jsonify({"error": "Unknown job"}), 404
+    if not generation_status["is_running"]:
+        return jsonify({"error": "Job is not running"}), 409
+    token.cancel()
+    generation_status["message"] = "Cancelling..."
+    return jsonify({"message": "Cancellation requested", "job_id": job_id})
+
 @app.route('/status')
 def get_status():
     return jsonify(generation_status)
@@ -137,5 +474,13 @@ def download_file(filename):
         return send_file(file_path, as_attachment=True)
     return jsonify({"error": "File not found"}), 404
 
+@app.route('/hls/<path:filename>')
+def hls_file(filename):
+    """HLS playlists/segments (<short>_hls/...) for CDN origin pulls and in-browser testing"""
+    response = send_from_directory('generated_shorts', filename)
+    if filename.endswith('.m3u8'):
+        response.mimetype = 'application/vnd.apple.mpegurl'
+    return response
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)